@@ -0,0 +1,174 @@
+"""
+At-risk student detection over the attendance rollups.
+
+``detect_at_risk_students`` is one set-based pass over the whole student
+body: a single grouped query over ``StudentCourseAttendance`` yields every
+student×course pair below the rules, one query loads the open alerts, and
+the difference is written back with ``bulk_create``/``bulk_update`` and a
+single resolving ``update``. New and escalated alerts are then pushed over
+the channel layer in batches, one message per department and instructor
+group rather than one per student.
+"""
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from config.channel_groups import ATTENDANCE_ALERTS, department_group, instructor_group
+from .engine import AttendanceAnalytics
+from .models import AttendanceAlert, AttendanceRule
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ALERT_CONFIG = {
+    'min_records': 3,
+    'batch_size': 200,
+    'notify': True,
+}
+
+LEVEL_ORDER = {'warning': 1, 'critical': 2}
+
+
+def alert_config() -> Dict:
+    """``ATTENDANCE_ALERT_CONFIG`` merged over the defaults."""
+    config = dict(DEFAULT_ALERT_CONFIG)
+    config.update(getattr(settings, 'ATTENDANCE_ALERT_CONFIG', {}))
+    return config
+
+
+def flagged_pairs(rules: AttendanceRule, min_records: int):
+    """Student×course rates below ``minimum_attendance``, from the rollups."""
+    return (
+        AttendanceAnalytics(rules=rules)
+        .student_course_pairs()
+        .filter(Q(below_minimum=True) | Q(at_risk=True), sessions__gte=min_records)
+    )
+
+
+def detect_at_risk_students(rules: Optional[AttendanceRule] = None, notify: Optional[bool] = None) -> Dict:
+    """
+    Raise, update and resolve ``AttendanceAlert`` rows so that exactly the
+    student×course pairs currently below the rules have an open alert, and
+    notify about alerts that are new or got worse. Returns counts.
+    """
+    config = alert_config()
+    rules = rules or AttendanceRule.get_active_rules()
+    notify = config['notify'] if notify is None else notify
+    now = timezone.now()
+
+    flagged = {
+        (row['course_key'], row['student']): row
+        for row in flagged_pairs(rules, config['min_records'])
+    }
+    open_alerts = {
+        (alert.course_id, alert.student_id): alert
+        for alert in AttendanceAlert.objects.filter(resolved_at__isnull=True)
+        .only('id', 'course_id', 'student_id', 'level', 'attendance_rate', 'records_count')
+    }
+
+    created, updated, raised = [], [], []
+    for key, row in flagged.items():
+        level = 'critical' if row['at_risk'] else 'warning'
+        rate = round(row['attendance_rate'], 2)
+        alert = open_alerts.get(key)
+        if alert is None:
+            alert = AttendanceAlert(
+                course_id=key[0], student_id=key[1], level=level,
+                attendance_rate=rate, records_count=row['sessions'])
+            created.append(alert)
+            raised.append(alert)
+            continue
+        if (alert.level, alert.attendance_rate, alert.records_count) == (level, rate, row['sessions']):
+            continue
+        if LEVEL_ORDER[level] > LEVEL_ORDER[alert.level]:
+            raised.append(alert)
+        alert.level, alert.attendance_rate, alert.records_count = level, rate, row['sessions']
+        alert.updated_at = now
+        updated.append(alert)
+
+    recovered = [alert.pk for key, alert in open_alerts.items() if key not in flagged]
+
+    with transaction.atomic():
+        AttendanceAlert.objects.bulk_create(created, batch_size=config['batch_size'])
+        AttendanceAlert.objects.bulk_update(
+            updated, ['level', 'attendance_rate', 'records_count', 'updated_at'],
+            batch_size=config['batch_size'])
+        resolved = AttendanceAlert.objects.filter(pk__in=recovered).update(resolved_at=now, updated_at=now)
+
+    notified = notify_alerts(raised, config['batch_size']) if notify else 0
+
+    stats = {
+        'flagged': len(flagged),
+        'created': len(created),
+        'updated': len(updated),
+        'resolved': resolved,
+        'notified': notified,
+    }
+    logger.info(f"At-risk detection: {stats}")
+    return stats
+
+
+def _alert_payload(alerts: List[AttendanceAlert]) -> List[Dict]:
+    return [
+        {
+            'id': alert.pk,
+            'student_id': alert.student_id,
+            'course_id': alert.course_id,
+            'level': alert.level,
+            'attendance_rate': alert.attendance_rate,
+            'records_count': alert.records_count,
+        }
+        for alert in alerts
+    ]
+
+
+def notify_alerts(alerts: List[AttendanceAlert], batch_size: int = 200) -> int:
+    """
+    Push ``alerts`` to their department and instructor groups, at most
+    ``batch_size`` alerts per message, and stamp them as notified.
+    Returns how many channel messages were sent.
+    """
+    if not alerts:
+        return 0
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        logger.error("Channel layer is not configured")
+        return 0
+
+    # One query for the routing of every alerted course
+    from courses.models import Course
+    routing = {
+        course_id: (department_id, instructor_id)
+        for course_id, department_id, instructor_id in Course.objects.filter(
+            pk__in={alert.course_id for alert in alerts}
+        ).values_list('id', 'department', 'instructor')
+    }
+    groups = defaultdict(list)
+    for alert in alerts:
+        department_id, instructor_id = routing.get(alert.course_id, (None, None))
+        if department_id is not None:
+            groups[department_group(department_id, ATTENDANCE_ALERTS)].append(alert)
+        if instructor_id is not None:
+            groups[instructor_group(instructor_id, ATTENDANCE_ALERTS)].append(alert)
+
+    sent = 0
+    try:
+        for group, members in groups.items():
+            for start in range(0, len(members), batch_size):
+                async_to_sync(channel_layer.group_send)(group, {
+                    'type': 'attendance_alerts',
+                    'alerts': _alert_payload(members[start:start + batch_size]),
+                })
+                sent += 1
+    except Exception as e:
+        logger.error(f"WebSocket attendance alerts failed: {str(e)}")
+        return sent
+
+    AttendanceAlert.objects.filter(pk__in=[alert.pk for alert in alerts]).update(notified_at=timezone.now())
+    return sent
@@ -0,0 +1,36 @@
+import json
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from config.channel_groups import ATTENDANCE_ALERTS, department_group, instructor_group
+
+
+class AttendanceAlertConsumer(AsyncWebsocketConsumer):
+    """
+    Pushes batches of new or escalated attendance alerts: a head of
+    department gets their departments' alerts, an instructor their courses'.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated or getattr(user, 'role', None) not in ('HEAD', 'INSTRUCTOR'):
+            await self.close(code=4403)
+            return
+
+        self.groups_joined = await self._alert_groups(user)
+        for group in self.groups_joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+
+    @database_sync_to_async
+    def _alert_groups(self, user):
+        if user.role == 'HEAD':
+            return [department_group(pk, ATTENDANCE_ALERTS) for pk in user.headed_departments.values_list('pk', flat=True)]
+        instructor = getattr(user, 'instructor', None)
+        return [instructor_group(instructor.pk, ATTENDANCE_ALERTS)] if instructor else []
+
+    async def disconnect(self, close_code):
+        for group in getattr(self, 'groups_joined', []):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def attendance_alerts(self, event):
+        await self.send(text_data=json.dumps({'type': 'attendance_alerts', 'alerts': event['alerts']}))
@@ -0,0 +1,208 @@
+"""
+Attendance analytics computed in the database.
+
+Every report is one grouped query: conditional ``Count`` aggregates (or sums
+of rollup counters) give present/late/absent totals per group, the
+attendance rate applies ``AttendanceRule.late_policy`` (every N lates count
+as one absence), and window functions rank students within their course.
+Nothing iterates over records in Python.
+
+Reports read the rollup tables maintained by ``analytics.rollups`` so their
+cost follows the number of courses, days and enrolled students rather than
+the number of marks: course, department and instructor figures come from
+``CourseDailyAttendance``, student figures from ``StudentCourseAttendance``.
+Only student-level questions restricted to a date range, which the
+student×course rollup cannot answer, fall back to ``AttendanceRecord``.
+"""
+from django.db.models import (
+    BooleanField, Case, Count, ExpressionWrapper, F, FloatField, IntegerField,
+    Q, Sum, Value, When, Window,
+)
+from django.db.models.functions import Cast, Coalesce, Concat, Rank
+
+from attendance.models import AttendanceRecord
+from .models import AttendanceRule, CourseDailyAttendance, StudentCourseAttendance
+
+GROUPINGS = ('course', 'department', 'instructor', 'student')
+
+# Field paths per data source. Instructor figures follow the course's
+# instructor, which is what the rollups can group by.
+SOURCES = {
+    'records': {'course': 'schedule__course', 'student': 'student', 'date': 'session_date'},
+    'daily': {'course': 'course', 'student': None, 'date': 'session_date'},
+    'students': {'course': 'course', 'student': 'student', 'date': None},
+}
+
+
+def _grouping(group_by, course):
+    if group_by == 'course':
+        return {'key': F(course), 'code': F(f'{course}__code'), 'name': F(f'{course}__name')}
+    if group_by == 'department':
+        return {'key': F(f'{course}__department'), 'name': F(f'{course}__department__name')}
+    if group_by == 'instructor':
+        user = f'{course}__instructor__user'
+        return {
+            'key': F(f'{course}__instructor'),
+            'name': Concat(F(f'{user}__first_name'), Value(' '), F(f'{user}__last_name')),
+        }
+    return {
+        'key': F('student'),
+        'name': Concat(F('student__first_name'), Value(' '), F('student__last_name')),
+        'course': F(course),
+        'course_code': F(f'{course}__code'),
+    }
+
+
+def _counters(source):
+    if source == 'records':
+        return {
+            'sessions': Count('id'),
+            'present': Count('id', filter=Q(status='Present')),
+            'late': Count('id', filter=Q(status='Late')),
+            'absent': Count('id', filter=Q(status='Absent')),
+        }
+    return {
+        'sessions': Coalesce(Sum('records_count'), 0),
+        'present': Coalesce(Sum('present_count'), 0),
+        'late': Coalesce(Sum('late_count'), 0),
+        'absent': Coalesce(Sum('absent_count'), 0),
+    }
+
+
+class AttendanceAnalytics:
+    """
+    Attendance reports over an optional date range and course, department,
+    instructor or student filter, judged against the active attendance rules.
+    ``courses`` (ids or a ``Course`` queryset) limits every figure to the
+    courses a user may see. ``use_rollups=False`` computes everything from
+    the raw records.
+    """
+
+    def __init__(self, rules=None, start=None, end=None, course=None, department=None,
+                 instructor=None, student=None, courses=None, use_rollups=True):
+        self.rules = rules or AttendanceRule.get_active_rules()
+        self.start, self.end = start, end
+        self.course, self.department = course, department
+        self.instructor, self.student = instructor, student
+        self.courses = courses
+        self.use_rollups = use_rollups
+
+    def _source(self, student_level: bool) -> str:
+        if not self.use_rollups:
+            return 'records'
+        if not student_level and self.student is None:
+            return 'daily'
+        if self.start is None and self.end is None:
+            return 'students'
+        return 'records'
+
+    def _queryset(self, source):
+        paths = SOURCES[source]
+        model = {
+            'records': AttendanceRecord,
+            'daily': CourseDailyAttendance,
+            'students': StudentCourseAttendance,
+        }[source]
+        queryset = model.objects.all()
+        course = paths['course']
+        if self.start is not None:
+            queryset = queryset.filter(**{f"{paths['date']}__gte": self.start})
+        if self.end is not None:
+            queryset = queryset.filter(**{f"{paths['date']}__lte": self.end})
+        if self.courses is not None:
+            queryset = queryset.filter(**{f'{course}__in': self.courses})
+        if self.course is not None:
+            queryset = queryset.filter(**{course: self.course})
+        if self.department is not None:
+            queryset = queryset.filter(**{f'{course}__department': self.department})
+        if self.instructor is not None:
+            queryset = queryset.filter(**{f'{course}__instructor': self.instructor})
+        if self.student is not None:
+            queryset = queryset.filter(**{paths['student']: self.student})
+        return queryset
+
+    def _rates(self, queryset, source):
+        queryset = queryset.annotate(**_counters(source))
+        late_policy = self.rules.late_policy
+        # Integer division: every ``late_policy`` lates make one absence
+        late_absences = (
+            ExpressionWrapper(F('late') / late_policy, output_field=IntegerField())
+            if late_policy else Value(0)
+        )
+        return queryset.annotate(
+            late_absences=late_absences,
+            attendance_rate=ExpressionWrapper(
+                Cast(F('present') + F('late') - F('late_absences'), FloatField())
+                * Value(100.0) / F('sessions'),
+                output_field=FloatField()
+            ),
+        ).annotate(
+            below_minimum=Case(
+                When(attendance_rate__lt=self.rules.minimum_attendance, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField()
+            ),
+            at_risk=Case(
+                When(attendance_rate__lt=self.rules.notification_threshold, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField()
+            ),
+        )
+
+    def report(self, group_by: str):
+        """
+        One row per ``group_by`` group (see ``GROUPINGS``), lowest rate first.
+        Student rows are per student and course, with ``course_rank`` among
+        the rows the query returns.
+        """
+        source = self._source(student_level=group_by == 'student')
+        fields = _grouping(group_by, SOURCES[source]['course'])
+        # A field read under its own name must be passed by name, not aliased
+        plain = [alias for alias, expr in fields.items() if isinstance(expr, F) and expr.name == alias]
+        expressions = {alias: expr for alias, expr in fields.items() if alias not in plain}
+        queryset = self._rates(self._queryset(source).values(*plain, **expressions), source)
+        if group_by == 'student':
+            queryset = queryset.annotate(
+                course_rank=Window(
+                    Rank(),
+                    partition_by=[F('course')],
+                    order_by=F('attendance_rate').desc()
+                )
+            )
+        return queryset.order_by('attendance_rate', 'key')
+
+    def student_course_pairs(self):
+        """Per student×course rates keyed on bare ids (no name joins)."""
+        source = self._source(student_level=True)
+        pairs = self._queryset(source).values('student', course_key=F(SOURCES[source]['course']))
+        return self._rates(pairs, source).order_by()
+
+    def summary(self):
+        """Totals over every mark in scope."""
+        source = self._source(student_level=False)
+        counts = self._queryset(source).aggregate(**_counters(source))
+        totals = {
+            'total_records': counts['sessions'] or 0,
+            'present_count': counts['present'] or 0,
+            'late_count': counts['late'] or 0,
+            'absent_count': counts['absent'] or 0,
+        }
+        late_absences = totals['late_count'] // self.rules.late_policy if self.rules.late_policy else 0
+        attended = totals['present_count'] + totals['late_count'] - late_absences
+        totals['attendance_rate'] = (
+            round(attended * 100.0 / totals['total_records'], 2) if totals['total_records'] else None
+        )
+        if source == 'daily':
+            totals['total_sessions'] = self._queryset(source).aggregate(
+                n=Coalesce(Sum('class_sessions'), 0))['n']
+        else:
+            totals['total_sessions'] = (
+                self._queryset('records').values('schedule', 'session_date').distinct().count())
+
+        student_source = self._source(student_level=True)
+        totals['total_students'] = self._queryset(student_source).values('student').distinct().count()
+        pairs = self.student_course_pairs()
+        totals['below_minimum'] = pairs.filter(below_minimum=True).count()
+        totals['at_risk'] = pairs.filter(at_risk=True).count()
+        totals['minimum_attendance'] = self.rules.minimum_attendance
+        return totals
@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from analytics.models import AttendanceRule
+from analytics.rules_cache import rules_cache
+
+
+class Command(BaseCommand):
+    help = "Time cached against uncached AttendanceRule lookups and print the cache hit rate"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookups', type=int, default=100000)
+
+    def _time(self, lookup, count):
+        started = time.perf_counter()
+        for _ in range(count):
+            lookup()
+        return (time.perf_counter() - started) / count * 1e6
+
+    def handle(self, *args, **options):
+        lookups = options['lookups']
+        uncached = self._time(AttendanceRule.load_active_rules, min(lookups, 1000))
+        rules_cache.reset_stats()
+        cached = self._time(AttendanceRule.get_active_rules, lookups)
+
+        stats = rules_cache.stats()
+        self.stdout.write(f"get_or_create:      {uncached:8.2f} µs/lookup")
+        self.stdout.write(f"get_active_rules:   {cached:8.2f} µs/lookup")
+        self.stdout.write(
+            f"local {stats['local_hits']}, revalidated {stats['revalidations']}, "
+            f"shared {stats['shared_hits']}, misses {stats['misses']}, errors {stats['errors']}"
+        )
+        self.stdout.write(self.style.SUCCESS(f"hit rate {stats['hit_rate']:.4%}"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from analytics.alerts import detect_at_risk_students
+
+
+class Command(BaseCommand):
+    help = "Raise and resolve attendance alerts now (normally run by celery beat)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-notify', action='store_true',
+                            help="Update the alert list without pushing notifications")
+
+    def handle(self, *args, **options):
+        stats = detect_at_risk_students(notify=False if options['no_notify'] else None)
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['flagged']} at risk: {stats['created']} new, {stats['updated']} updated, "
+            f"{stats['resolved']} resolved, {stats['notified']} notifications sent"
+        ))
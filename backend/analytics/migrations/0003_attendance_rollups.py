@@ -0,0 +1,56 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_alter_attendancerule_grace_period_and_more'),
+        ('courses', '0004_alter_course_department'),
+        ('students', '0007_student_password'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseDailyAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_date', models.DateField()),
+                ('class_sessions', models.PositiveIntegerField(default=0, help_text='Class sessions held that day')),
+                ('records_count', models.PositiveIntegerField(default=0)),
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('late_count', models.PositiveIntegerField(default=0)),
+                ('absent_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_attendance', to='courses.course')),
+            ],
+            options={
+                'verbose_name': 'Course Daily Attendance',
+                'verbose_name_plural': 'Course Daily Attendance',
+                'indexes': [models.Index(fields=['session_date'], name='rollup_session_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('course', 'session_date'), name='unique_course_day_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentCourseAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('records_count', models.PositiveIntegerField(default=0)),
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('late_count', models.PositiveIntegerField(default=0)),
+                ('absent_count', models.PositiveIntegerField(default=0)),
+                ('last_session_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_attendance', to='courses.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_attendance', to='students.student')),
+            ],
+            options={
+                'verbose_name': 'Student Course Attendance',
+                'verbose_name_plural': 'Student Course Attendance',
+                'indexes': [models.Index(fields=['student'], name='rollup_student_idx')],
+                'constraints': [models.UniqueConstraint(fields=('course', 'student'), name='unique_student_course_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_attendance_rollups'),
+        ('courses', '0004_alter_course_department'),
+        ('students', '0007_student_password'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('warning', 'Warning'), ('critical', 'Critical')], max_length=10)),
+                ('attendance_rate', models.FloatField()),
+                ('records_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_alerts', to='courses.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_alerts', to='students.student')),
+            ],
+            options={
+                'verbose_name': 'Attendance Alert',
+                'verbose_name_plural': 'Attendance Alerts',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['student'], name='alert_student_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('resolved_at__isnull', True)), fields=('course', 'student'), name='unique_open_attendance_alert')],
+            },
+        ),
+    ]
@@ -1,5 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
 from django.utils import timezone
+from attendance.models import AttendanceRecord
+from attendance.signals import attendance_recorded
+from courses.models import Course
+from students.models import Student
 from users.models import User
 
 class AttendanceRule(models.Model):
@@ -39,6 +45,16 @@ class AttendanceRule(models.Model):
 
     @classmethod
     def get_active_rules(cls):
+        """
+        The active rules, cached in-process and in the shared cache (see
+        ``analytics.rules_cache``). Read-only; use ``load_active_rules`` to edit.
+        """
+        from .rules_cache import rules_cache
+
+        return rules_cache.get()
+
+    @classmethod
+    def load_active_rules(cls):
         """Gets or creates default rules"""
         return cls.objects.get_or_create(
             defaults={
@@ -47,4 +63,152 @@ class AttendanceRule(models.Model):
                 'notification_threshold': 70,
                 'grace_period': 15
             }
-        )[0]
\ No newline at end of file
+        )[0]
+
+
+class StudentCourseAttendance(models.Model):
+    """
+    Rollup of a student's attendance marks in one course, kept current by
+    ``analytics.rollups`` whenever attendance is written.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='course_attendance')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='student_attendance')
+    records_count = models.PositiveIntegerField(default=0)
+    present_count = models.PositiveIntegerField(default=0)
+    late_count = models.PositiveIntegerField(default=0)
+    absent_count = models.PositiveIntegerField(default=0)
+    last_session_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Student Course Attendance"
+        verbose_name_plural = "Student Course Attendance"
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'student'], name='unique_student_course_rollup')
+        ]
+        indexes = [
+            models.Index(fields=['student'], name='rollup_student_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} in {self.course}: {self.present_count}/{self.records_count}"
+
+
+class CourseDailyAttendance(models.Model):
+    """Rollup of one course's attendance marks on one day."""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='daily_attendance')
+    session_date = models.DateField()
+    class_sessions = models.PositiveIntegerField(default=0, help_text="Class sessions held that day")
+    records_count = models.PositiveIntegerField(default=0)
+    present_count = models.PositiveIntegerField(default=0)
+    late_count = models.PositiveIntegerField(default=0)
+    absent_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Course Daily Attendance"
+        verbose_name_plural = "Course Daily Attendance"
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'session_date'], name='unique_course_day_rollup')
+        ]
+        indexes = [
+            models.Index(fields=['session_date'], name='rollup_session_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.course} on {self.session_date}: {self.present_count}/{self.records_count}"
+
+
+class AttendanceAlert(models.Model):
+    """
+    A student whose attendance in a course has fallen below the rules.
+
+    'warning' means below ``minimum_attendance``, 'critical' below the lower
+    ``notification_threshold``. Each student and course has at most one open
+    alert, raised and resolved by ``analytics.alerts.detect_at_risk_students``;
+    resolved alerts stay as history.
+    """
+    LEVEL_CHOICES = [
+        ('warning', 'Warning'),
+        ('critical', 'Critical'),
+    ]
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_alerts')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='attendance_alerts')
+    level = models.CharField(max_length=10, choices=LEVEL_CHOICES)
+    attendance_rate = models.FloatField()
+    records_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    notified_at = models.DateTimeField(null=True, blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Attendance Alert"
+        verbose_name_plural = "Attendance Alerts"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['course', 'student'],
+                condition=models.Q(resolved_at__isnull=True),
+                name='unique_open_attendance_alert'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['student'], name='alert_student_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_level_display()}: {self.student} in {self.course} ({self.attendance_rate:.1f}%)"
+
+    @property
+    def is_open(self):
+        return self.resolved_at is None
+
+
+# Every process drops its cached rules once a change is committed
+@receiver([post_save, post_delete], sender=AttendanceRule)
+def attendance_rule_changed(sender, **kwargs):
+    from .rules_cache import rules_cache
+
+    transaction.on_commit(rules_cache.invalidate)
+
+
+# Keep the rollups in step with attendance. Single-row saves and deletes
+# arrive through the model signals, bulk writes through attendance_recorded;
+# queryset.update()/delete() bypass both and need rebuild_attendance_rollups.
+@receiver(pre_save, sender=AttendanceRecord)
+def attendance_pre_save(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    # The record may be moving to another session; refresh the old one too
+    instance._rollup_previous = (
+        AttendanceRecord.objects.filter(pk=instance.pk)
+        .values_list('schedule__course', 'student', 'session_date')
+        .first()
+    )
+
+@receiver(post_save, sender=AttendanceRecord)
+def attendance_post_save(sender, instance, raw=False, **kwargs):
+    from .rollups import refresh_rollups
+
+    if raw:
+        return
+    current = (instance.schedule.course_id, instance.student_id, instance.session_date)
+    previous = getattr(instance, '_rollup_previous', None)
+    keys = [current] if not previous or previous == current else [previous, current]
+    # Course order keeps the refreshes' row locks from deadlocking
+    for course_id, student_id, session_date in sorted(keys, key=lambda key: key[0] or 0):
+        refresh_rollups(course_id, [student_id], [session_date])
+
+@receiver(post_delete, sender=AttendanceRecord)
+def attendance_post_delete(sender, instance, **kwargs):
+    from .rollups import refresh_rollups
+
+    refresh_rollups(instance.schedule.course_id, [instance.student_id], [instance.session_date])
+
+@receiver(attendance_recorded)
+def attendance_bulk_recorded(sender, schedule, session_date, student_ids, **kwargs):
+    from .rollups import refresh_rollups
+
+    refresh_rollups(schedule.course_id, student_ids, [session_date])
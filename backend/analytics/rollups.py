@@ -0,0 +1,146 @@
+"""
+Maintenance of the attendance rollup tables.
+
+``StudentCourseAttendance`` (student×course) and ``CourseDailyAttendance``
+(course×day) hold the counters the analytics read, so dashboards scan rows
+per course and day rather than every mark in the semester. After each write
+only the touched keys are recomputed from ``AttendanceRecord`` with one
+grouped query per table and written back with a single upsert.
+
+Refreshes run inside the writer's transaction and first lock the course
+row, so two refreshes of one course take turns until the earlier one
+commits. Under READ COMMITTED the later recompute then sees the earlier
+writer's records, so concurrent marks cannot leave stale totals behind, and
+a retried refresh just rewrites the same counters.
+"""
+import logging
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+from attendance.models import AttendanceRecord
+from courses.models import Course
+from .models import CourseDailyAttendance, StudentCourseAttendance
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ('records_count', 'present_count', 'late_count', 'absent_count')
+
+
+def _counter_aggregates():
+    return {
+        'records_count': Count('id'),
+        'present_count': Count('id', filter=Q(status='Present')),
+        'late_count': Count('id', filter=Q(status='Late')),
+        'absent_count': Count('id', filter=Q(status='Absent')),
+    }
+
+
+def _lock_course(course_id):
+    # FOR NO KEY UPDATE: serializes refreshers without blocking inserts that
+    # reference the course
+    list(Course.objects.select_for_update(no_key=True).filter(pk=course_id).values_list('pk', flat=True))
+
+
+def _refresh_student_course(course_id, records, student_ids=None):
+    rows = (
+        records.values('student')
+        .annotate(last_session_date=Max('session_date'), **_counter_aggregates())
+        .order_by()
+    )
+    rollups = [
+        StudentCourseAttendance(
+            course_id=course_id, student_id=row['student'],
+            last_session_date=row['last_session_date'],
+            **{name: row[name] for name in COUNTERS}
+        )
+        for row in rows
+    ]
+    StudentCourseAttendance.objects.bulk_create(
+        rollups,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['course', 'student'],
+        update_fields=[*COUNTERS, 'last_session_date', 'updated_at']
+    )
+
+    # Keys whose last record went away
+    stale = StudentCourseAttendance.objects.filter(course_id=course_id)
+    if student_ids is not None:
+        stale = stale.filter(student_id__in=student_ids)
+    stale.exclude(student_id__in=[r.student_id for r in rollups]).delete()
+    return len(rollups)
+
+
+def _refresh_course_daily(course_id, records, dates=None):
+    rows = (
+        records.values('session_date')
+        .annotate(
+            class_sessions=Count('schedule', distinct=True),
+            **_counter_aggregates()
+        )
+        .order_by()
+    )
+    rollups = [
+        CourseDailyAttendance(
+            course_id=course_id, session_date=row['session_date'],
+            class_sessions=row['class_sessions'],
+            **{name: row[name] for name in COUNTERS}
+        )
+        for row in rows
+    ]
+    CourseDailyAttendance.objects.bulk_create(
+        rollups,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['course', 'session_date'],
+        update_fields=[*COUNTERS, 'class_sessions', 'updated_at']
+    )
+
+    stale = CourseDailyAttendance.objects.filter(course_id=course_id)
+    if dates is not None:
+        stale = stale.filter(session_date__in=dates)
+    stale.exclude(session_date__in=[r.session_date for r in rollups]).delete()
+    return len(rollups)
+
+
+def refresh_rollups(course_id: Optional[int], student_ids: Optional[Iterable[int]] = None,
+                    dates: Optional[Iterable] = None):
+    """
+    Recompute the rollups of ``course_id`` for the given students and days
+    (all of them when None).
+    """
+    if course_id is None:
+        return
+    student_ids = list(student_ids) if student_ids is not None else None
+    dates = list(dates) if dates is not None else None
+
+    records = AttendanceRecord.objects.filter(schedule__course=course_id)
+    with transaction.atomic():
+        _lock_course(course_id)
+        by_student = records if student_ids is None else records.filter(student__in=student_ids)
+        _refresh_student_course(course_id, by_student, student_ids)
+        by_day = records if dates is None else records.filter(session_date__in=dates)
+        _refresh_course_daily(course_id, by_day, dates)
+
+
+def rebuild_rollups(course_ids: Optional[Iterable[int]] = None):
+    """
+    Recompute the rollups from scratch, course by course (every course with
+    attendance or rollups by default). Returns ``(student_rows, daily_rows)``.
+    """
+    if course_ids is None:
+        course_ids = set(AttendanceRecord.objects.values_list('schedule__course', flat=True).distinct())
+        course_ids |= set(StudentCourseAttendance.objects.values_list('course', flat=True).distinct())
+        course_ids |= set(CourseDailyAttendance.objects.values_list('course', flat=True).distinct())
+
+    student_rows = daily_rows = 0
+    for course_id in sorted(c for c in course_ids if c is not None):
+        records = AttendanceRecord.objects.filter(schedule__course=course_id)
+        with transaction.atomic():
+            _lock_course(course_id)
+            student_rows += _refresh_student_course(course_id, records)
+            daily_rows += _refresh_course_daily(course_id, records)
+    logger.info(f"Rebuilt attendance rollups: {student_rows} student×course, {daily_rows} course×day rows")
+    return student_rows, daily_rows
@@ -0,0 +1,147 @@
+"""
+Two-level cache for the active ``AttendanceRule``.
+
+Reads go to an in-process copy first. Once that copy is older than
+``local_ttl`` seconds it is revalidated against a version counter in the
+shared Django cache (one small ``get``), and only a version change fetches
+the rules again: from the shared cache, or from the database on a miss.
+Saving or deleting a rule bumps the version after the transaction commits,
+so every worker serves the new rules within ``local_ttl`` seconds. If the
+shared cache is unreachable, lookups fall back to the database.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_CACHE_CONFIG = {
+    'alias': 'default',
+    'local_ttl': 5.0,
+    'timeout': 3600,
+}
+
+VERSION_KEY = 'attendance_rules:version'
+
+
+def rules_cache_config() -> Dict:
+    """``ATTENDANCE_RULES_CACHE`` merged over the defaults."""
+    config = dict(DEFAULT_RULES_CACHE_CONFIG)
+    config.update(getattr(settings, 'ATTENDANCE_RULES_CACHE', {}))
+    return config
+
+
+@dataclass
+class RulesCacheStats:
+    local_hits: int = 0       # served from the in-process copy
+    revalidations: int = 0    # version unchanged in the shared cache
+    shared_hits: int = 0      # new version fetched from the shared cache
+    misses: int = 0           # loaded from the database
+    invalidations: int = 0
+    errors: int = 0           # shared cache unreachable
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        hits = self.local_hits + self.revalidations + self.shared_hits
+        total = hits + self.misses
+        return hits / total if total else None
+
+
+class RulesCache:
+    """Process-wide cached accessor for ``AttendanceRule.get_active_rules``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rules = None
+        self._version = None
+        self._checked_at = 0.0
+        self._stats = RulesCacheStats()
+
+    @staticmethod
+    def _data_key(version) -> str:
+        return f'attendance_rules:{version}'
+
+    def get(self):
+        """
+        The active rules. The instance is shared by every caller in the
+        process: treat it as read-only and edit ``AttendanceRule.load_active_rules()``.
+        """
+        config = rules_cache_config()
+        now = time.monotonic()
+        with self._lock:
+            if self._rules is not None and now - self._checked_at < config['local_ttl']:
+                self._stats.local_hits += 1
+                return self._rules
+
+        rules, version = self._fetch(config)
+        with self._lock:
+            self._rules, self._version, self._checked_at = rules, version, now
+        return rules
+
+    def _fetch(self, config):
+        from .models import AttendanceRule
+
+        try:
+            cache = caches[config['alias']]
+            # A fresh version (first use, or evicted) can never match an old copy
+            version = cache.get_or_set(VERSION_KEY, time.time_ns, timeout=None)
+            if self._rules is not None and version == self._version:
+                self._count('revalidations')
+                return self._rules, version
+            data = cache.get(self._data_key(version))
+            if data is not None:
+                self._count('shared_hits')
+                return AttendanceRule(**data), version
+        except Exception as e:
+            logger.warning(f"Attendance rules cache unavailable: {str(e)}")
+            self._count('errors')
+            self._count('misses')
+            return AttendanceRule.load_active_rules(), None
+
+        self._count('misses')
+        rules = AttendanceRule.load_active_rules()
+        data = {field.attname: getattr(rules, field.attname) for field in rules._meta.concrete_fields}
+        try:
+            cache.set(self._data_key(version), data, timeout=config['timeout'])
+        except Exception as e:
+            logger.warning(f"Attendance rules cache unavailable: {str(e)}")
+            self._count('errors')
+        return rules, version
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self._stats, name, getattr(self._stats, name) + 1)
+
+    def invalidate(self):
+        """Drop the local copy and move every process to a new version."""
+        config = rules_cache_config()
+        with self._lock:
+            self._rules, self._version = None, None
+            self._stats.invalidations += 1
+        try:
+            cache = caches[config['alias']]
+            try:
+                cache.incr(VERSION_KEY)
+            except ValueError:
+                cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+        except Exception as e:
+            logger.warning(f"Attendance rules cache unavailable: {str(e)}")
+            self._count('errors')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = asdict(self._stats)
+            stats['hit_rate'] = self._stats.hit_rate
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = RulesCacheStats()
+
+
+rules_cache = RulesCache()
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import AttendanceRule
+from .engine import GROUPINGS
+from .models import AttendanceAlert, AttendanceRule
 
 class AttendanceRuleSerializer(serializers.ModelSerializer):
     class Meta:
@@ -24,4 +25,59 @@ class AttendanceRuleSerializer(serializers.ModelSerializer):
         if any(value < 0 for value in data.values()):
             raise serializers.ValidationError("All values must be positive")
             
-        return data
\ No newline at end of file
+        return data
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    """Query parameters of the attendance analytics endpoint."""
+    group_by = serializers.ChoiceField(choices=GROUPINGS, required=False)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    course = serializers.IntegerField(required=False)
+    department = serializers.IntegerField(required=False)
+    instructor = serializers.IntegerField(required=False)
+    student = serializers.IntegerField(required=False)
+    below_minimum = serializers.BooleanField(required=False, allow_null=True, default=None)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=1000, default=100)
+    offset = serializers.IntegerField(required=False, min_value=0, default=0)
+
+    def validate(self, data):
+        if data.get('start') and data.get('end') and data['start'] > data['end']:
+            raise serializers.ValidationError({'end': 'Must not be before start'})
+        return data
+
+
+class AttendanceAlertSerializer(serializers.ModelSerializer):
+    student_name = serializers.SerializerMethodField()
+    course_code = serializers.CharField(source='course.code', read_only=True)
+
+    class Meta:
+        model = AttendanceAlert
+        fields = [
+            'id',
+            'student',
+            'student_name',
+            'course',
+            'course_code',
+            'level',
+            'attendance_rate',
+            'records_count',
+            'created_at',
+            'updated_at',
+            'notified_at',
+            'resolved_at'
+        ]
+        read_only_fields = fields
+
+    def get_student_name(self, obj):
+        return f"{obj.student.first_name} {obj.student.last_name}"
+
+
+class AlertQuerySerializer(serializers.Serializer):
+    """Query parameters of the attendance alerts endpoint."""
+    level = serializers.ChoiceField(choices=AttendanceAlert.LEVEL_CHOICES, required=False)
+    course = serializers.IntegerField(required=False)
+    department = serializers.IntegerField(required=False)
+    student = serializers.IntegerField(required=False)
+    open = serializers.BooleanField(required=False, default=True)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=1000, default=100)
+    offset = serializers.IntegerField(required=False, min_value=0, default=0)
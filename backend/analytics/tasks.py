@@ -0,0 +1,8 @@
+from celery import shared_task
+from .alerts import detect_at_risk_students
+
+
+@shared_task(ignore_result=True)
+def detect_at_risk_students_task():
+    """Periodic at-risk scan, scheduled by ``CELERY_BEAT_SCHEDULE``."""
+    return detect_at_risk_students()
@@ -1,3 +1,262 @@
-from django.test import TestCase
+from datetime import date, time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from attendance.models import AttendanceRecord
+from config.channel_groups import ATTENDANCE_ALERTS, department_group, instructor_group
+from courses.models import Course
+from departments.models import Department
+from instructors.models import Instructor
+from schedules.models import Schedule
+from students.models import Student
+from users.models import User
+
+from .alerts import detect_at_risk_students
+from .models import AttendanceAlert, AttendanceRule, CourseDailyAttendance, StudentCourseAttendance
+from .rollups import rebuild_rollups, refresh_rollups
+from .rules_cache import VERSION_KEY, rules_cache
+
+
+class RollupRefreshTests(TestCase):
+    def setUp(self):
+        department = Department.objects.create(name='Physics')
+        self.course, self.other_course = [
+            Course.objects.create(code=code, name=code, department=department)
+            for code in ('PHY101', 'PHY102')
+        ]
+        user = User.objects.create_user(username='teacher', email='teacher@example.com', password='x', role='INSTRUCTOR')
+        instructor = Instructor.objects.create(user=user, department=department)
+        self.schedule = Schedule.objects.create(
+            course=self.course, instructor=instructor, day='Monday', start_time=time(9), end_time=time(10), room='A1',
+        )
+        self.other_schedule = Schedule.objects.create(
+            course=self.other_course, instructor=instructor, day='Monday', start_time=time(11), end_time=time(12), room='A1',
+        )
+        self.students = [
+            Student.objects.create(first_name=name, email=f'{name}@example.com')
+            for name in ('ada', 'bob')
+        ]
+        self.day = date(2026, 3, 2)
+
+    def mark(self, student, status, schedule=None):
+        return AttendanceRecord.objects.create(
+            student=student, schedule=schedule or self.schedule, session_date=self.day, status=status,
+        )
+
+    def test_saves_and_deletes_keep_counters_in_step(self):
+        self.mark(self.students[0], 'Present')
+        late = self.mark(self.students[1], 'Late')
+
+        daily = CourseDailyAttendance.objects.get(course=self.course, session_date=self.day)
+        self.assertEqual((daily.records_count, daily.present_count, daily.late_count), (2, 1, 1))
+
+        late.delete()
+        daily.refresh_from_db()
+        self.assertEqual((daily.records_count, daily.late_count), (1, 0))
+        self.assertFalse(StudentCourseAttendance.objects.filter(student=self.students[1]).exists())
+
+    def test_moving_a_record_refreshes_both_courses(self):
+        record = self.mark(self.students[0], 'Present')
+        record.schedule = self.other_schedule
+        record.save()
+
+        self.assertFalse(CourseDailyAttendance.objects.filter(course=self.course).exists())
+        moved = StudentCourseAttendance.objects.get(course=self.other_course, student=self.students[0])
+        self.assertEqual(moved.present_count, 1)
+
+    def test_refresh_is_idempotent(self):
+        self.mark(self.students[0], 'Absent')
+        refresh_rollups(self.course.pk)
+        refresh_rollups(self.course.pk, [self.students[0].pk], [self.day])
+        self.assertEqual(rebuild_rollups([self.course.pk]), (1, 1))
+        row = StudentCourseAttendance.objects.get(course=self.course, student=self.students[0])
+        self.assertEqual((row.records_count, row.absent_count), (1, 1))
+
+    @skipUnless(connection.vendor == 'postgresql', 'row locks need PostgreSQL')
+    def test_refresh_locks_the_course(self):
+        with CaptureQueriesContext(connection) as queries:
+            refresh_rollups(self.course.pk)
+        self.assertTrue(any('FOR NO KEY UPDATE' in query['sql'] for query in queries.captured_queries))
+
+
+class RulesCacheTests(TestCase):
+    def setUp(self):
+        caches['rules'].clear()
+        rules_cache.invalidate()
+
+    def test_rules_live_in_the_rules_cache(self):
+        self.assertEqual(AttendanceRule.get_active_rules().minimum_attendance, 75)
+        self.assertIsNotNone(caches['rules'].get(VERSION_KEY))
+        self.assertIsNone(caches['default'].get(VERSION_KEY))
+
+    def test_saving_a_rule_invalidates_after_commit(self):
+        AttendanceRule.get_active_rules()
+        rules = AttendanceRule.load_active_rules()
+        rules.minimum_attendance = 80
+        with self.captureOnCommitCallbacks(execute=True):
+            rules.save()
+        self.assertEqual(AttendanceRule.get_active_rules().minimum_attendance, 80)
+
+
+class ScopedAttendanceFixture:
+    """Physics (PHY101 by the instructor, PHY102 by a colleague) under the head; CHE101 elsewhere."""
+
+    def setUp(self):
+        self.admin, self.head, self.teacher, self.colleague, self.student_user = [
+            User.objects.create_user(username=name, email=f'{name}@example.com', password='x', role=role)
+            for name, role in (('admin', 'ADMIN'), ('head', 'HEAD'), ('teacher', 'INSTRUCTOR'),
+                               ('colleague', 'INSTRUCTOR'), ('pupil', 'STUDENT'))
+        ]
+        physics = Department.objects.create(name='Physics', head_of_department=self.head)
+        chemistry = Department.objects.create(name='Chemistry')
+        teacher = Instructor.objects.create(user=self.teacher, department=physics)
+        colleague = Instructor.objects.create(user=self.colleague, department=chemistry)
+        self.student = Student.objects.create(first_name='Ada', email='ada@example.com')
+        self.courses = {}
+        for hour, (code, department, instructor) in enumerate(
+                (('PHY101', physics, teacher), ('PHY102', physics, colleague), ('CHE101', chemistry, colleague)), 8):
+            course = Course.objects.create(code=code, name=code, department=department, instructor=instructor)
+            schedule = Schedule.objects.create(
+                course=course, instructor=instructor, day='Monday', start_time=time(hour), end_time=time(hour, 50),
+                room=code)
+            AttendanceRecord.objects.create(
+                student=self.student, schedule=schedule, session_date=date(2026, 3, 2), status='Absent')
+            self.courses[code] = course
+
+    def get(self, user, **params):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(self.url, params)
+
+
+class AttendanceAnalyticsViewTests(ScopedAttendanceFixture, TestCase):
+    url = '/api/analytics/attendance/analytics/'
+
+    def visible(self, user):
+        response = self.get(user, group_by='course')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_records'], response.data['count'])
+        return sorted(row['code'] for row in response.data['results'])
+
+    def test_admins_see_every_course(self):
+        self.assertEqual(self.visible(self.admin), ['CHE101', 'PHY101', 'PHY102'])
+
+    def test_heads_see_their_departments(self):
+        self.assertEqual(self.visible(self.head), ['PHY101', 'PHY102'])
+
+    def test_instructors_see_their_courses(self):
+        self.assertEqual(self.visible(self.teacher), ['PHY101'])
+        self.assertEqual(self.visible(self.colleague), ['CHE101', 'PHY102'])
+
+    def test_filters_cannot_widen_the_scope(self):
+        response = self.get(self.teacher, course=self.courses['CHE101'].pk)
+        self.assertEqual(response.data['total_records'], 0)
+
+    def test_students_are_refused(self):
+        self.assertEqual(self.get(self.student_user).status_code, 403)
+
+
+def alert_config(**config):
+    return override_settings(ATTENDANCE_ALERT_CONFIG={'min_records': 1, 'batch_size': 200, 'notify': True, **config})
+
+
+@alert_config()
+class AttendanceAlertsViewTests(ScopedAttendanceFixture, TestCase):
+    url = '/api/analytics/attendance/alerts/'
+
+    def setUp(self):
+        super().setUp()
+        detect_at_risk_students(notify=False)
+
+    def visible(self, user):
+        response = self.get(user)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], len(response.data['results']))
+        return sorted(alert['course_code'] for alert in response.data['results'])
+
+    def test_admins_see_every_alert(self):
+        self.assertEqual(self.visible(self.admin), ['CHE101', 'PHY101', 'PHY102'])
+
+    def test_heads_see_their_departments_alerts(self):
+        self.assertEqual(self.visible(self.head), ['PHY101', 'PHY102'])
+
+    def test_instructors_see_their_courses_alerts(self):
+        self.assertEqual(self.visible(self.teacher), ['PHY101'])
+        self.assertEqual(self.visible(self.colleague), ['CHE101', 'PHY102'])
+
+    def test_students_are_refused(self):
+        self.assertEqual(self.get(self.student_user).status_code, 403)
+
+
+class AtRiskDetectionTests(ScopedAttendanceFixture, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.layer = mock.Mock(group_send=mock.AsyncMock())
+        patcher = mock.patch('analytics.alerts.get_channel_layer', return_value=self.layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sent(self):
+        """``{group: [alerted course ids per message]}``"""
+        messages = {}
+        for (group, message), _ in self.layer.group_send.call_args_list:
+            messages.setdefault(group, []).append(sorted(alert['course_id'] for alert in message['alerts']))
+        return messages
+
+    @alert_config()
+    def test_scan_raises_keeps_and_resolves_alerts(self):
+        stats = detect_at_risk_students(notify=False)
+        self.assertEqual((stats['flagged'], stats['created'], stats['notified']), (3, 3, 0))
+        self.assertEqual(set(AttendanceAlert.objects.values_list('level', flat=True)), {'critical'})
+
+        stats = detect_at_risk_students(notify=False)
+        self.assertEqual((stats['created'], stats['updated'], stats['resolved']), (0, 0, 0))
+
+        AttendanceRecord.objects.filter(schedule__course=self.courses['PHY101']).update(status='Present')
+        rebuild_rollups()
+        stats = detect_at_risk_students(notify=False)
+        self.assertEqual((stats['flagged'], stats['resolved']), (2, 1))
+        resolved = AttendanceAlert.objects.get(resolved_at__isnull=False)
+        self.assertEqual(resolved.course, self.courses['PHY101'])
+
+    @alert_config(min_records=2)
+    def test_students_with_too_few_marks_are_not_judged(self):
+        self.assertEqual(detect_at_risk_students()['flagged'], 0)
+        self.layer.group_send.assert_not_called()
+
+    @alert_config()
+    def test_alerts_are_batched_per_group(self):
+        physics = self.courses['PHY101'].department_id
+        teacher, colleague = self.courses['PHY101'].instructor_id, self.courses['CHE101'].instructor_id
+        phy101, phy102, che101 = (self.courses[code].pk for code in ('PHY101', 'PHY102', 'CHE101'))
+
+        self.assertEqual(detect_at_risk_students()['notified'], 4)
+        self.assertEqual(self.sent(), {
+            department_group(physics, ATTENDANCE_ALERTS): [sorted([phy101, phy102])],
+            department_group(self.courses['CHE101'].department_id, ATTENDANCE_ALERTS): [[che101]],
+            instructor_group(teacher, ATTENDANCE_ALERTS): [[phy101]],
+            instructor_group(colleague, ATTENDANCE_ALERTS): [sorted([phy102, che101])],
+        })
+        self.assertFalse(AttendanceAlert.objects.filter(notified_at__isnull=True).exists())
+
+    @alert_config(batch_size=1)
+    def test_batch_size_caps_alerts_per_message(self):
+        self.assertEqual(detect_at_risk_students()['notified'], 6)
+        self.assertTrue(all(len(batch) == 1 for batches in self.sent().values() for batch in batches))
+
+    @alert_config()
+    def test_only_new_or_escalated_alerts_are_notified(self):
+        AttendanceAlert.objects.create(
+            student=self.student, course=self.courses['PHY101'], level='warning', attendance_rate=70)
+        AttendanceAlert.objects.create(
+            student=self.student, course=self.courses['PHY102'], level='critical', attendance_rate=50)
+
+        stats = detect_at_risk_students()
+        self.assertEqual((stats['created'], stats['updated']), (1, 2))
+        notified = AttendanceAlert.objects.filter(notified_at__isnull=False)
+        self.assertEqual(sorted(alert.course.code for alert in notified), ['CHE101', 'PHY101'])
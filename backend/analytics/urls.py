@@ -4,5 +4,6 @@ from . import views
 urlpatterns = [
     path('', views.analytics_root, name='analytics-root'),
     path('attendance/analytics/', views.AttendanceAnalyticsView.as_view(), name='attendance-analytics'),
+    path('attendance/alerts/', views.AttendanceAlertsView.as_view(), name='attendance-alerts'),
     path('attendance/rules/', views.AttendanceRulesView.as_view(), name='attendance-rules'),
 ]
\ No newline at end of file
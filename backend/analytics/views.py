@@ -1,10 +1,15 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import status, permissions
 from rest_framework.decorators import api_view
 from rest_framework.reverse import reverse
-from .models import AttendanceRule
-from .serializers import AttendanceRuleSerializer
+from courses.models import Course
+from .engine import AttendanceAnalytics
+from .models import AttendanceAlert, AttendanceRule
+from .permissions import CanViewAnalytics
+from .serializers import (
+    AlertQuerySerializer, AnalyticsQuerySerializer, AttendanceAlertSerializer, AttendanceRuleSerializer,
+)
 
 @api_view(['GET'])
 def analytics_root(request, format=None):
@@ -12,47 +17,97 @@ def analytics_root(request, format=None):
     return Response({
         'attendance-analytics': reverse('attendance-analytics', request=request, format=format),
         'attendance-rules': reverse('attendance-rules', request=request, format=format),
+        'attendance-alerts': reverse('attendance-alerts', request=request, format=format),
     })
 
+def visible_courses(user):
+    """Courses whose attendance ``user`` may see; ``None`` for all of them."""
+    if user.role == 'HEAD':
+        return Course.objects.filter(department__head_of_department=user)
+    if user.role == 'INSTRUCTOR':
+        return Course.objects.filter(instructor__user=user)
+    return None
+
 class AttendanceAnalyticsView(APIView):
     """View for handling attendance analytics data"""
-    
+    permission_classes = [permissions.IsAuthenticated, CanViewAnalytics]
+
     def get(self, request):
-        """Get attendance analytics summary"""
-        # Implement your analytics logic here
-        data = {
-            "total_students": 0,
-            "present_count": 0,
-            "absent_count": 0,
-        }
+        """
+        Get attendance analytics: the summary, plus one row per course,
+        department, instructor or student×course with ``?group_by=``.
+        Filters: start, end, course, department, instructor, student.
+        """
+        query = AnalyticsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        analytics = AttendanceAnalytics(
+            start=params.get('start'),
+            end=params.get('end'),
+            course=params.get('course'),
+            department=params.get('department'),
+            instructor=params.get('instructor'),
+            student=params.get('student'),
+            courses=visible_courses(request.user),
+        )
+        data = analytics.summary()
+
+        group_by = params.get('group_by')
+        if group_by:
+            rows = analytics.report(group_by)
+            if params['below_minimum'] is not None:
+                rows = rows.filter(below_minimum=params['below_minimum'])
+            data['group_by'] = group_by
+            data['count'] = rows.count()
+            page = rows[params['offset']:params['offset'] + params['limit']]
+            data['results'] = [
+                dict(row, attendance_rate=round(row['attendance_rate'], 2)) for row in page
+            ]
         return Response(data)
 
+class AttendanceAlertsView(APIView):
+    """Alerts raised by the periodic at-risk detection"""
+    permission_classes = [permissions.IsAuthenticated, CanViewAnalytics]
+
+    def get(self, request):
+        """
+        List attendance alerts, most recent first; open ones by default
+        (``?open=false`` for resolved history).
+        Filters: level, course, department, student.
+        """
+        query = AlertQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        alerts = AttendanceAlert.objects.filter(resolved_at__isnull=params['open'])
+        # The courses whose alerts AttendanceAlertConsumer pushes to this user
+        courses = visible_courses(request.user)
+        if courses is not None:
+            alerts = alerts.filter(course__in=courses)
+        for field in ('level', 'course', 'student'):
+            if params.get(field) is not None:
+                alerts = alerts.filter(**{field: params[field]})
+        if params.get('department') is not None:
+            alerts = alerts.filter(course__department=params['department'])
+
+        page = alerts.select_related('student', 'course')[params['offset']:params['offset'] + params['limit']]
+        return Response({
+            'count': alerts.count(),
+            'results': AttendanceAlertSerializer(page, many=True).data,
+        })
+
 class AttendanceRulesView(APIView):
     """View for managing attendance rules"""
     
     def get(self, request):
         """Get current attendance rules"""
-        rules, created = AttendanceRule.objects.get_or_create(
-            defaults={
-                'minimum_attendance': 75,
-                'late_policy': 3,
-                'notification_threshold': 70,
-                'grace_period': 15
-            }
-        )
-        serializer = AttendanceRuleSerializer(rules)
+        serializer = AttendanceRuleSerializer(AttendanceRule.get_active_rules())
         return Response(serializer.data)
     
     def put(self, request):
         """Update attendance rules"""
-        rules, created = AttendanceRule.objects.get_or_create(
-            defaults={
-                'minimum_attendance': 75,
-                'late_policy': 3,
-                'notification_threshold': 70,
-                'grace_period': 15
-            }
-        )
+        rules = AttendanceRule.load_active_rules()
         
         serializer = AttendanceRuleSerializer(rules, data=request.data, partial=True)
         if serializer.is_valid():
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM_CONFIG = {
+    'workers': 2,
+    'max_frame_bytes': 2 * 1024 * 1024,
+    'max_frame_age_ms': 500,
+    'require_active': True,
+}
+
+_pool = None
+
+
+def stream_config():
+    """``ATTENDANCE_STREAM_CONFIG`` merged over the defaults."""
+    config = dict(DEFAULT_STREAM_CONFIG)
+    config.update(getattr(settings, 'ATTENDANCE_STREAM_CONFIG', {}))
+    return config
+
+
+def frame_pool() -> ThreadPoolExecutor:
+    """
+    Process-wide pool that decodes and analyzes frames off the event loop.
+    Its size caps concurrent inference no matter how many cameras connect.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=stream_config()['workers'], thread_name_prefix='attendance-frames')
+    return _pool
+
+
+def _in_pool(func, *args):
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+class AttendanceFrameConsumer(AsyncWebsocketConsumer):
+    """
+    Classroom camera stream: binary JPEG/WebP frames in, recognition events out.
+
+    At most one frame per socket is being analyzed and at most one waits
+    behind it. A newer frame replaces the waiting one, and a frame older
+    than ``max_frame_age_ms`` by the time a worker is free is dropped. So a
+    slow model drops frames instead of building a backlog, and a processed
+    frame's total latency is at most its age limit plus one analysis.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated or getattr(user, 'role', None) != 'INSTRUCTOR':
+            await self.close(code=4403)
+            return
+
+        self.config = stream_config()
+        self.engine = None
+        self._latest = None
+        self._worker = None
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.latencies = []
+
+        schedule_id = self.scope['url_route']['kwargs']['schedule_id']
+        loop = asyncio.get_running_loop()
+        try:
+            self.engine = await loop.run_in_executor(
+                frame_pool(), _in_pool, self._start_engine, schedule_id, user.pk)
+        except Exception:
+            logger.exception(f"Could not start attendance for schedule {schedule_id}")
+            await self.close(code=4500)
+            return
+        if self.engine is None:
+            await self.close(code=4404)
+            return
+
+        await self.accept()
+        await self.send(text_data=json.dumps({
+            'type': 'session_started',
+            'schedule_id': self.engine.schedule.pk,
+            'late_after': self.engine.late_after.isoformat(),
+            'already_marked': len(self.engine.marked),
+        }))
+
+    def _start_engine(self, schedule_id, user_id):
+        from schedules.models import Schedule
+        from .engine import AttendanceEngine, active_schedules
+
+        schedules = active_schedules() if self.config['require_active'] else Schedule.objects.all()
+        # Only the instructor teaching the class may take its attendance
+        schedule = (
+            schedules.filter(pk=schedule_id, instructor__user_id=user_id)
+            .select_related('course').first()
+        )
+        if schedule is None:
+            return None
+        return AttendanceEngine(schedule)
+
+    async def disconnect(self, close_code):
+        if getattr(self, 'engine', None) is None:
+            return
+        if self._worker is not None:
+            self._latest = None
+            await asyncio.gather(self._worker, return_exceptions=True)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(frame_pool(), _in_pool, self.engine.close)
+        if self.latencies:
+            logger.info(
+                f"Attendance stream for schedule {self.engine.schedule.pk} closed: "
+                f"{self.processed}/{self.received} frames processed, {self.dropped} dropped, "
+                f"latency p50={np.percentile(self.latencies, 50):.0f} ms "
+                f"p95={np.percentile(self.latencies, 95):.0f} ms"
+            )
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if bytes_data is None:
+            return
+        arrived = time.monotonic()
+        if len(bytes_data) > self.config['max_frame_bytes']:
+            await self.close(code=1009)
+            return
+
+        self.received += 1
+        if self._latest is not None:
+            self.dropped += 1  # superseded before a worker got to it
+        self._latest = (self.received, arrived, bytes_data)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._drain())
+
+    def _stale(self, arrived: float) -> bool:
+        return (time.monotonic() - arrived) * 1000 > self.config['max_frame_age_ms']
+
+    def _analyze(self, data: bytes, arrived: float):
+        # Re-checked here: the frame may have waited for a free pool worker
+        if self._stale(arrived):
+            return None
+        started = time.monotonic()
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("Frame is not a decodable image")
+        events = self.engine.process(frame)
+        return events, started
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while self._latest is not None:
+            seq, arrived, data = self._latest
+            self._latest = None
+            if self._stale(arrived):
+                self.dropped += 1
+                continue
+
+            try:
+                result = await loop.run_in_executor(
+                    frame_pool(), _in_pool, self._analyze, data, arrived)
+            except Exception as e:
+                logger.warning(f"Frame {seq} failed: {e}")
+                await self.send(text_data=json.dumps({'type': 'error', 'frame': seq, 'error': str(e)}))
+                continue
+            if result is None:
+                self.dropped += 1
+                continue
+
+            events, started = result
+            done = time.monotonic()
+            latency = (done - arrived) * 1000
+            self.processed += 1
+            self.latencies.append(latency)
+            del self.latencies[:-1000]
+
+            await self.send(text_data=json.dumps({
+                'type': 'recognition',
+                'frame': seq,
+                'students': events,
+                'queue_ms': round((started - arrived) * 1000, 1),
+                'latency_ms': round(latency, 1),
+                'dropped': self.dropped,
+            }))
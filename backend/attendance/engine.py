@@ -0,0 +1,277 @@
+"""
+Live classroom attendance: camera frames in, ``AttendanceRecord`` rows out.
+
+``AttendanceEngine`` runs one class session (a ``Schedule`` on a given day).
+Each frame goes through one batched face detection. Detected faces are matched
+to short-lived tracks by bounding-box overlap, so a student sitting still is
+recognized a few times and then only tracked. Only unconfirmed tracks are
+cropped, embedded in one batched recognition call, and searched against the
+course roster's sub-index of the face index. A student is confirmed after
+``min_sightings`` agreeing matches and marked once per session. Records are
+buffered and written with ``bulk_create``.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from analytics.models import AttendanceRule
+from facial_data.embeddings import department_students, search_students
+from facial_data.registry import registry
+from schedules.models import Schedule
+from .models import AttendanceRecord
+from .signals import attendance_recorded
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENGINE_CONFIG = {
+    'profile': 'attendance',
+    'match_threshold': 0.4,
+    'min_sightings': 2,
+    'min_face_size': 24,
+    'max_faces': 0,
+    'max_recognitions_per_frame': 32,
+    'track_iou': 0.3,
+    'track_ttl_seconds': 3.0,
+    'flush_seconds': 5.0,
+    'flush_size': 50,
+    'early_minutes': 10,
+}
+
+
+def engine_config(overrides: Optional[Dict] = None) -> Dict:
+    """``ATTENDANCE_ENGINE_CONFIG`` merged over the defaults."""
+    config = dict(DEFAULT_ENGINE_CONFIG)
+    config.update(getattr(settings, 'ATTENDANCE_ENGINE_CONFIG', {}))
+    config.update(overrides or {})
+    return config
+
+
+def session_window(schedule: Schedule, date=None):
+    """Aware ``(start, end)`` datetimes of ``schedule`` on ``date`` (default today)."""
+    date = date or timezone.localdate()
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(date, schedule.start_time), tz)
+    end = timezone.make_aware(datetime.combine(date, schedule.end_time), tz)
+    return start, end
+
+
+def active_schedules(room: Optional[str] = None, at=None, early_minutes: Optional[int] = None):
+    """Schedules in session at ``at`` (default now), optionally in one room."""
+    at = timezone.localtime(at or timezone.now())
+    if early_minutes is None:
+        early_minutes = engine_config()['early_minutes']
+    early = (at + timedelta(minutes=early_minutes)).time()
+
+    schedules = Schedule.objects.filter(
+        day=at.strftime('%A'),
+        start_time__lte=early,
+        end_time__gt=at.time(),
+    ).select_related('course')
+    if room is not None:
+        schedules = schedules.filter(room=room)
+    return schedules
+
+
+def course_roster(course) -> Optional[List[int]]:
+    """
+    Student ids expected in ``course``'s sessions.
+
+    There is no per-course enrollment yet, so the roster is the course's
+    department; None (search every enrolled face) when it has none.
+    """
+    if course.department_id is None:
+        return None
+    return department_students(course.department_id)
+
+
+def _iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of two ``(n, 4)`` x1, y1, x2, y2 box arrays."""
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+class FaceTrack:
+    """One face followed across frames until it is confirmed as a student."""
+    __slots__ = ('bbox', 'kps', 'last_seen', 'student_id', 'similarity', 'hits',
+                 'attempts', 'confirmed')
+
+    def __init__(self, bbox, kps, seen):
+        self.bbox = bbox
+        self.kps = kps
+        self.last_seen = seen
+        self.student_id = None
+        self.similarity = 0.0
+        self.hits = 0
+        self.attempts = 0
+        self.confirmed = False
+
+    def observe(self, student_id: Optional[int], similarity: float):
+        self.attempts += 1
+        if student_id is None:
+            return
+        if student_id == self.student_id:
+            self.hits += 1
+            self.similarity = max(self.similarity, similarity)
+        else:
+            self.student_id, self.similarity, self.hits = student_id, similarity, 1
+
+
+class AttendanceEngine:
+    """
+    Attendance for one class session, fed frame by frame.
+
+    Not thread-safe: give each camera stream its own engine (engines for the
+    same schedule still de-duplicate against records already in the database).
+    """
+
+    def __init__(self, schedule: Schedule, date=None, roster: Optional[Iterable[int]] = None,
+                 config: Optional[Dict] = None):
+        self.schedule = schedule
+        self.config = engine_config(config)
+        self.start, self.end = session_window(schedule, date)
+        self.late_after = self.start + timedelta(minutes=AttendanceRule.get_active_rules().grace_period)
+
+        self.roster = list(roster) if roster is not None else course_roster(schedule.course)
+        self.group = ('course', schedule.course_id) if self.roster is not None else None
+
+        analyzer = registry.get('face_analyzer', profile=self.config['profile'])
+        self.detector = analyzer.det_model
+        self.recognizer = analyzer.models['recognition']
+
+        self.tracks: List[FaceTrack] = []
+        self.marked = set(
+            AttendanceRecord.objects
+            .for_session(schedule, self.start.date())
+            .values_list('student_id', flat=True)
+        )
+        self._pending: List[AttendanceRecord] = []
+        self._flushed_at = time.monotonic()
+        self.frames = 0
+        self.recognitions = 0
+
+    def status_at(self, when) -> str:
+        """'Present' within ``AttendanceRule.grace_period`` of the start, else 'Late'."""
+        return 'Present' if when <= self.late_after else 'Late'
+
+    def _detect(self, frame: np.ndarray):
+        bboxes, kpss = self.detector.detect(frame, max_num=self.config['max_faces'])
+        if kpss is None or not len(bboxes):
+            return np.empty((0, 4), dtype=np.float32), np.empty((0, 5, 2), dtype=np.float32)
+        boxes = bboxes[:, :4]
+        size = np.minimum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+        keep = size >= self.config['min_face_size']
+        return boxes[keep], kpss[keep]
+
+    def _update_tracks(self, boxes: np.ndarray, kpss: np.ndarray, seen: float):
+        ttl = self.config['track_ttl_seconds']
+        self.tracks = [t for t in self.tracks if seen - t.last_seen <= ttl]
+
+        unmatched = set(range(len(boxes)))
+        if self.tracks and len(boxes):
+            overlap = _iou(np.array([t.bbox for t in self.tracks]), boxes)
+            # Greedy assignment, best overlaps first
+            for flat in np.argsort(-overlap, axis=None):
+                t, d = divmod(int(flat), len(boxes))
+                if overlap[t, d] < self.config['track_iou']:
+                    break
+                track = self.tracks[t]
+                if d not in unmatched or track.last_seen == seen:
+                    continue
+                track.bbox, track.kps, track.last_seen = boxes[d], kpss[d], seen
+                unmatched.discard(d)
+
+        for d in unmatched:
+            self.tracks.append(FaceTrack(boxes[d], kpss[d], seen))
+
+    def _recognize(self, frame: np.ndarray, tracks: List[FaceTrack]):
+        from insightface.utils import face_align
+
+        size = self.recognizer.input_size[0]
+        crops = [face_align.norm_crop(frame, landmark=t.kps, image_size=size) for t in tracks]
+        embeddings = self.recognizer.get_feat(crops)
+        matches = search_students(embeddings, k=1, candidates=self.roster, group=self.group)
+        self.recognitions += len(tracks)
+
+        threshold = self.config['match_threshold']
+        for track, match in zip(tracks, matches):
+            if match and match[0][1] >= threshold:
+                track.observe(*match[0])
+            else:
+                track.observe(None, 0.0)
+
+    def process(self, frame: np.ndarray, timestamp=None) -> List[Dict]:
+        """
+        Feed one BGR frame. Returns an event per student confirmed in this
+        frame; ``new`` is False for students already marked this session.
+        """
+        timestamp = timestamp or timezone.now()
+        seen = time.monotonic()
+        self.frames += 1
+
+        boxes, kpss = self._detect(frame)
+        self._update_tracks(boxes, kpss, seen)
+
+        pending = [t for t in self.tracks if t.last_seen == seen and not t.confirmed]
+        # Bound recognition cost per frame; fresh and larger faces go first
+        pending.sort(key=lambda t: (t.attempts, -(t.bbox[2] - t.bbox[0])))
+        pending = pending[:self.config['max_recognitions_per_frame']]
+        if pending:
+            self._recognize(frame, pending)
+
+        events = []
+        for track in pending:
+            if track.hits < self.config['min_sightings']:
+                continue
+            track.confirmed = True
+            new = track.student_id not in self.marked
+            status = self.status_at(timestamp)
+            if new:
+                self.marked.add(track.student_id)
+                self._pending.append(AttendanceRecord(
+                    student_id=track.student_id, schedule=self.schedule,
+                    session_date=self.start.date(), status=status))
+            events.append({
+                'student_id': track.student_id,
+                'similarity': round(float(track.similarity), 4),
+                'status': status,
+                'bbox': [int(v) for v in track.bbox],
+                'new': new,
+            })
+
+        if (len(self._pending) >= self.config['flush_size']
+                or time.monotonic() - self._flushed_at >= self.config['flush_seconds']):
+            self.flush()
+        return events
+
+    def flush(self) -> int:
+        """Write buffered records; returns how many were written."""
+        records, self._pending = self._pending, []
+        self._flushed_at = time.monotonic()
+        if not records:
+            return 0
+        # Another stream or a manual mark may have recorded the student already
+        AttendanceRecord.objects.bulk_create(
+            records, batch_size=self.config['flush_size'], ignore_conflicts=True)
+        attendance_recorded.send(
+            sender=AttendanceRecord,
+            schedule=self.schedule,
+            session_date=self.start.date(),
+            student_ids=[record.student_id for record in records]
+        )
+        logger.info(f"Recorded attendance for {len(records)} students in schedule {self.schedule.pk}")
+        return len(records)
+
+    def close(self):
+        self.flush()
+        self.tracks = []
@@ -0,0 +1,149 @@
+"""
+Streaming attendance exports.
+
+Rows come from a ``values_list`` queryset read with
+``iterator(chunk_size=...)``, which on PostgreSQL is a server-side cursor:
+only one chunk of tuples is in memory at a time and no model instances
+are built. CSV is encoded as it is read and streamed to the client in
+blocks of lines, so memory stays flat however many rows match; under ASGI
+through ``astream_csv``, as Django buffers sync iterators there. XLSX
+(optional, needs ``openpyxl``) goes through a write-only workbook spooled
+to a temporary file, which is then streamed; a sheet holds at most
+``EXCEL_MAX_ROWS`` rows, so larger exports must be CSV.
+"""
+import csv
+import tempfile
+from typing import AsyncIterator, Dict, Iterable, Iterator
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import AttendanceRecord
+
+# Rows per worksheet, header included
+EXCEL_MAX_ROWS = 1048576
+
+DEFAULT_EXPORT_CONFIG = {
+    'chunk_size': 2000,
+    'lines_per_block': 500,
+    'spool_bytes': 8 * 1024 * 1024,
+    'max_xlsx_rows': EXCEL_MAX_ROWS - 1,
+}
+
+COLUMNS = [
+    ('session_date', 'session_date'),
+    ('course_code', 'schedule__course__code'),
+    ('course_name', 'schedule__course__name'),
+    ('department', 'schedule__course__department__name'),
+    ('schedule_id', 'schedule_id'),
+    ('day', 'schedule__day'),
+    ('start_time', 'schedule__start_time'),
+    ('student_id', 'student_id'),
+    ('first_name', 'student__first_name'),
+    ('last_name', 'student__last_name'),
+    ('status', 'status'),
+    ('attendance_time', 'attendance_time'),
+]
+
+HEADER = [name for name, _ in COLUMNS]
+
+
+def export_config() -> Dict:
+    """``ATTENDANCE_EXPORT_CONFIG`` merged over the defaults."""
+    config = dict(DEFAULT_EXPORT_CONFIG)
+    config.update(getattr(settings, 'ATTENDANCE_EXPORT_CONFIG', {}))
+    return config
+
+
+def export_records(queryset=None, course=None, department=None, start=None, end=None):
+    """The records to export, narrowed by the export's filters."""
+    records = AttendanceRecord.objects.all() if queryset is None else queryset
+    if course is not None:
+        records = records.filter(schedule__course=course)
+    if department is not None:
+        records = records.filter(schedule__course__department=department)
+    if start is not None:
+        records = records.filter(session_date__gte=start)
+    if end is not None:
+        records = records.filter(session_date__lte=end)
+    return records
+
+
+def export_rows(queryset=None, course=None, department=None, start=None, end=None):
+    """
+    Tuples in ``HEADER`` order for the matching records, ordered by session
+    then student. Read lazily in chunks of ``chunk_size``.
+    """
+    return (
+        export_records(queryset, course, department, start, end).order_by('session_date', 'schedule', 'student')
+        .values_list(*[path for _, path in COLUMNS])
+        .iterator(chunk_size=export_config()['chunk_size'])
+    )
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows: Iterable[tuple]) -> Iterator[str]:
+    """CSV text in blocks of ``lines_per_block`` lines, header first."""
+    writer = csv.writer(_Echo())
+    block_size = export_config()['lines_per_block']
+    yield writer.writerow(HEADER)
+    block = []
+    for row in rows:
+        block.append(writer.writerow(row))
+        if len(block) >= block_size:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
+
+
+async def astream_csv(rows: Iterable[tuple]) -> AsyncIterator[str]:
+    """
+    ``stream_csv`` as an async iterator. Each block is read on the sync
+    thread, which owns the database connection the rows' cursor lives on.
+    """
+    blocks = stream_csv(rows)
+    next_block = sync_to_async(next, thread_sensitive=True)
+    while (block := await next_block(blocks, None)) is not None:
+        yield block
+
+
+def xlsx_available() -> bool:
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def write_xlsx(rows: Iterable[tuple]):
+    """
+    Write the rows into a write-only workbook and return the rewound
+    temporary file holding it. Needs ``openpyxl``. Raises ``ValueError``
+    past ``max_xlsx_rows`` rows; callers check the count first.
+    """
+    from openpyxl import Workbook
+
+    config = export_config()
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Attendance')
+    sheet.append(HEADER)
+    for written, row in enumerate(rows, 1):
+        if written > config['max_xlsx_rows']:
+            raise ValueError(f"XLSX exports hold at most {config['max_xlsx_rows']} rows")
+        # Excel has no timezone-aware datetimes
+        sheet.append([
+            value.replace(tzinfo=None) if getattr(value, 'tzinfo', None) else value
+            for value in row
+        ])
+
+    output = tempfile.SpooledTemporaryFile(max_size=config['spool_bytes'])
+    workbook.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,47 @@
+"""Synthetic data shared by the attendance benchmark commands."""
+from datetime import time
+from courses.models import Course
+from departments.models import Department
+from instructors.models import Instructor
+from schedules.models import Schedule
+from students.models import Student
+from users.models import User
+
+
+class Rollback(Exception):
+    """Raised at the end of a benchmark to discard its synthetic data."""
+
+
+def synthetic_fixture(students, schedules=1, batch_size=5000):
+    """
+    Create a department with ``students`` students and ``schedules`` weekly
+    class slots. Returns ``(schedules, student_ids)``. Run inside a
+    transaction that is rolled back.
+    """
+    department = Department.objects.create(name='Benchmark Department')
+    # One instructor per slot keeps the schedules' uniqueness constraints satisfied
+    users = User.objects.bulk_create([
+        User(username=f'benchmark.instructor{i}', role='INSTRUCTOR') for i in range(schedules)
+    ])
+    instructors = Instructor.objects.bulk_create([
+        Instructor(user=user, department=department) for user in users
+    ])
+    courses = Course.objects.bulk_create([
+        Course(code=f'BENCH{i}', name=f'Benchmark {i}', department=department)
+        for i in range(schedules)
+    ])
+    days = [day for day, _ in Schedule.DAY_CHOICES]
+    # bulk_create skips Schedule.save()'s validation and notifications
+    slots = Schedule.objects.bulk_create([
+        Schedule(
+            course=course, instructor=instructor, day=days[i % len(days)],
+            room=f'BENCH-{i}', start_time=time(8), end_time=time(9)
+        )
+        for i, (course, instructor) in enumerate(zip(courses, instructors))
+    ])
+    created = Student.objects.bulk_create([
+        Student(first_name='Student', last_name=str(i), email=f'bench{i}@example.com',
+                department=department)
+        for i in range(students)
+    ], batch_size=batch_size)
+    return slots, [s.pk for s in created]
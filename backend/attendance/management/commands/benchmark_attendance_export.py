@@ -0,0 +1,95 @@
+import os
+import random
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+from attendance.export import export_rows, stream_csv, write_xlsx, xlsx_available
+from attendance.management.benchmark import Rollback, synthetic_fixture
+from attendance.models import AttendanceRecord
+
+
+def _rss_mb():
+    """Current resident set size in MB (Linux), or None."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Time streaming CSV (and XLSX) exports of a synthetic semester, "
+        "default one million records (rolled back afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=10000)
+        parser.add_argument('--schedules', type=int, default=200, help="Weekly class slots")
+        parser.add_argument('--class-size', type=int, default=250, help="Students per class slot")
+        parser.add_argument('--weeks', type=int, default=20)
+        parser.add_argument('--chunk-size', type=int, action='append',
+                            help="Cursor chunk sizes to compare (repeatable)")
+        parser.add_argument('--xlsx', action='store_true', help="Also time the XLSX export")
+
+    def _populate(self, schedules, student_ids, class_size, weeks):
+        rng = random.Random(0)
+        first = date(2026, 1, 5)
+        statuses = ['Present'] * 8 + ['Late', 'Absent']
+        total = 0
+        started = time.perf_counter()
+        for schedule in schedules:
+            roster = rng.sample(student_ids, min(class_size, len(student_ids)))
+            AttendanceRecord.objects.bulk_create([
+                AttendanceRecord(
+                    student_id=student_id, schedule=schedule,
+                    session_date=first + timedelta(weeks=week), status=rng.choice(statuses)
+                )
+                for week in range(weeks)
+                for student_id in roster
+            ], batch_size=5000)
+            total += len(roster) * weeks
+        self.stdout.write(f"Inserted {total} records in {time.perf_counter() - started:.1f} s")
+        return total
+
+    def _csv(self, total, chunk_size):
+        with override_settings(ATTENDANCE_EXPORT_CONFIG={'chunk_size': chunk_size}):
+            baseline = peak = _rss_mb()
+            size = 0
+            started = time.perf_counter()
+            for i, block in enumerate(stream_csv(export_rows())):
+                size += len(block.encode())
+                if baseline is not None and i % 50 == 0:
+                    peak = max(peak, _rss_mb())
+            elapsed = time.perf_counter() - started
+        growth = f"{peak - baseline:6.1f} MB" if baseline is not None else "n/a"
+        self.stdout.write(
+            f"csv  chunk={chunk_size:<6} {elapsed:6.1f} s  {total / elapsed:9.0f} rows/s  "
+            f"{size / 2 ** 20 / elapsed:6.1f} MB/s  {size / 2 ** 20:7.1f} MB  RSS growth {growth}"
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Database: {connection.vendor}")
+        try:
+            with transaction.atomic():
+                schedules, student_ids = synthetic_fixture(options['students'], options['schedules'])
+                total = self._populate(schedules, student_ids, options['class_size'], options['weeks'])
+
+                for chunk_size in options['chunk_size'] or [2000]:
+                    self._csv(total, chunk_size)
+
+                if options['xlsx']:
+                    if not xlsx_available():
+                        self.stdout.write(self.style.WARNING("openpyxl is not installed; skipping XLSX"))
+                    else:
+                        started = time.perf_counter()
+                        output = write_xlsx(export_rows())
+                        size = output.seek(0, os.SEEK_END)
+                        elapsed = time.perf_counter() - started
+                        self.stdout.write(
+                            f"xlsx {elapsed:6.1f} s  {total / elapsed:9.0f} rows/s  {size / 2 ** 20:7.1f} MB")
+                raise Rollback
+        except Rollback:
+            pass
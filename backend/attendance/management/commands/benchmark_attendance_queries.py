@@ -0,0 +1,107 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from attendance.management.benchmark import Rollback, synthetic_fixture
+from attendance.models import AttendanceRecord
+
+
+class Command(BaseCommand):
+    help = (
+        "Time per-session and per-student attendance queries on a synthetic "
+        "semester (rolled back afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=10000)
+        parser.add_argument('--schedules', type=int, default=200, help="Weekly class slots")
+        parser.add_argument('--class-size', type=int, default=400, help="Students per class slot")
+        parser.add_argument('--weeks', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=50, help="Runs per query")
+        parser.add_argument('--explain', action='store_true', help="Print each query plan")
+
+    def _populate(self, schedules, student_ids, class_size, weeks):
+        rng = random.Random(0)
+        first = date(2026, 1, 5)
+        statuses = ['Present'] * 8 + ['Late', 'Absent']
+        total = 0
+        started = time.perf_counter()
+        for schedule in schedules:
+            roster = rng.sample(student_ids, min(class_size, len(student_ids)))
+            records = [
+                AttendanceRecord(
+                    student_id=student_id, schedule=schedule,
+                    session_date=first + timedelta(weeks=week), status=rng.choice(statuses)
+                )
+                for week in range(weeks)
+                for student_id in roster
+            ]
+            AttendanceRecord.objects.bulk_create(records, batch_size=5000)
+            total += len(records)
+        self.stdout.write(f"Inserted {total} records in {time.perf_counter() - started:.1f} s")
+        return first, first + timedelta(weeks=weeks)
+
+    def _time(self, label, make_query, repeat, explain):
+        timings = []
+        for _ in range(repeat):
+            queryset = make_query()
+            started = time.perf_counter()
+            list(queryset)
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f"{label:<34} p50={statistics.median(timings):7.2f} ms  "
+            f"max={max(timings):7.2f} ms"
+        )
+        if explain:
+            self.stdout.write(make_query().explain())
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Database: {connection.vendor}")
+        rng = random.Random(1)
+        try:
+            with transaction.atomic():
+                schedules, student_ids = synthetic_fixture(options['students'], options['schedules'])
+                start, end = self._populate(
+                    schedules, student_ids, options['class_size'], options['weeks'])
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"ANALYZE {AttendanceRecord._meta.db_table}")
+
+                def session_date():
+                    return start + timedelta(weeks=rng.randrange(options['weeks']))
+
+                repeat, explain = options['repeat'], options['explain']
+                self._time(
+                    "who attended one class session",
+                    lambda: AttendanceRecord.objects
+                    .for_session(rng.choice(schedules), session_date())
+                    .filter(status__in=['Present', 'Late'])
+                    .values_list('student_id', flat=True),
+                    repeat, explain
+                )
+                self._time(
+                    "one student's semester",
+                    lambda: AttendanceRecord.objects
+                    .for_student(rng.choice(student_ids), start, end)
+                    .values_list('schedule_id', 'session_date', 'status'),
+                    repeat, explain
+                )
+                self._time(
+                    "one student's last 4 weeks",
+                    lambda: AttendanceRecord.objects
+                    .for_student(rng.choice(student_ids), end - timedelta(weeks=4), end)
+                    .values_list('schedule_id', 'session_date', 'status'),
+                    repeat, explain
+                )
+                self._time(
+                    "session totals for one schedule",
+                    lambda: AttendanceRecord.objects
+                    .filter(schedule=rng.choice(schedules))
+                    .sessions(),
+                    repeat, explain
+                )
+                raise Rollback
+        except Rollback:
+            pass
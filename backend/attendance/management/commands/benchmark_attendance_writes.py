@@ -0,0 +1,54 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from attendance.management.benchmark import Rollback, synthetic_fixture
+from attendance.models import AttendanceRecord
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-row attendance inserts with the bulk upsert on synthetic "
+        "data (rolled back afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help="Students per session")
+        parser.add_argument('--sessions', type=int, default=5, help="Sessions written per path")
+
+    def _report(self, label, rows, elapsed):
+        self.stdout.write(f"{label:<24} {rows:>7} rows  {elapsed * 1000:9.1f} ms  {rows / elapsed:10.0f} rows/s")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Database: {connection.vendor}")
+        try:
+            with transaction.atomic():
+                schedules, student_ids = synthetic_fixture(options['rows'])
+                schedule = schedules[0]
+                sessions = [date(2026, 1, 5 + 7 * i) for i in range(options['sessions'])]
+                total = len(student_ids) * len(sessions)
+
+                # What one POST per student to AttendanceRecordViewSet does
+                started = time.perf_counter()
+                for session_date in sessions:
+                    for student_id in student_ids:
+                        AttendanceRecord.objects.create(
+                            student_id=student_id, schedule=schedule,
+                            session_date=session_date, status='Present')
+                self._report("per-row create", total, time.perf_counter() - started)
+                AttendanceRecord.objects.filter(schedule=schedule).delete()
+
+                rows = [(student_id, 'Present') for student_id in student_ids]
+                started = time.perf_counter()
+                for session_date in sessions:
+                    AttendanceRecord.record_session(schedule, session_date, rows)
+                self._report("bulk upsert (insert)", total, time.perf_counter() - started)
+
+                rows = [(student_id, 'Late') for student_id in student_ids]
+                started = time.perf_counter()
+                for session_date in sessions:
+                    AttendanceRecord.record_session(schedule, session_date, rows)
+                self._report("bulk upsert (re-send)", total, time.perf_counter() - started)
+                raise Rollback
+        except Rollback:
+            pass
@@ -0,0 +1,72 @@
+import time
+import cv2
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from attendance.engine import AttendanceEngine, active_schedules, session_window
+from schedules.models import Schedule
+
+
+class Command(BaseCommand):
+    help = "Take attendance for a class session from a camera stream or video file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Camera index, stream URL or video file")
+        parser.add_argument('--schedule', type=int, help="Schedule id (default: the active one in --room)")
+        parser.add_argument('--room', help="Room whose active schedule to use")
+        parser.add_argument('--fps', type=float, default=4.0, help="Frames analyzed per second")
+
+    def _schedule(self, options):
+        if options['schedule']:
+            try:
+                return Schedule.objects.select_related('course').get(pk=options['schedule'])
+            except Schedule.DoesNotExist:
+                raise CommandError(f"Schedule {options['schedule']} does not exist")
+        if not options['room']:
+            raise CommandError("Pass --schedule or --room")
+        schedule = active_schedules(room=options['room']).first()
+        if schedule is None:
+            raise CommandError(f"No class in session in room {options['room']}")
+        return schedule
+
+    def handle(self, *args, **options):
+        schedule = self._schedule(options)
+        source = options['source']
+        cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+        if not cap.isOpened():
+            raise CommandError(f"Could not open {source}")
+
+        engine = AttendanceEngine(schedule)
+        _, end = session_window(schedule)
+        interval = 1.0 / options['fps']
+        self.stdout.write(f"Taking attendance for {schedule} until {timezone.localtime(end):%H:%M}")
+
+        next_frame = time.monotonic()
+        try:
+            while timezone.now() < end:
+                # Drain the capture buffer so the analyzed frame is the latest one
+                if not cap.grab():
+                    break
+                if time.monotonic() < next_frame:
+                    continue
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                next_frame = time.monotonic() + interval
+
+                started = time.perf_counter()
+                events = engine.process(frame)
+                elapsed = (time.perf_counter() - started) * 1000
+                for event in events:
+                    if event['new']:
+                        self.stdout.write(
+                            f"{event['status']}: student {event['student_id']} "
+                            f"(similarity {event['similarity']:.2f}, frame {elapsed:.0f} ms)"
+                        )
+        finally:
+            engine.close()
+            cap.release()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {engine.frames} frames, {engine.recognitions} recognitions, "
+            f"{len(engine.marked)} students marked"
+        ))
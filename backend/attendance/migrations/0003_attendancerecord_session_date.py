@@ -0,0 +1,55 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:20
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def fill_session_dates(apps, schema_editor):
+    """Date existing records by when they were taken, naming any sessions marked twice."""
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    # In the current time zone, as timezone.localdate; on PostgreSQL
+    # ``(attendance_time AT TIME ZONE <tz>)::date``
+    taken_on = TruncDate('attendance_time')
+
+    duplicates = list(
+        AttendanceRecord.objects.annotate(taken_on=taken_on)
+        .values('student_id', 'schedule_id', 'taken_on')
+        .annotate(marks=Count('pk'))
+        .filter(marks__gt=1)
+        .order_by('schedule_id', 'taken_on', 'student_id')
+    )
+    if duplicates:
+        listed = ', '.join(
+            f"student {d['student_id']} in schedule {d['schedule_id']} on {d['taken_on']} ({d['marks']})"
+            for d in duplicates[:20]
+        )
+        raise RuntimeError(f"Resolve {len(duplicates)} sessions marked more than once before migrating: {listed}")
+
+    AttendanceRecord.objects.update(session_date=taken_on)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_attendancerecord_late_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='session_date',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(fill_session_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='attendancerecord',
+            name='session_date',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AddConstraint(
+            model_name='attendancerecord',
+            constraint=models.UniqueConstraint(fields=('student', 'schedule', 'session_date'), name='unique_attendance_per_session'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_attendancerecord_session_date'),
+        ('schedules', '0002_alter_schedule_day'),
+        ('students', '0007_student_password'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='attendancerecord',
+            name='unique_attendance_per_session',
+        ),
+        migrations.AlterField(
+            model_name='attendancerecord',
+            name='schedule',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='attendance_records', to='schedules.schedule'),
+        ),
+        migrations.AlterField(
+            model_name='attendancerecord',
+            name='student',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='attendance_records', to='students.student'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['student', 'session_date'], name='attendance_student_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='attendancerecord',
+            constraint=models.UniqueConstraint(fields=('schedule', 'session_date', 'student'), name='unique_attendance_per_session'),
+        ),
+    ]
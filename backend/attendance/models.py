@@ -1,14 +1,99 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from students.models import Student  # Assuming Student model is in students app
 from schedules.models import Schedule  # Assuming Schedule model is in schedules app
+from .signals import attendance_recorded
+
+class AttendanceRecordQuerySet(models.QuerySet):
+    """
+    A class session is a schedule on a date: ``(schedule, session_date)``.
+    These filters line up with the model's composite indexes.
+    """
+
+    def for_session(self, schedule, session_date):
+        """Marks for one class session (``(schedule, session_date, student)`` index)."""
+        return self.filter(schedule=schedule, session_date=session_date)
+
+    def for_student(self, student, start=None, end=None):
+        """A student's marks, optionally within a date range (``(student, session_date)`` index)."""
+        records = self.filter(student=student)
+        if start is not None:
+            records = records.filter(session_date__gte=start)
+        if end is not None:
+            records = records.filter(session_date__lte=end)
+        return records
+
+    def sessions(self):
+        """One row per class session with its mark counts."""
+        return (
+            self.values('schedule', 'session_date')
+            .annotate(
+                present=models.Count('id', filter=models.Q(status='Present')),
+                late=models.Count('id', filter=models.Q(status='Late')),
+                absent=models.Count('id', filter=models.Q(status='Absent')),
+            )
+            .order_by('-session_date', 'schedule')
+        )
+
 
 class AttendanceRecord(models.Model):
-    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_records')
-    schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE, related_name='attendance_records')
+    STATUS_CHOICES = [('Present', 'Present'), ('Late', 'Late'), ('Absent', 'Absent')]
+
+    # The single-column FK indexes are covered by the composite indexes below
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_records', db_index=False)
+    schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE, related_name='attendance_records', db_index=False)
+    session_date = models.DateField(default=timezone.localdate)
     attendance_time = models.DateTimeField(auto_now_add=True)
-    status = models.CharField(max_length=20, choices=[('Present', 'Present'), ('Absent', 'Absent')])
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AttendanceRecordQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Also the per-session lookup index: who attended schedule X on date D
+            models.UniqueConstraint(
+                fields=['schedule', 'session_date', 'student'],
+                name='unique_attendance_per_session'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['student', 'session_date'], name='attendance_student_date_idx'),
+        ]
+
     def __str__(self):
-        return f"Attendance for {self.student.user.username} on {self.schedule.date}"
\ No newline at end of file
+        return f"Attendance for {self.student} in {self.schedule} on {self.session_date}"
+
+    @classmethod
+    def record_session(cls, schedule, session_date, rows, batch_size=1000):
+        """
+        Upsert a class session's attendance from ``(student_id, status)`` pairs.
+
+        One multi-row ``INSERT ... ON CONFLICT DO UPDATE`` per ``batch_size``
+        rows, in a single transaction, so re-sending a session is idempotent.
+        Returns ``(created, updated)``.
+        """
+        rows = list(rows)
+        records = [
+            cls(student_id=student_id, schedule=schedule, session_date=session_date, status=status)
+            for student_id, status in rows
+        ]
+        with transaction.atomic():
+            existing = cls.objects.for_session(schedule, session_date).filter(
+                student_id__in=[student_id for student_id, _ in rows]
+            ).count()
+            cls.objects.bulk_create(
+                records,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['schedule', 'session_date', 'student'],
+                update_fields=['status', 'updated_at']
+            )
+            attendance_recorded.send(
+                sender=cls,
+                schedule=schedule,
+                session_date=session_date,
+                student_ids=[student_id for student_id, _ in rows]
+            )
+        return len(records) - existing, existing
@@ -5,4 +5,12 @@ class IsInstructor(permissions.BasePermission):
     Only allow instructors to access attendance records.
     """
     def has_permission(self, request, view):
-        return request.user.role == 'Instructor'
\ No newline at end of file
+        return request.user.role == 'INSTRUCTOR'
+
+class CanExportAttendance(permissions.BasePermission):
+    """
+    Admins export any attendance, heads of department their departments'
+    and instructors only their own classes' (scoped in the view).
+    """
+    def has_permission(self, request, view):
+        return request.user.role in ['INSTRUCTOR', 'HEAD', 'ADMIN']
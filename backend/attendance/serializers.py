@@ -1,7 +1,60 @@
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
+from schedules.models import Schedule
+from students.models import Student
 from .models import AttendanceRecord
 
 class AttendanceRecordSerializer(serializers.ModelSerializer):
     class Meta:
         model = AttendanceRecord
-        fields = ['id', 'student', 'schedule', 'attendance_time', 'status', 'created_at', 'updated_at']
\ No newline at end of file
+        fields = ['id', 'student', 'schedule', 'session_date', 'attendance_time', 'status', 'created_at', 'updated_at']
+
+
+class BulkAttendanceRowSerializer(serializers.Serializer):
+    student = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=AttendanceRecord.STATUS_CHOICES)
+
+
+class BulkAttendanceSerializer(serializers.Serializer):
+    """A whole class session's attendance in one request."""
+    schedule = serializers.PrimaryKeyRelatedField(queryset=Schedule.objects.all())
+    session_date = serializers.DateField(default=timezone.localdate)
+    records = BulkAttendanceRowSerializer(many=True, allow_empty=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None:
+            # Instructors can only mark their own classes
+            self.fields['schedule'].queryset = Schedule.objects.filter(instructor__user=request.user)
+
+    def validate_records(self, records):
+        limit = settings.ATTENDANCE_BULK_MAX_ROWS
+        if len(records) > limit:
+            raise serializers.ValidationError(f"At most {limit} records per request.")
+
+        student_ids = [row['student'] for row in records]
+        if len(set(student_ids)) != len(student_ids):
+            raise serializers.ValidationError("Each student may appear only once.")
+
+        # One query for the whole session instead of one per row
+        known = set(Student.objects.filter(pk__in=student_ids).values_list('pk', flat=True))
+        unknown = sorted(set(student_ids) - known)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown students: {unknown}")
+        return records
+
+
+class AttendanceExportSerializer(serializers.Serializer):
+    """Query parameters of the attendance export."""
+    file_format = serializers.ChoiceField(choices=['csv', 'xlsx'], default='csv')
+    course = serializers.IntegerField(required=False)
+    department = serializers.IntegerField(required=False)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if data.get('start') and data.get('end') and data['start'] > data['end']:
+            raise serializers.ValidationError({'end': 'Must not be before start'})
+        return data
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent after attendance is written in bulk (bulk_create does not send
+# post_save), with ``schedule``, ``session_date`` and ``student_ids``.
+attendance_recorded = Signal()
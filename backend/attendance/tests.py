@@ -1,3 +1,486 @@
-from django.test import TestCase
+import asyncio
+import io
+import threading
+from datetime import date, time, timedelta
+from importlib import import_module
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import cv2
+import numpy as np
+
+from channels.testing import WebsocketCommunicator
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.asgi import application
+from courses.models import Course
+from departments.models import Department
+from instructors.models import Instructor
+from schedules.models import Schedule
+from students.models import Student
+from users.models import User
+
+from .consumers import frame_pool
+from .engine import AttendanceEngine
+from .export import write_xlsx, xlsx_available
+from .models import AttendanceRecord
+from .signals import attendance_recorded
+
+
+class AttendanceRecordTests(TestCase):
+    def setUp(self):
+        department = Department.objects.create(name='Physics')
+        user = User.objects.create_user(username='teacher', email='teacher@example.com', password='x', role='INSTRUCTOR')
+        instructor = Instructor.objects.create(user=user, department=department)
+        course = Course.objects.create(code='PHY101', name='Mechanics', department=department, instructor=instructor)
+        self.schedule = Schedule.objects.create(
+            course=course, instructor=instructor, day='Monday', start_time=time(9), end_time=time(10), room='A1')
+        self.ada, self.bob = [
+            Student.objects.create(first_name=name, email=f'{name}@example.com').pk for name in ('ada', 'bob')
+        ]
+        self.day = date(2026, 3, 2)
+
+    def statuses(self):
+        return dict(AttendanceRecord.objects.for_session(self.schedule, self.day).values_list('student', 'status'))
+
+    def test_record_session_upserts_the_session(self):
+        received = mock.Mock()
+        attendance_recorded.connect(received)
+        self.addCleanup(attendance_recorded.disconnect, received)
+
+        self.assertEqual(AttendanceRecord.record_session(self.schedule, self.day, [(self.ada, 'Present')]), (1, 0))
+        rows = [(self.ada, 'Late'), (self.bob, 'Absent')]
+        self.assertEqual(AttendanceRecord.record_session(self.schedule, self.day, rows, batch_size=1), (1, 1))
+        self.assertEqual(AttendanceRecord.record_session(self.schedule, self.day, rows), (0, 2))
+        self.assertEqual(self.statuses(), {self.ada: 'Late', self.bob: 'Absent'})
+        self.assertEqual(received.call_count, 3)
+        self.assertEqual(received.call_args.kwargs['student_ids'], [self.ada, self.bob])
+
+    def test_a_student_is_marked_once_per_session(self):
+        AttendanceRecord.objects.create(student_id=self.ada, schedule=self.schedule, session_date=self.day, status='Present')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AttendanceRecord.objects.create(student_id=self.ada, schedule=self.schedule, session_date=self.day, status='Late')
+        # Another day is another session
+        AttendanceRecord.objects.create(
+            student_id=self.ada, schedule=self.schedule, session_date=self.day + timedelta(days=7), status='Late')
+
+    def test_migration_dates_records_by_when_they_were_taken(self):
+        migration = import_module('attendance.migrations.0003_attendancerecord_session_date')
+        AttendanceRecord.record_session(self.schedule, self.day, [(self.ada, 'Present'), (self.bob, 'Late')])
+        migration.fill_session_dates(apps, None)
+        self.assertEqual(
+            set(AttendanceRecord.objects.values_list('session_date', flat=True)), {timezone.localdate()})
+
+    def test_migration_lists_sessions_marked_twice(self):
+        migration = import_module('attendance.migrations.0003_attendancerecord_session_date')
+        for day in (self.day, self.day + timedelta(days=7)):
+            AttendanceRecord.record_session(self.schedule, day, [(self.ada, 'Present')])
+        AttendanceRecord.record_session(self.schedule, self.day, [(self.bob, 'Present')])
+        with self.assertRaisesMessage(RuntimeError, 'Resolve 1 sessions marked more than once') as raised:
+            migration.fill_session_dates(apps, None)
+        self.assertIn(f'student {self.ada} in schedule {self.schedule.pk}', str(raised.exception))
+        # Nothing was rewritten
+        self.assertEqual(AttendanceRecord.objects.filter(session_date=self.day).count(), 2)
+
+
+class FakeEngine:
+    # Patched by a test to see analysis start and hold it until the gate is set
+    started = None
+    gate = None
+
+    def __init__(self, schedule):
+        self.schedule = schedule
+        self.late_after = schedule.start_time
+        self.marked = set()
+
+    def process(self, frame):
+        if self.started is not None:
+            self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        return []
+
+    def close(self):
+        pass
+
+
+def stream_config(**config):
+    return override_settings(ATTENDANCE_STREAM_CONFIG={'require_active': False, **config})
+
+
+FRAME = cv2.imencode('.jpg', np.zeros((16, 16, 3), dtype=np.uint8))[1].tobytes()
+
+
+@override_settings(ATTENDANCE_STREAM_CONFIG={'require_active': False})
+class AttendanceFrameConsumerTests(TransactionTestCase):
+    """Sockets run the lookup on pool threads, so the data must be committed."""
+
+    def setUp(self):
+        department = Department.objects.create(name='Physics')
+        self.owner, self.other = [
+            User.objects.create_user(username=name, email=f'{name}@example.com', password='x', role='INSTRUCTOR')
+            for name in ('owner', 'other')
+        ]
+        instructor = Instructor.objects.create(user=self.owner, department=department)
+        Instructor.objects.create(user=self.other, department=department)
+        course = Course.objects.create(code='PHY101', name='Mechanics', department=department, instructor=instructor)
+        self.schedule = Schedule.objects.create(
+            course=course, instructor=instructor, day='Monday',
+            start_time=time(9), end_time=time(10), room='A1',
+        )
+
+    async def connect(self, user):
+        token = AccessToken.for_user(user)
+        communicator = WebsocketCommunicator(application, f'/ws/attendance/{self.schedule.pk}/?token={token}')
+        return communicator, await communicator.connect()
+
+    async def test_another_instructors_schedule_is_rejected(self):
+        communicator, (connected, code) = await self.connect(self.other)
+        self.assertFalse(connected)
+        self.assertEqual(code, 4404)
+
+    @mock.patch('attendance.engine.AttendanceEngine', FakeEngine)
+    async def test_own_schedule_is_accepted(self):
+        communicator, (connected, _) = await self.connect(self.owner)
+        self.assertTrue(connected)
+        started = await communicator.receive_json_from()
+        self.assertEqual(started['schedule_id'], self.schedule.pk)
+        await communicator.disconnect()
+
+    @stream_config(require_active=True)
+    @mock.patch('attendance.engine.AttendanceEngine', FakeEngine)
+    async def test_schedules_out_of_session_are_rejected_when_required(self):
+        with mock.patch('attendance.engine.active_schedules', return_value=Schedule.objects.none()):
+            _, (connected, code) = await self.connect(self.owner)
+        self.assertEqual((connected, code), (False, 4404))
+
+        with mock.patch('attendance.engine.active_schedules', return_value=Schedule.objects.all()):
+            communicator, (connected, _) = await self.connect(self.owner)
+        self.assertTrue(connected)
+        await communicator.disconnect()
+
+    @stream_config(max_frame_bytes=len(FRAME))
+    @mock.patch('attendance.engine.AttendanceEngine', FakeEngine)
+    async def test_oversized_frames_close_the_socket(self):
+        communicator, _ = await self.connect(self.owner)
+        await communicator.receive_json_from()
+        await communicator.send_to(bytes_data=FRAME)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'recognition')
+
+        await communicator.send_to(bytes_data=FRAME + b'\0')
+        self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': 1009})
+
+    @stream_config(max_frame_age_ms=-1)
+    @mock.patch('attendance.engine.AttendanceEngine', FakeEngine)
+    async def test_frames_past_their_age_are_dropped(self):
+        communicator, _ = await self.connect(self.owner)
+        await communicator.receive_json_from()
+        await communicator.send_to(bytes_data=FRAME)
+        self.assertTrue(await communicator.receive_nothing(timeout=0.3))
+        await communicator.disconnect()
+
+    @stream_config(max_frame_age_ms=10000)
+    @mock.patch('attendance.engine.AttendanceEngine', FakeEngine)
+    @mock.patch.object(FakeEngine, 'gate', threading.Event())
+    @mock.patch.object(FakeEngine, 'started', threading.Event())
+    async def test_a_newer_frame_replaces_the_waiting_one(self):
+        self.addCleanup(FakeEngine.gate.set)
+        communicator, _ = await self.connect(self.owner)
+        await communicator.receive_json_from()
+
+        await communicator.send_to(bytes_data=FRAME)
+        while not FakeEngine.started.is_set():
+            await asyncio.sleep(0.01)
+        # Frame 2 waits behind frame 1 until frame 3 replaces it
+        for _ in range(2):
+            await communicator.send_to(bytes_data=FRAME)
+        await asyncio.sleep(0.1)
+        FakeEngine.gate.set()
+
+        results = [await communicator.receive_json_from() for _ in range(2)]
+        self.assertEqual([(r['frame'], r['dropped']) for r in results], [(1, 1), (3, 1)])
+        await communicator.disconnect()
+
+    def test_workers_size_the_frame_pool(self):
+        with stream_config(workers=3), mock.patch('attendance.consumers._pool', None):
+            pool = frame_pool()
+            self.assertIs(frame_pool(), pool)
+        pool.shutdown()
+        self.assertEqual(pool._max_workers, 3)
+
+
+class BulkAttendanceTests(TestCase):
+    url = '/api/attendance/attendance-records/bulk/'
+
+    def setUp(self):
+        department = Department.objects.create(name='Physics')
+        self.owner, self.other = [
+            User.objects.create_user(username=name, email=f'{name}@example.com', password='x', role='INSTRUCTOR')
+            for name in ('owner', 'other')
+        ]
+        instructor = Instructor.objects.create(user=self.owner, department=department)
+        Instructor.objects.create(user=self.other, department=department)
+        course = Course.objects.create(code='PHY101', name='Mechanics', department=department, instructor=instructor)
+        self.schedule = Schedule.objects.create(
+            course=course, instructor=instructor, day='Monday', start_time=time(9), end_time=time(10), room='A1')
+        self.students = [
+            Student.objects.create(first_name=name, email=f'{name}@example.com').pk for name in ('ada', 'bob', 'cy')
+        ]
+
+    def post(self, records, user=None):
+        client = APIClient()
+        client.force_authenticate(user or self.owner)
+        payload = {'schedule': self.schedule.pk, 'session_date': '2026-03-02', 'records': records}
+        return client.post(self.url, payload, format='json')
+
+    def rows(self, status='Present'):
+        return [{'student': student, 'status': status} for student in self.students]
+
+    def test_a_session_is_recorded_and_resent_idempotently(self):
+        response = self.post(self.rows())
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['updated']), (3, 0))
+
+        response = self.post(self.rows('Late'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated']), (0, 3))
+        self.assertEqual(set(AttendanceRecord.objects.values_list('status', flat=True)), {'Late'})
+        self.assertEqual(AttendanceRecord.objects.count(), 3)
+
+    @override_settings(ATTENDANCE_BULK_MAX_ROWS=2)
+    def test_requests_over_the_row_cap_are_refused(self):
+        response = self.post(self.rows())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['records'], ['At most 2 records per request.'])
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_errors_name_the_offending_rows(self):
+        rows = self.rows()
+        rows[1]['status'] = 'Asleep'
+        del rows[2]['student']
+        response = self.post(rows)
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['records']
+        self.assertEqual(errors[0], {})
+        self.assertEqual(list(errors[1]), ['status'])
+        self.assertEqual(list(errors[2]), ['student'])
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_unknown_and_repeated_students_are_refused(self):
+        response = self.post(self.rows() + [{'student': 0, 'status': 'Present'}])
+        self.assertEqual(response.data['records'], ['Unknown students: [0]'])
+        response = self.post(self.rows() + self.rows()[:1])
+        self.assertEqual(response.data['records'], ['Each student may appear only once.'])
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_other_instructors_schedules_are_refused(self):
+        response = self.post(self.rows(), user=self.other)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('schedule', response.data)
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+
+class AttendanceExportTests(TestCase):
+    url = '/api/attendance/attendance-records/export/'
+
+    def setUp(self):
+        self.head = User.objects.create_user(username='head', email='head@example.com', password='x', role='HEAD')
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='ADMIN')
+        physics = Department.objects.create(name='Physics', head_of_department=self.head)
+        chemistry = Department.objects.create(name='Chemistry')
+        teacher = User.objects.create_user(username='teacher', email='teacher@example.com', password='x', role='INSTRUCTOR')
+        instructor = Instructor.objects.create(user=teacher, department=physics)
+        student = Student.objects.create(first_name='Ada', email='ada@example.com')
+        for department, code in ((physics, 'PHY101'), (chemistry, 'CHE101')):
+            course = Course.objects.create(code=code, name=code, department=department, instructor=instructor)
+            schedule = Schedule.objects.create(
+                course=course, instructor=instructor, day='Monday',
+                start_time=time(9 if code == 'PHY101' else 11), end_time=time(10 if code == 'PHY101' else 12), room=code,
+            )
+            AttendanceRecord.objects.create(student=student, schedule=schedule, session_date=date(2026, 3, 2), status='Present')
+
+    def exported_courses(self, content):
+        lines = content.decode().splitlines()
+        self.assertEqual(lines[0].split(',')[1], 'course_code')
+        return sorted(line.split(',')[1] for line in lines[1:])
+
+    def export(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return self.exported_courses(b''.join(response.streaming_content))
+
+    def test_head_exports_only_their_departments(self):
+        self.assertEqual(self.export(self.head), ['PHY101'])
+
+    def test_admin_exports_every_department(self):
+        self.assertEqual(self.export(self.admin), ['CHE101', 'PHY101'])
+
+    @mock.patch('attendance.views.xlsx_available', return_value=True)
+    def test_xlsx_over_the_sheet_limit_is_refused(self, available):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with override_settings(ATTENDANCE_EXPORT_CONFIG={'max_xlsx_rows': 1}), \
+                mock.patch('attendance.views.write_xlsx') as write_xlsx:
+            response = client.get(self.url, {'file_format': 'xlsx'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('at most 1 rows', response.data['file_format'])
+            write_xlsx.assert_not_called()
+
+            # The head's export fits
+            client.force_authenticate(self.head)
+            write_xlsx.return_value = io.BytesIO(b'xlsx')
+            response = client.get(self.url, {'file_format': 'xlsx'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(list(write_xlsx.call_args.args[0])), 1)
+
+    async def test_asgi_export_streams_asynchronously(self):
+        token = AccessToken.for_user(self.admin)
+        response = await self.async_client.get(self.url, headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        content = b''.join([part async for part in response.streaming_content])
+        self.assertEqual(self.exported_courses(content), ['CHE101', 'PHY101'])
+
+
+@skipUnless(xlsx_available(), 'XLSX export needs openpyxl')
+class WriteXlsxTests(SimpleTestCase):
+    @override_settings(ATTENDANCE_EXPORT_CONFIG={'max_xlsx_rows': 2})
+    def test_rows_past_the_limit_are_refused(self):
+        write_xlsx([(1,), (2,)]).close()
+        with self.assertRaisesMessage(ValueError, 'at most 2 rows'):
+            write_xlsx([(1,), (2,), (3,)])
+
+
+class ScriptedDetector:
+    """Returns the faces set for the next frame: ``(student_id, x, y, size)``."""
+
+    def __init__(self):
+        self.faces = []
+
+    def detect(self, frame, max_num=0):
+        bboxes = np.array([[x, y, x + size, y + size, 0.99] for _, x, y, size in self.faces], dtype=np.float32)
+        # The student id rides in the landmarks, through the crop, into the embedding
+        kpss = np.array([np.full((5, 2), student_id) for student_id, *_ in self.faces], dtype=np.float32)
+        return bboxes.reshape(-1, 5), kpss.reshape(-1, 5, 2)
+
+
+class IdEmbedder:
+    input_size = (112, 112)
+
+    def __init__(self):
+        self.batches = []
+
+    def get_feat(self, crops):
+        self.batches.append(len(crops))
+        return np.array([[crop[0, 0]] for crop in crops], dtype=np.float32)
+
+
+def match_by_id(embeddings, k=1, candidates=None, group=None):
+    return [[(int(e[0]), 0.9)] if e[0] > 0 else [] for e in embeddings]
+
+
+class AttendanceEngineTests(TestCase):
+    config = {'min_sightings': 2, 'flush_size': 100, 'flush_seconds': 3600, 'min_face_size': 24}
+
+    def setUp(self):
+        department = Department.objects.create(name='Physics')
+        user = User.objects.create_user(username='teacher', email='teacher@example.com', password='x', role='INSTRUCTOR')
+        instructor = Instructor.objects.create(user=user, department=department)
+        course = Course.objects.create(code='PHY101', name='Mechanics', department=department, instructor=instructor)
+        self.schedule = Schedule.objects.create(
+            course=course, instructor=instructor, day='Monday', start_time=time(9), end_time=time(10), room='A1')
+        self.students = [
+            Student.objects.create(first_name=name, email=f'{name}@example.com', department=department).pk
+            for name in ('ada', 'bob', 'cy')
+        ]
+        self.day = date(2026, 3, 2)
+
+        self.detector, self.embedder = ScriptedDetector(), IdEmbedder()
+        analyzer = mock.Mock(det_model=self.detector, models={'recognition': self.embedder})
+        self.search = mock.Mock(side_effect=match_by_id)
+        for target, value in (
+            ('attendance.engine.registry.get', mock.Mock(return_value=analyzer)),
+            ('attendance.engine.search_students', self.search),
+            ('insightface.utils.face_align.norm_crop', lambda frame, landmark, image_size: landmark),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def engine(self, **config):
+        return AttendanceEngine(self.schedule, date=self.day, config={**self.config, **config})
+
+    def frame(self, engine, faces, minutes=1):
+        self.detector.faces = faces
+        return engine.process(np.zeros((480, 640, 3), dtype=np.uint8), engine.start + timedelta(minutes=minutes))
+
+    def test_students_are_confirmed_after_agreeing_sightings(self):
+        engine = self.engine()
+        ada = self.students[0]
+        self.assertEqual(self.frame(engine, [(ada, 100, 100, 80)]), [])
+        events = self.frame(engine, [(ada, 104, 102, 80)])
+        self.assertEqual([(e['student_id'], e['status'], e['new']) for e in events], [(ada, 'Present', True)])
+        # Confirmed tracks are only followed, not recognized again
+        self.assertEqual(self.frame(engine, [(ada, 108, 104, 80)]), [])
+        self.assertEqual(engine.recognitions, 2)
+        self.assertEqual(len(engine.tracks), 1)
+
+    def test_faces_of_a_frame_are_recognized_in_one_batch(self):
+        engine = self.engine()
+        self.frame(engine, [(student, 100 + 150 * i, 100, 80) for i, student in enumerate(self.students)])
+        self.assertEqual(self.embedder.batches, [3])
+        self.search.assert_called_once()
+        self.assertEqual(self.search.call_args.kwargs['group'], ('course', self.schedule.course_id))
+        self.assertCountEqual(self.search.call_args.kwargs['candidates'], self.students)
+
+    def test_recognitions_per_frame_are_capped(self):
+        engine = self.engine(max_recognitions_per_frame=2)
+        faces = [(student, 100 + 150 * i, 100, 80) for i, student in enumerate(self.students)]
+        self.frame(engine, faces)
+        self.frame(engine, faces)
+        self.assertEqual(self.embedder.batches, [2, 2])
+
+    def test_small_faces_and_expired_tracks_are_dropped(self):
+        engine = self.engine(track_ttl_seconds=-1)
+        ada = self.students[0]
+        self.frame(engine, [(ada, 100, 100, 80), (self.students[1], 300, 100, 10)])
+        self.assertEqual(self.embedder.batches, [1])
+        # Every frame starts a new track, so sightings never add up
+        self.assertEqual(self.frame(engine, [(ada, 100, 100, 80)]), [])
+        self.assertEqual([track.hits for track in engine.tracks], [1])
+
+    def test_late_arrivals_are_marked_late(self):
+        engine = self.engine()
+        ada = self.students[0]
+        self.frame(engine, [(ada, 100, 100, 80)], minutes=30)
+        events = self.frame(engine, [(ada, 100, 100, 80)], minutes=30)
+        self.assertEqual(events[0]['status'], 'Late')
+
+    def test_flush_writes_once_and_signals_the_students(self):
+        received = mock.Mock()
+        attendance_recorded.connect(received)
+        self.addCleanup(attendance_recorded.disconnect, received)
+
+        ada, bob, cy = self.students
+        # Already marked when the engine starts, and by another stream meanwhile
+        AttendanceRecord.objects.create(student_id=cy, schedule=self.schedule, session_date=self.day, status='Present')
+        engine = self.engine()
+        faces = [(ada, 100, 100, 80), (bob, 300, 100, 80), (cy, 500, 100, 80)]
+        self.frame(engine, faces)
+        events = self.frame(engine, faces)
+        self.assertEqual({e['student_id']: e['new'] for e in events}, {ada: True, bob: True, cy: False})
+        AttendanceRecord.objects.create(student_id=bob, schedule=self.schedule, session_date=self.day, status='Late')
+
+        self.assertEqual(engine.flush(), 2)
+        self.assertEqual(engine.flush(), 0)
+        statuses = dict(AttendanceRecord.objects.for_session(self.schedule, self.day).values_list('student', 'status'))
+        self.assertEqual(statuses, {ada: 'Present', bob: 'Late', cy: 'Present'})
+        received.assert_called_once()
+        self.assertCountEqual(received.call_args.kwargs['student_ids'], [ada, bob])
+        self.assertEqual(received.call_args.kwargs['session_date'], self.day)
@@ -1,13 +1,89 @@
-from rest_framework import viewsets, permissions
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from django_filters.rest_framework import DjangoFilterBackend
+from .export import astream_csv, export_config, export_records, export_rows, stream_csv, write_xlsx, xlsx_available
 from .models import AttendanceRecord
-from .serializers import AttendanceRecordSerializer
-from .permissions import IsInstructor  # Custom permission to restrict access to instructors
+from .serializers import AttendanceExportSerializer, AttendanceRecordSerializer, BulkAttendanceSerializer
+from .permissions import CanExportAttendance, IsInstructor  # Custom permission to restrict access to instructors
 
 class AttendanceRecordViewSet(viewsets.ModelViewSet):
     queryset = AttendanceRecord.objects.all()
     serializer_class = AttendanceRecordSerializer
     permission_classes = [permissions.IsAuthenticated, IsInstructor]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['schedule', 'session_date', 'student', 'status']
 
     def get_queryset(self):
         # Only allow instructors to access attendance records for their courses
-        return AttendanceRecord.objects.filter(schedule__instructor__user=self.request.user)
\ No newline at end of file
+        return AttendanceRecord.objects.filter(schedule__instructor__user=self.request.user)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Record a whole session: ``{"schedule", "session_date", "records":
+        [{"student", "status"}, ...]}``. Re-sending the same session updates
+        the existing marks instead of duplicating them.
+        """
+        serializer = BulkAttendanceSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        created, updated = AttendanceRecord.record_session(
+            data['schedule'],
+            data['session_date'],
+            [(row['student'], row['status']) for row in data['records']]
+        )
+        return Response({
+            'schedule': data['schedule'].pk,
+            'session_date': data['session_date'],
+            'created': created,
+            'updated': updated,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated, CanExportAttendance])
+    def export(self, request):
+        """
+        Download attendance as CSV (streamed) or XLSX with
+        ``?file_format=``. Filters: course, department, start, end.
+        """
+        serializer = AttendanceExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        records = AttendanceRecord.objects.all()
+        if request.user.role == 'INSTRUCTOR':
+            records = records.filter(schedule__instructor__user=request.user)
+        elif request.user.role == 'HEAD':
+            records = records.filter(schedule__course__department__head_of_department=request.user)
+        records = export_records(
+            records,
+            course=params.get('course'),
+            department=params.get('department'),
+            start=params.get('start'),
+            end=params.get('end'),
+        )
+        filename = f"attendance-{timezone.localdate().isoformat()}.{params['file_format']}"
+
+        if params['file_format'] == 'xlsx':
+            if not xlsx_available():
+                return Response(
+                    {'file_format': 'XLSX export needs openpyxl; use csv.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            max_rows = export_config()['max_xlsx_rows']
+            if records.count() > max_rows:
+                return Response(
+                    {'file_format': f'XLSX export holds at most {max_rows} rows; narrow the filters or use csv.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return FileResponse(write_xlsx(export_rows(records)), as_attachment=True, filename=filename)
+
+        # ASGI servers read a sync iterator to the end before sending it
+        stream = astream_csv if isinstance(request._request, ASGIRequest) else stream_csv
+        response = StreamingHttpResponse(stream(export_rows(records)), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
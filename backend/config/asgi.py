@@ -2,17 +2,30 @@
 
 import os
 from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+# Initialize Django before importing consumers, which import models
+django_asgi_app = get_asgi_application()
+
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
-from schedules.consumers import ScheduleNotificationConsumer
-
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'facial_attendance_system.settings')
+from config.middleware import JWTAuthMiddleware
+from analytics.routing import websocket_urlpatterns as analytics_websocket_urlpatterns
+from attendance.routing import websocket_urlpatterns as attendance_websocket_urlpatterns
+from facial_data.routing import websocket_urlpatterns as facial_data_websocket_urlpatterns
+from schedules.routing import websocket_urlpatterns as schedules_websocket_urlpatterns
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
-        URLRouter({
-            "ws/schedule_notifications/": ScheduleNotificationConsumer.as_asgi(),
-        })
+        JWTAuthMiddleware(
+            URLRouter([
+                *schedules_websocket_urlpatterns,
+                *analytics_websocket_urlpatterns,
+                *attendance_websocket_urlpatterns,
+                *facial_data_websocket_urlpatterns,
+            ])
+        )
     ),
 })
@@ -0,0 +1,44 @@
+"""
+Channel layer group names.
+
+Pushes go to the narrowest audience that needs them: one department, one
+instructor or one course, per topic, so a socket only receives what it
+subscribed to. The topic's ``all`` group hears everything, for admins.
+
+Senders and consumers build names only through these helpers so they
+cannot drift apart. Channels accepts ASCII letters, digits, hyphens,
+underscores and periods, under 100 characters.
+"""
+from typing import List, Optional
+
+SCHEDULES = 'schedules'
+ATTENDANCE_ALERTS = 'attendance_alerts'
+
+
+def all_group(topic: str = SCHEDULES) -> str:
+    return f"{topic}.all"
+
+
+def department_group(department_id, topic: str = SCHEDULES) -> str:
+    return f"{topic}.department.{department_id}"
+
+
+def instructor_group(instructor_id, topic: str = SCHEDULES) -> str:
+    return f"{topic}.instructor.{instructor_id}"
+
+
+def course_group(course_id, topic: str = SCHEDULES) -> str:
+    return f"{topic}.course.{course_id}"
+
+
+def audience_groups(department_id: Optional[int] = None, instructor_id: Optional[int] = None,
+                    course_id: Optional[int] = None, topic: str = SCHEDULES) -> List[str]:
+    """Every group that should hear about something in this department, instructor and course."""
+    groups = [all_group(topic)]
+    if department_id is not None:
+        groups.append(department_group(department_id, topic))
+    if instructor_id is not None:
+        groups.append(instructor_group(instructor_id, topic))
+    if course_id is not None:
+        groups.append(course_group(course_id, topic))
+    return groups
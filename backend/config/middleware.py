@@ -1,3 +1,13 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+
 class CorsMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -6,4 +16,41 @@ class CorsMiddleware:
         response = self.get_response(request)
         response['Access-Control-Allow-Origin'] = 'http://localhost:5173'
         response['Access-Control-Allow-Credentials'] = 'true'
-        return response
\ No newline at end of file
+        return response
+
+
+def _websocket_token(scope):
+    """Access token from ``?token=`` or an ``Authorization: Bearer`` header."""
+    params = parse_qs(scope.get('query_string', b'').decode())
+    if params.get('token'):
+        return params['token'][0]
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            kind, _, token = value.decode().partition(' ')
+            if kind.lower() == 'bearer' and token:
+                return token.strip()
+    return None
+
+
+@database_sync_to_async
+def _user_for_token(raw_token):
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates WebSocket connections with the same access tokens as the
+    REST API. Browsers cannot set headers on a WebSocket, so the token is
+    usually passed as ``?token=``. Without a token the session user set by
+    ``AuthMiddlewareStack`` is kept; an invalid one makes the user anonymous.
+    """
+
+    async def __call__(self, scope, receive, send):
+        raw_token = _websocket_token(scope)
+        if raw_token is not None:
+            scope = dict(scope, user=await _user_for_token(raw_token))
+        return await super().__call__(scope, receive, send)
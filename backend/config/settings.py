@@ -1,5 +1,7 @@
 import os
+import sys
 from datetime import timedelta
+from celery.schedules import crontab
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -22,6 +24,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'django_filters',
     'facial_data',
     'rest_framework_simplejwt',
     'corsheaders',  # Add this
@@ -40,18 +43,39 @@ INSTALLED_APPS = [
 
 
 
+# Channel layer; group names are built in config/channel_groups.py.
+# Listing several Redis hosts shards channels and groups across them by
+# consistent hashing. The 'memory' profile is a single-process layer for
+# tests and local runs without Redis, the default under `manage.py test`;
+# pick one explicitly with the CHANNEL_LAYER_PROFILE environment variable.
+CHANNEL_LAYER_PROFILES = {
+    'redis': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {
+            'hosts': ['redis://127.0.0.1:6379/1'],  # one entry per shard
+            'prefix': 'asgi',
+            'capacity': 1000,        # messages queued per channel before ChannelFull
+            'expiry': 60,            # seconds an undelivered message is kept
+            'group_expiry': 86400,   # seconds a group membership lasts without a reconnect
+        },
+    },
+    'memory': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        'CONFIG': {
+            'capacity': 1000,
+            'expiry': 60,
+            'group_expiry': 86400,
+        },
+    },
+}
+CHANNEL_LAYER_PROFILE = os.environ.get(
+    'CHANNEL_LAYER_PROFILE', 'memory' if sys.argv[1:2] == ['test'] else 'redis')
 CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'django_redis.cache.RedisCache',
-        'LOCATION': 'redis://127.0.0.1:6379/1',  # Ensure Redis is running locally
-        'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-        }
-    }
+    'default': CHANNEL_LAYER_PROFILES[CHANNEL_LAYER_PROFILE],
 }
 
 
-ASGI_APPLICATION = "facial_attendance_system.asgi.application"
+ASGI_APPLICATION = "config.asgi.application"
 
 
 # settings.py
@@ -59,6 +83,19 @@ CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
+# Liveness jobs take seconds each: hand a worker one at a time and only
+# acknowledge once done, so a crashed worker's job is redelivered
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ACKS_LATE = True
+# Periodic tasks live in django_celery_beat's tables; entries below are
+# synced into them when beat starts and can then be tuned in the admin
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'detect-at-risk-students': {
+        'task': 'analytics.tasks.detect_at_risk_students_task',
+        'schedule': crontab(hour=6, minute=0),
+    },
+}
 
 
 MIDDLEWARE = [
@@ -104,6 +141,33 @@ DATABASES = {
     }
 }
 
+# Shared cache for data every worker reads often (e.g. analytics.rules_cache)
+# 'default' stays process-local. The 'rules' cache must be shared by all
+# workers: Redis at RULES_CACHE_URL, or a local-memory cache when that is
+# set empty (single-process runs without Redis, the default under
+# `manage.py test`).
+RULES_CACHE_URL = os.environ.get(
+    'RULES_CACHE_URL', '' if sys.argv[1:2] == ['test'] else 'redis://127.0.0.1:6379/2')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'rules': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': RULES_CACHE_URL,
+    } if RULES_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'attendance-rules',
+    },
+}
+
+# Cached AttendanceRule lookups (see analytics.rules_cache)
+ATTENDANCE_RULES_CACHE = {
+    'alias': 'rules',    # CACHES entry shared by all workers
+    'local_ttl': 5.0,    # seconds a process trusts its copy; bounds staleness after an edit
+    'timeout': 3600,     # lifetime of the cached rules in the shared cache
+}
+
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
 
@@ -140,6 +204,140 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
 
+# Face models (InsightFace pack + anti-spoofing ONNX model)
+INSIGHTFACE_MODEL_CONFIG = {
+    'model_name': 'buffalo_l',
+    'root_path': os.path.join(BASE_DIR, 'models'),
+    'providers': ['CPUExecutionProvider'],
+    # Models loaded once per worker at startup instead of on first request,
+    # e.g. ['face_cascade', 'eye_cascade', 'face_analyzer', 'antispoofing']
+    'preload': [],
+    # Model file per InsightFace module in the pack, so profiles can open
+    # only the files they need
+    'module_files': {
+        'detection': 'det_10g.onnx',
+        'landmark_2d_106': '2d106det.onnx',
+        'landmark_3d_68': '1k3d68.onnx',
+        'genderage': 'genderage.onnx',
+        'recognition': 'w600k_r50.onnx',
+    },
+    # Detection input size and InsightFace modules loaded per use case. Leaving
+    # out genderage (and landmarks where unused) saves memory and latency.
+    'profiles': {
+        'default': {
+            'det_size': (640, 640),
+            'allowed_modules': None,  # the whole pack
+        },
+        'enrollment': {
+            'det_size': (640, 640),
+            'allowed_modules': ['detection', 'recognition'],
+        },
+        'liveness': {
+            'det_size': (320, 320),
+            'allowed_modules': ['detection', 'landmark_3d_68'],
+        },
+        'attendance': {
+            'det_size': (640, 640),  # whole lecture hall; small faces need the resolution
+            'allowed_modules': ['detection', 'recognition'],
+        },
+    },
+    # ONNX Runtime session tuning (see facial_data.services.sessions).
+    # 'auto' threads = CPU cores // WEB_CONCURRENCY worker processes.
+    'session_options': {
+        'graph_optimization_level': 'all',  # disable | basic | extended | all
+        'execution_mode': 'sequential',     # sequential | parallel
+        'intra_op_num_threads': 'auto',
+        'inter_op_num_threads': 1,
+        'enable_cpu_mem_arena': True,
+        'enable_mem_pattern': True,
+        # Graphs optimized up to 'extended' are cached here for the anti-spoofing
+        # model and the InsightFace modules; None disables the cache
+        'optimized_model_dir': os.path.join(BASE_DIR, 'models', 'optimized'),
+    },
+}
+
+# 1:N face identification index (see facial_data.embeddings)
+FACE_INDEX_CONFIG = {
+    'enroll_embeddings': True,  # store an embedding when a student is verified
+    'sync_seconds': 30,         # how often workers pick up other workers' enrollments
+    'backend': 'exact',         # 'exact' or 'ivf' (approximate, for campus-scale rosters)
+    'nlist': None,              # IVF lists; None = sqrt(number of embeddings)
+    'nprobe': 8,                # IVF lists scanned per query (recall vs latency)
+    'min_train_size': 4096,     # below this the IVF backend searches exactly
+    'index_dir': os.path.join(BASE_DIR, 'models', 'face_index'),  # mmap snapshot; None disables
+}
+
+# Live classroom attendance (see attendance.engine.AttendanceEngine)
+ATTENDANCE_ENGINE_CONFIG = {
+    'profile': 'attendance',          # INSIGHTFACE_MODEL_CONFIG profile
+    'match_threshold': 0.4,           # minimum cosine similarity for a match
+    'min_sightings': 2,               # agreeing matches before a student is marked
+    'min_face_size': 24,              # pixels; smaller faces are not recognized
+    'max_recognitions_per_frame': 32, # caps per-frame cost; the rest wait a frame
+    'track_iou': 0.3,                 # box overlap that continues a face track
+    'track_ttl_seconds': 3.0,
+    'flush_seconds': 5.0,             # records are bulk-written at least this often
+    'flush_size': 50,
+    'early_minutes': 10,              # a session accepts frames this early
+}
+
+# Largest session accepted by POST /api/attendance/attendance-records/bulk/
+ATTENDANCE_BULK_MAX_ROWS = 2000
+
+# Schedule change notifications (see schedules.notifications)
+SCHEDULE_NOTIFICATION_CONFIG = {
+    'window_ms': 250,   # changes committed within this window go out together; 0 sends at once
+    'max_batch': 100,   # changes per channel message
+}
+
+# Largest timetable accepted by POST /api/schedules/import/
+SCHEDULE_IMPORT_MAX_ROWS = 10000
+
+# GET /api/attendance/attendance-records/export/ (see attendance.export)
+ATTENDANCE_EXPORT_CONFIG = {
+    'chunk_size': 2000,                 # rows fetched per server-side cursor round trip
+    'lines_per_block': 500,             # CSV lines per streamed block
+    'spool_bytes': 8 * 1024 * 1024,     # XLSX kept in memory up to this size, then on disk
+    'max_xlsx_rows': 1048575,           # Excel's sheet limit less the header; larger exports must be CSV
+}
+
+# Camera frames over WebSocket (see attendance.consumers.AttendanceFrameConsumer)
+ATTENDANCE_STREAM_CONFIG = {
+    'workers': 2,                          # frames decoded/analyzed concurrently per process
+    'max_frame_bytes': 2 * 1024 * 1024,    # larger messages close the socket (1009)
+    'max_frame_age_ms': 500,               # older frames are dropped, never queued
+    'require_active': True,                # only accept schedules currently in session
+}
+
+# At-risk student detection (see analytics.alerts)
+ATTENDANCE_ALERT_CONFIG = {
+    'min_records': 3,    # marks a student needs in a course before being judged
+    'batch_size': 200,   # alerts per channel message and per bulk write
+    'notify': True,      # push new/escalated alerts over the channel layer
+}
+
+# Liveness verification jobs (see facial_data.tasks)
+LIVENESS_JOB_CONFIG = {
+    # Queue uploaded videos for Celery and answer 202 + job id. The worker
+    # decodes the stored file, so analysis no longer overlaps the upload;
+    # False analyzes in the request while the video streams in
+    # (facial_data.streaming.LivenessStreamUploadHandler).
+    'async': True,
+    # Loaded once per worker process at startup instead of on the first job
+    'worker_preload': ['face_cascade', 'eye_cascade', 'liveness_detector'],
+}
+
+# Frame sampling for liveness videos (see facial_data.liveness.SamplingPolicy)
+LIVENESS_SAMPLING_POLICY = {
+    'stride': 1,
+    'interval_ms': 0,
+    'max_stride': 3,              # up to every 3rd frame while nothing changes
+    'max_analyzed_frames': 90,    # bounds the analysis and lets it stop once settled
+    'early_exit': True,
+}
+
+
+
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -148,8 +346,6 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Allow access to all endpoints by default
     ],
-}
-REST_FRAMEWORK = {
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
         'rest_framework.parsers.FormParser',
@@ -0,0 +1,55 @@
+import os
+import runpy
+import sys
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, TransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.asgi import application
+from config.channel_groups import all_group
+from users.models import User
+
+
+def load_settings(argv, **environ):
+    """A fresh copy of the settings module under ``argv`` and ``environ``."""
+    env = {key: value for key, value in os.environ.items() if key != 'CHANNEL_LAYER_PROFILE'}
+    env.update(environ)
+    with mock.patch.dict(os.environ, env, clear=True), mock.patch.object(sys, 'argv', argv):
+        return runpy.run_path(os.path.join(os.path.dirname(__file__), 'settings.py'))
+
+
+class ChannelLayerProfileTests(SimpleTestCase):
+    def test_tests_default_to_the_in_memory_layer(self):
+        layers = load_settings(['manage.py', 'test'])['CHANNEL_LAYERS']
+        self.assertEqual(layers['default']['BACKEND'], 'channels.layers.InMemoryChannelLayer')
+
+    def test_servers_default_to_redis(self):
+        layers = load_settings(['daphne'])['CHANNEL_LAYERS']
+        self.assertEqual(layers['default']['BACKEND'], 'channels_redis.core.RedisChannelLayer')
+
+    def test_environment_picks_the_profile(self):
+        layers = load_settings(['manage.py', 'test'], CHANNEL_LAYER_PROFILE='redis')['CHANNEL_LAYERS']
+        self.assertEqual(layers['default']['CONFIG']['prefix'], 'asgi')
+
+    def test_suite_runs_on_the_in_memory_layer(self):
+        self.assertIsInstance(get_channel_layer(), InMemoryChannelLayer)
+
+
+class GroupSendTests(TransactionTestCase):
+    async def test_group_send_reaches_a_subscribed_socket(self):
+        admin = await sync_to_async(User.objects.create_user)(
+            username='admin', email='admin@example.com', password='x', role='ADMIN')
+        communicator = WebsocketCommunicator(
+            application, f'/ws/schedule_notifications/?token={AccessToken.for_user(admin)}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await get_channel_layer().group_send(all_group(), {
+            'type': 'schedule.notification', 'group': all_group(), 'content': {'message': 'hello'},
+        })
+        self.assertEqual(await communicator.receive_json_from(timeout=2), {'message': 'hello'})
+        await communicator.disconnect()
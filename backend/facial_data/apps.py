@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class FacialDataConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'facial_data'
+
+    def ready(self):
+        from .registry import registry
+
+        preload = getattr(settings, 'INSIGHTFACE_MODEL_CONFIG', {}).get('preload')
+        if preload:
+            registry.preload(preload)
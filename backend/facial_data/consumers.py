@@ -0,0 +1,42 @@
+import json
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from .models import LivenessJob
+from .serializers import LivenessJobSerializer
+
+
+class LivenessJobConsumer(AsyncWebsocketConsumer):
+    """
+    Pushes a liveness job's status changes to the user who submitted it;
+    sends the current state on connect.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        job_id = self.scope['url_route']['kwargs']['job_id']
+        state = await self._job_state(job_id, user.pk)
+        if state is None:
+            await self.close(code=4404)
+            return
+
+        self.group_name = f"liveness_job_{job_id.hex}"
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        # Sent after joining the group so a job finishing meanwhile is not missed
+        await self.send(text_data=json.dumps(state))
+
+    @database_sync_to_async
+    def _job_state(self, job_id, user_id):
+        job = LivenessJob.objects.filter(pk=job_id, user_id=user_id).first()
+        return LivenessJobSerializer(job).data if job else None
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def liveness_job_update(self, event):
+        await self.send(text_data=json.dumps(event['content']))
@@ -0,0 +1,552 @@
+"""
+In-memory 1:N face search over enrolled students.
+
+``EmbeddingIndex`` keeps every stored ``FacialData.embedding`` as a row of one
+contiguous, L2-normalized float32 matrix, so a top-k cosine-similarity query
+is a single matrix-vector product plus ``argpartition``. ``IVFIndex`` adds an
+inverted-file coarse quantizer on top for campus-scale approximate search.
+
+The process-wide instance comes from the model registry
+(``registry.get('face_index')``): it is loaded from its memory-mapped snapshot
+in ``FACE_INDEX_CONFIG['index_dir']`` or built from the database on first use
+(or at startup through the registry's preload list), patched in place by the
+``FacialData`` signals, and periodically re-synced so other worker processes'
+enrollments show up.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize a vector or each row of a matrix, as float32."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingIndex:
+    """
+    Exact cosine-similarity index keyed by student id.
+
+    Rows are stored densely in a preallocated matrix that doubles in capacity
+    when full; removals move the last row into the freed slot. ``subset()``
+    hands out cached exact sub-indexes (per department, per course, ...) so a
+    class session only ever scores its own students.
+    """
+    SNAPSHOT_FILES = ('embeddings.npy', 'ids.npy')
+
+    def __init__(self, dim: int = 512, capacity: int = 1024):
+        self.dim = dim
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._rows = {}
+        self._size = 0
+        self._lock = threading.RLock()
+        self._version = 0
+        self._subsets = {}
+        self.synced_at = None
+        self._synced_count = 0
+        self._checked_at = 0.0
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, student_id):
+        return student_id in self._rows
+
+    def _grow(self, needed: int):
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        capacity = max(capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        self._matrix, self._ids = matrix, ids
+
+    def _row_moved(self, src: int, dst: int):
+        """Hook for subclasses keeping per-row data alongside the matrix."""
+
+    def add(self, student_id: int, vector: np.ndarray) -> int:
+        """Insert or replace the embedding for ``student_id``; returns its row."""
+        vector = normalize(np.ravel(vector))
+        with self._lock:
+            if self._size == 0 and vector.shape[0] != self.dim:
+                # Dimension follows the recognition model actually in use
+                self.dim = vector.shape[0]
+                self._matrix = np.zeros((self._matrix.shape[0], self.dim), dtype=np.float32)
+            row = self._rows.get(student_id)
+            if row is None:
+                self._grow(self._size + 1)
+                row = self._size
+                self._rows[student_id] = row
+                self._ids[row] = student_id
+                self._size += 1
+            self._matrix[row] = vector
+            self._version += 1
+            return row
+
+    def add_many(self, student_ids: Sequence[int], vectors: np.ndarray):
+        for student_id, vector in zip(student_ids, vectors):
+            self.add(student_id, vector)
+
+    def remove(self, student_id: int):
+        with self._lock:
+            row = self._rows.pop(student_id, None)
+            if row is None:
+                return
+            last = self._size - 1
+            if row != last:
+                moved = int(self._ids[last])
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+                self._row_moved(last, row)
+            self._size = last
+            self._version += 1
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._size = 0
+            self._version += 1
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, ids: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        k = min(k, scores.shape[0])
+        if k == 0:
+            return []
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def search_batch(self, queries: np.ndarray, k: int = 5,
+                     candidates: Optional[Iterable[int]] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Top-k ``(student_id, cosine_similarity)`` for each query embedding,
+        best first. ``candidates`` restricts the search to those students.
+        """
+        queries = normalize(np.atleast_2d(queries))
+        with self._lock:
+            if candidates is not None:
+                rows = np.fromiter(
+                    (self._rows[c] for c in candidates if c in self._rows), dtype=np.int64)
+                matrix, ids = self._matrix[rows], self._ids[rows]
+            else:
+                matrix, ids = self._matrix[:self._size], self._ids[:self._size]
+            scores = queries @ matrix.T
+        return [self._top_k(row, ids, k) for row in scores]
+
+    def search(self, query: np.ndarray, k: int = 5,
+               candidates: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """Top-k ``(student_id, cosine_similarity)`` for one embedding."""
+        return self.search_batch(query, k, candidates)[0]
+
+    def subset(self, key, student_ids: Iterable[int]) -> 'EmbeddingIndex':
+        """
+        Cached exact sub-index over ``student_ids`` (e.g. one course's roster),
+        rebuilt only when this index or the id set changes.
+        """
+        student_ids = frozenset(student_ids)
+        with self._lock:
+            cached = self._subsets.get(key)
+            if cached is not None and cached[0] == self._version and cached[1] == student_ids:
+                return cached[2]
+            rows = [self._rows[s] for s in student_ids if s in self._rows]
+            sub = EmbeddingIndex(self.dim, capacity=max(1, len(rows)))
+            sub._matrix[:len(rows)] = self._matrix[rows]
+            sub._ids[:len(rows)] = self._ids[rows]
+            sub._rows = {int(self._ids[r]): i for i, r in enumerate(rows)}
+            sub._size = len(rows)
+            self._subsets[key] = (self._version, student_ids, sub)
+            return sub
+
+    def rebuild(self):
+        """Reload every stored embedding from the database."""
+        from .models import FacialData
+
+        rows = (
+            FacialData.objects
+            .filter(student__isnull=False, embedding__isnull=False)
+            .values_list('student_id', 'embedding')
+        )
+        started = time.perf_counter()
+        since = timezone.now()
+        with self._lock:
+            self.clear()
+            for student_id, blob in rows.iterator(chunk_size=2000):
+                self.add(student_id, np.frombuffer(bytes(blob), dtype=FacialData.EMBEDDING_DTYPE))
+            self._mark_synced(since)
+        logger.info(f"Face index rebuilt with {self._size} embeddings in "
+                    f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def sync(self):
+        """
+        Pick up embeddings written or removed by other processes since the
+        last sync. Removals (deleted rows, embeddings set to NULL) are found
+        by comparing student ids, so they are seen even when additions keep
+        the row count unchanged.
+        """
+        from .models import FacialData
+
+        if self.synced_at is None:
+            self.rebuild()
+            return
+
+        stored = FacialData.objects.filter(student__isnull=False, embedding__isnull=False)
+        since = timezone.now()
+        stored_ids = set(stored.values_list('student_id', flat=True))
+        changed = stored.filter(updated_at__gte=self.synced_at).values_list('student_id', 'embedding')
+        with self._lock:
+            for student_id in [s for s in self._rows if s not in stored_ids]:
+                self.remove(student_id)
+            for student_id, blob in changed:
+                self.add(student_id, np.frombuffer(bytes(blob), dtype=FacialData.EMBEDDING_DTYPE))
+            self._mark_synced(since)
+
+    def _mark_synced(self, when):
+        self.synced_at = when
+        self._synced_count = self._size
+        self._checked_at = time.monotonic()
+
+    def maybe_sync(self):
+        """``sync()`` if ``FACE_INDEX_CONFIG['sync_seconds']`` have passed since the last one."""
+        interval = settings.FACE_INDEX_CONFIG.get('sync_seconds', 30)
+        if interval is not None and time.monotonic() - self._checked_at >= interval:
+            self.sync()
+
+    def _snapshot_arrays(self):
+        return {
+            'embeddings.npy': self._matrix[:self._size],
+            'ids.npy': self._ids[:self._size],
+        }
+
+    def save(self, directory: str):
+        """Write a snapshot that ``load()`` can memory-map."""
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            for name, array in self._snapshot_arrays().items():
+                tmp = os.path.join(directory, f"{name}.{os.getpid()}.tmp")
+                with open(tmp, 'wb') as f:
+                    np.save(f, np.ascontiguousarray(array))
+                os.replace(tmp, os.path.join(directory, name))
+            meta = {
+                'type': type(self).__name__,
+                'dim': self.dim,
+                'size': self._size,
+                'synced_at': self.synced_at.isoformat() if self.synced_at else None,
+            }
+            # Written last: a snapshot only counts once its meta file exists
+            tmp = os.path.join(directory, f"meta.json.{os.getpid()}.tmp")
+            with open(tmp, 'w') as f:
+                json.dump(meta, f)
+            os.replace(tmp, os.path.join(directory, 'meta.json'))
+
+    def _load_arrays(self, arrays):
+        self._matrix = arrays['embeddings.npy']
+        self._ids = arrays['ids.npy']
+
+    def load(self, directory: str) -> bool:
+        """
+        Memory-map a snapshot written by ``save()``. Pages are shared between
+        worker processes through the page cache and copied only when written.
+        Returns False if there is no compatible snapshot.
+        """
+        meta_path = os.path.join(directory, 'meta.json')
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta['type'] != type(self).__name__:
+            return False
+
+        arrays = {
+            name: np.load(os.path.join(directory, name), mmap_mode='c')
+            for name in self._snapshot_arrays()
+        }
+        with self._lock:
+            self.dim = meta['dim']
+            self._load_arrays(arrays)
+            self._size = meta['size']
+            self._rows = {int(s): i for i, s in enumerate(self._ids[:self._size])}
+            self._version += 1
+            synced_at = meta['synced_at']
+            self._mark_synced(datetime.fromisoformat(synced_at) if synced_at else None)
+        return True
+
+
+class IVFIndex(EmbeddingIndex):
+    """
+    Approximate index: inverted file over spherical k-means centroids.
+
+    Each row is assigned to its nearest of ``nlist`` centroids; a query scores
+    the centroids, then only the rows in its ``nprobe`` closest lists. Below
+    ``min_train_size`` rows, and for candidate-restricted searches, it falls
+    back to exact search. The quantizer is retrained once the index has
+    doubled since the last training. Training works on a copy of the rows,
+    so searches and writes carry on with the previous quantizer (or exact
+    search) meanwhile.
+    """
+
+    def __init__(self, dim: int = 512, capacity: int = 1024, nlist: Optional[int] = None,
+                 nprobe: int = 8, min_train_size: int = 4096, train_iterations: int = 10):
+        super().__init__(dim, capacity)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.train_iterations = train_iterations
+        self._centroids = None
+        self._assign = np.full(capacity, -1, dtype=np.int32)
+        self._trained_size = 0
+        self._lists = None
+        self._train_lock = threading.Lock()
+
+    def _grow(self, needed: int):
+        super()._grow(needed)
+        if self._assign.shape[0] < self._matrix.shape[0]:
+            assign = np.full(self._matrix.shape[0], -1, dtype=np.int32)
+            assign[:self._size] = self._assign[:self._size]
+            self._assign = assign
+
+    def _row_moved(self, src: int, dst: int):
+        self._assign[dst] = self._assign[src]
+
+    def remove(self, student_id: int):
+        with self._lock:
+            super().remove(student_id)
+            # Also when the removed row was the last one and nothing moved
+            self._lists = None
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._lists = None
+
+    def add(self, student_id: int, vector: np.ndarray) -> int:
+        with self._lock:
+            row = super().add(student_id, vector)
+            if self._centroids is not None:
+                self._assign[row] = int(np.argmax(self._centroids @ self._matrix[row]))
+            self._lists = None
+            return row
+
+    @staticmethod
+    def _assign_rows(matrix: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+        assign = np.empty(matrix.shape[0], dtype=np.int32)
+        for start in range(0, matrix.shape[0], chunk):
+            assign[start:start + chunk] = np.argmax(
+                matrix[start:start + chunk] @ centroids.T, axis=1)
+        return assign
+
+    def _needs_training(self) -> bool:
+        return self._centroids is None or self._size >= 2 * self._trained_size
+
+    def train(self, seed: int = 0):
+        """Fit the coarse quantizer on the current rows (spherical k-means)."""
+        with self._train_lock:
+            self._train(seed)
+
+    def _train(self, seed: int):
+        with self._lock:
+            version = self._version
+            matrix = self._matrix[:self._size].copy()
+        if len(matrix) == 0:
+            return
+
+        nlist = self.nlist or max(1, int(np.sqrt(len(matrix))))
+        rng = np.random.default_rng(seed)
+        # A sample of ~64 rows per list is plenty to place the centroids
+        sample = matrix[rng.choice(len(matrix), min(len(matrix), nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.train_iterations):
+            labels = self._assign_rows(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = normalize(sums)
+        assign = self._assign_rows(matrix, centroids)
+
+        with self._lock:
+            if self._version != version:
+                # Rows were added, moved or removed meanwhile
+                assign = self._assign_rows(self._matrix[:self._size], centroids)
+            if self._assign.shape[0] < self._matrix.shape[0]:
+                self._assign = np.full(self._matrix.shape[0], -1, dtype=np.int32)
+            self._assign[:self._size] = assign
+            self._centroids = centroids
+            self._trained_size = self._size
+            self._lists = None
+
+    def _build_lists(self):
+        assign = self._assign[:self._size]
+        order = np.argsort(assign, kind='stable')
+        offsets = np.searchsorted(assign[order], np.arange(len(self._centroids) + 1))
+        self._lists = (order, offsets)
+
+    def search_batch(self, queries: np.ndarray, k: int = 5,
+                     candidates: Optional[Iterable[int]] = None) -> List[List[Tuple[int, float]]]:
+        if candidates is not None or self._size < self.min_train_size:
+            return super().search_batch(queries, k, candidates)
+
+        # At most one caller trains; the others keep using what is there
+        if self._needs_training() and self._train_lock.acquire(blocking=False):
+            try:
+                self._train(seed=0)
+            finally:
+                self._train_lock.release()
+        if self._centroids is None:
+            return super().search_batch(queries, k, candidates)
+
+        queries = normalize(np.atleast_2d(queries))
+        with self._lock:
+            if self._lists is None:
+                self._build_lists()
+            order, offsets = self._lists
+
+            nprobe = min(self.nprobe, len(self._centroids))
+            probes = np.argpartition(queries @ self._centroids.T, -nprobe, axis=1)[:, -nprobe:]
+            results = []
+            for query, lists in zip(queries, probes):
+                rows = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in lists])
+                scores = self._matrix[rows] @ query
+                results.append(self._top_k(scores, self._ids[rows], k))
+        return results
+
+    def _snapshot_arrays(self):
+        arrays = super()._snapshot_arrays()
+        arrays['assign.npy'] = self._assign[:self._size]
+        if self._centroids is not None:
+            arrays['centroids.npy'] = self._centroids
+        return arrays
+
+    def save(self, directory: str):
+        # Trained before taking the index lock, which training takes itself
+        if self._centroids is None and self._size >= self.min_train_size:
+            self.train()
+        super().save(directory)
+
+    def _load_arrays(self, arrays):
+        super()._load_arrays(arrays)
+        self._assign = np.array(arrays['assign.npy'])
+
+    def load(self, directory: str) -> bool:
+        centroids = os.path.join(directory, 'centroids.npy')
+        if not super().load(directory):
+            return False
+        with self._lock:
+            if os.path.exists(centroids):
+                self._centroids = np.load(centroids)
+                self._trained_size = self._size
+            self._lists = None
+        return True
+
+
+def make_index(config: Optional[dict] = None) -> EmbeddingIndex:
+    """Build an empty index for ``FACE_INDEX_CONFIG``'s backend."""
+    config = config if config is not None else settings.FACE_INDEX_CONFIG
+    if config.get('backend', 'exact') == 'ivf':
+        return IVFIndex(
+            nlist=config.get('nlist'),
+            nprobe=config.get('nprobe', 8),
+            min_train_size=config.get('min_train_size', 4096)
+        )
+    return EmbeddingIndex()
+
+
+def load_face_index():
+    """Load the snapshot from ``index_dir`` and catch up, or build from the database."""
+    index = make_index()
+    directory = settings.FACE_INDEX_CONFIG.get('index_dir')
+    if directory and index.load(directory):
+        index.sync()
+        return index
+
+    index.rebuild()
+    if directory:
+        index.save(directory)
+    return index
+
+
+def search_students(embeddings: np.ndarray, k: int = 5,
+                    candidates: Optional[Iterable[int]] = None,
+                    group=None) -> List[List[Tuple[int, float]]]:
+    """
+    Top-k enrolled students for each embedding, using the shared index.
+
+    With ``group`` (e.g. ``('course', course_id)``) the ``candidates`` are
+    searched through a cached sub-index instead of being gathered per call.
+    """
+    from .registry import registry
+
+    index = registry.get('face_index')
+    index.maybe_sync()
+    if group is not None and candidates is not None:
+        return index.subset(group, candidates).search_batch(embeddings, k)
+    return index.search_batch(embeddings, k, candidates)
+
+
+def department_students(department_id: int) -> List[int]:
+    """Candidate ids for a per-department search (``group=('department', id)``)."""
+    from students.models import Student
+    return list(
+        Student.objects.filter(department_id=department_id).values_list('student_id', flat=True))
+
+
+def embedding_from_image(image: np.ndarray) -> Optional[np.ndarray]:
+    """Recognition embedding of the first face in a BGR image, or None."""
+    from .services.face_analysis import FaceAnalysisService
+    return FaceAnalysisService(profile='enrollment').extract_embeddings(image)
+
+
+def embedding_from_upload(upload, frame_step: int = 5, max_frames: int = 60) -> Optional[np.ndarray]:
+    """Embedding from the first sampled frame of an uploaded video with a face."""
+    import cv2
+    from .streaming import open_upload
+
+    with open_upload(upload) as source:
+        cap = cv2.VideoCapture(source)
+        try:
+            for index in range(max_frames):
+                if not cap.grab():
+                    break
+                if index % frame_step:
+                    continue
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                embedding = embedding_from_image(frame)
+                if embedding is not None:
+                    return embedding
+        finally:
+            cap.release()
+    return None
+
+
+def compute_embedding(compute) -> Optional[np.ndarray]:
+    """
+    Run ``compute()`` when ``FACE_INDEX_CONFIG['enroll_embeddings']`` is on.
+    Failures are logged and return None, so a missing recognition model never
+    blocks liveness verification.
+    """
+    if not settings.FACE_INDEX_CONFIG.get('enroll_embeddings', True):
+        return None
+    try:
+        return compute()
+    except Exception:
+        logger.warning("Could not compute face embedding", exc_info=True)
+        return None
@@ -1,159 +1,368 @@
 import cv2
 import numpy as np
-from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+from django.conf import settings
+from .registry import registry
 
 
-class LivenessDetector:
-    def __init__(self):
-        # Initialize detectors with tuned parameters
-        self.face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        self.eye_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + 'haarcascade_eye.xml')
-        
-        # Buffers to track eye state and face movement
-        self.blink_history = deque(maxlen=3)
-        self.face_positions = deque(maxlen=5)
-
-        # Detection thresholds
-        self.MOVEMENT_THRESHOLD = 10  # pixels
-        self.TEXTURE_THRESHOLD = 100   # Laplacian variance
-        self.MIN_BLINKS = 1
-        self.MIN_MOVEMENT = 1
-        self.LIVENESS_THRESHOLD = 0.7  # 70% frames must pass checks
+@dataclass(frozen=True)
+class SamplingPolicy:
+    """
+    Which decoded video frames get the full Haar/Laplacian analysis.
 
-    def analyze_frames(self, frames):
-        """Analyze a list of image frames for liveness signals."""
-        results = {
-            'blink_count': 0,
-            'movement_score': 0,
-            'frames_processed': 0,
-            'frame_details': [],
-            'is_verified': False
-        }
+    ``stride`` analyzes every Nth frame, ``interval_ms`` enforces a minimum
+    time between analyzed frames, and ``max_stride`` > ``stride`` lets the
+    stride grow while consecutive analyzed frames look the same (same face
+    presence and eye state, no movement), dropping back on any change.
+    ``max_analyzed_frames`` bounds the analysis window. With ``early_exit``,
+    decoding stops as soon as the verdict can no longer change given the
+    frames that could still be analyzed. That bound needs
+    ``max_analyzed_frames`` or a frame count passed in by the caller: the
+    container's count is not used, as FFmpeg only estimates it (duration x
+    fps) for webm and variable frame rate video, and an estimate too low
+    would stop the analysis on a wrong verdict.
+    """
+    stride: int = 1
+    interval_ms: float = 0
+    max_stride: int = 1
+    max_analyzed_frames: Optional[int] = None
+    early_exit: bool = True
 
-        for frame in frames:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
-
-            if len(faces) > 0:
-                x, y, w, h = faces[0]
-                self.face_positions.append((x, y))
-                face_roi = gray[y:y+h, x:x+w]
-
-                eyes = self.eye_cascade.detectMultiScale(face_roi)
-                self.blink_history.append(len(eyes) >= 2)
-
-                if (len(self.blink_history) == 3 and
-                    all(self.blink_history[i] for i in [0, 2]) and
-                    not self.blink_history[1]):
-                    results['blink_count'] += 1
-
-                if len(self.face_positions) > 1:
-                    dx = abs(self.face_positions[-1][0] - self.face_positions[0][0])
-                    dy = abs(self.face_positions[-1][1] - self.face_positions[0][1])
-                    if dx > self.MOVEMENT_THRESHOLD or dy > self.MOVEMENT_THRESHOLD:
-                        results['movement_score'] += 1
-
-                laplacian_var = cv2.Laplacian(face_roi, cv2.CV_64F).var()
-                is_live_frame = laplacian_var > self.TEXTURE_THRESHOLD
-
-                results['frame_details'].append({
-                    'frame_size': frame.shape,
-                    'face_bbox': (x, y, w, h),
-                    'eyes_detected': len(eyes),
-                    'movement': (dx, dy) if 'dx' in locals() else (0, 0),
-                    'texture_score': laplacian_var,
-                    'is_live_frame': is_live_frame
-                })
-            else:
-                results['frame_details'].append({
-                    'face_detected': False
-                })
-
-            results['frames_processed'] += 1
-
-        # Compute final verification
-        live_frames = sum(1 for f in results['frame_details'] if f.get('is_live_frame', False))
-        results['liveness_score'] = live_frames / max(1, results['frames_processed'])
-
-        results['is_verified'] = (
-            results['liveness_score'] >= self.LIVENESS_THRESHOLD and
-            results['blink_count'] >= self.MIN_BLINKS and
-            results['movement_score'] >= self.MIN_MOVEMENT
+    @classmethod
+    def from_settings(cls):
+        return cls(**getattr(settings, 'LIVENESS_SAMPLING_POLICY', {}))
+
+
+class FrameSampler:
+    """Applies a ``SamplingPolicy`` to one video."""
+    __slots__ = ('policy', 'stride', 'next_index', 'next_time', 'last_state')
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.stride = max(1, policy.stride)
+        self.next_index = 0
+        self.next_time = 0.0
+        self.last_state = None
+
+    def should_analyze(self, index, timestamp_ms=None):
+        if index < self.next_index:
+            return False
+        if self.policy.interval_ms and timestamp_ms is not None:
+            if timestamp_ms < self.next_time:
+                return False
+            self.next_time = timestamp_ms + self.policy.interval_ms
+        self.next_index = index + self.stride
+        return True
+
+    def update(self, details, movement_threshold):
+        """Adapt the stride to whether the last analyzed frame changed anything."""
+        if self.policy.max_stride <= self.policy.stride:
+            return
+        state = (
+            details.get('face_detected', True),
+            details.get('eyes_detected', 0) >= 2
         )
+        moved = max(details.get('movement', (0, 0))) > movement_threshold
+        if state == self.last_state and not moved:
+            self.stride = min(self.stride + 1, self.policy.max_stride)
+        else:
+            self.stride = max(1, self.policy.stride)
+        self.last_state = state
+
+    def remaining(self, index, total_frames, analyzed):
+        """Upper bound on frames still to be analyzed, or None if unbounded."""
+        bounds = []
+        if total_frames is not None and total_frames > index:
+            future = total_frames - index - 1
+            # The adaptive stride and time interval only ever skip more
+            bounds.append(-(-future // max(1, self.policy.stride)))
+        if self.policy.max_analyzed_frames is not None:
+            bounds.append(max(0, self.policy.max_analyzed_frames - analyzed))
+        return min(bounds) if bounds else None
+
+
+class LivenessSession:
+    """
+    Per-analysis state for one video or image sequence.
+
+    All blink/movement tracking lives here rather than on the detector, so a
+    single shared ``LivenessDetector`` can serve concurrent requests. The
+    history buffers are fixed-size ring buffers allocated once per session.
+    """
+    BLINK_WINDOW = 3
+    POSITION_WINDOW = 5
+
+    __slots__ = (
+        'detector',
+        'blink_history', 'blink_len', 'blink_idx',
+        'face_positions', 'position_len', 'position_idx',
+        'blink_count', 'movement_score', 'frames_processed', 'live_frames',
+        'frames_decoded', 'early_exit', 'frame_details', 'last_bbox',
+    )
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.blink_history = np.zeros(self.BLINK_WINDOW, dtype=bool)
+        self.blink_len = 0
+        self.blink_idx = 0
+        self.face_positions = np.zeros((self.POSITION_WINDOW, 2), dtype=np.int32)
+        self.position_len = 0
+        self.position_idx = 0
+        self.blink_count = 0
+        self.movement_score = 0
+        self.frames_processed = 0
+        self.live_frames = 0
+        self.frames_decoded = 0
+        self.early_exit = None
+        self.frame_details = []
+        self.last_bbox = None
+
+    def _push_blink(self, eyes_open):
+        self.blink_history[self.blink_idx] = eyes_open
+        self.blink_idx = (self.blink_idx + 1) % self.BLINK_WINDOW
+        self.blink_len = min(self.blink_len + 1, self.BLINK_WINDOW)
+
+        # Open -> closed -> open over the last three face frames is a blink
+        if self.blink_len == self.BLINK_WINDOW:
+            oldest = self.blink_history[self.blink_idx]
+            middle = self.blink_history[(self.blink_idx + 1) % self.BLINK_WINDOW]
+            newest = self.blink_history[(self.blink_idx + 2) % self.BLINK_WINDOW]
+            if oldest and newest and not middle:
+                self.blink_count += 1
+
+    def _push_position(self, x, y):
+        self.face_positions[self.position_idx] = (x, y)
+        newest = self.position_idx
+        self.position_idx = (self.position_idx + 1) % self.POSITION_WINDOW
+        self.position_len = min(self.position_len + 1, self.POSITION_WINDOW)
+
+        if self.position_len < 2:
+            return 0, 0
+
+        oldest = self.position_idx if self.position_len == self.POSITION_WINDOW else 0
+        dx, dy = np.abs(self.face_positions[newest] - self.face_positions[oldest])
+        if dx > self.detector.MOVEMENT_THRESHOLD or dy > self.detector.MOVEMENT_THRESHOLD:
+            self.movement_score += 1
+        return int(dx), int(dy)
+
+    def skip(self):
+        """Count a decoded frame that the sampling policy did not analyze."""
+        self.frames_decoded += 1
+
+    @staticmethod
+    def _detect(cascade, region, scale, **kwargs):
+        """Run ``cascade`` on ``region`` resized by ``scale``; bbox in region pixels."""
+        if scale < 1.0:
+            region = cv2.resize(region, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        found = cascade.detectMultiScale(region, 1.1, 4, **kwargs)
+        if len(found) == 0:
+            return None
+        return tuple(int(round(v / scale)) for v in found[0])
+
+    def _locate_face(self, gray):
+        """
+        Track the face near its last position, re-detecting on the downscaled
+        full frame only when the track is lost.
+        """
+        detector = self.detector
+        height, width = gray.shape
+
+        if self.last_bbox is not None:
+            x, y, w, h = self.last_bbox
+            pad_x, pad_y = int(w * detector.TRACK_PADDING), int(h * detector.TRACK_PADDING)
+            x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+            x1, y1 = min(width, x + w + pad_x), min(height, y + h + pad_y)
+            scale = min(1.0, detector.TRACK_FACE_WIDTH / w)
+            min_side = max(24, int(w * scale * 0.5))
+            bbox = self._detect(
+                detector.face_cascade, gray[y0:y1, x0:x1], scale,
+                minSize=(min_side, min_side)
+            )
+            if bbox is not None:
+                return bbox[0] + x0, bbox[1] + y0, bbox[2], bbox[3]
+
+        scale = min(1.0, detector.DETECTION_WIDTH / width)
+        return self._detect(detector.face_cascade, gray, scale)
+
+    def process(self, frame):
+        """Analyze one BGR frame and return its per-frame details."""
+        detector = self.detector
+        self.frames_decoded += 1
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.last_bbox = bbox = self._locate_face(gray)
 
-        return results['is_verified']
+        if bbox is not None:
+            x, y, w, h = bbox
+            face_roi = gray[y:y+h, x:x+w]
 
-    def analyze_video(self, video_path):
-        """Analyze a video file for liveness."""
-        results = {
-            'blink_count': 0,
-            'movement_score': 0,
-            'frames_processed': 0,
-            'frame_details': [],
-            'is_verified': False
+            # Eyes only ever sit in the upper part of the face box
+            eye_region = face_roi[:int(h * detector.EYE_REGION)]
+            eyes = detector.eye_cascade.detectMultiScale(
+                cv2.resize(eye_region, None, fx=detector.EYE_FACE_WIDTH / w,
+                           fy=detector.EYE_FACE_WIDTH / w, interpolation=cv2.INTER_AREA)
+                if w > detector.EYE_FACE_WIDTH else eye_region
+            )
+            self._push_blink(len(eyes) >= 2)
+            movement = self._push_position(x, y)
+
+            laplacian_var = float(cv2.Laplacian(face_roi, cv2.CV_64F).var())
+            is_live_frame = laplacian_var > detector.TEXTURE_THRESHOLD
+            if is_live_frame:
+                self.live_frames += 1
+
+            details = {
+                'frame_size': frame.shape,
+                'face_bbox': (x, y, w, h),
+                'eyes_detected': len(eyes),
+                'movement': movement,
+                'texture_score': laplacian_var,
+                'is_live_frame': is_live_frame
+            }
+        else:
+            details = {
+                'face_detected': False
+            }
+
+        self.frame_details.append(details)
+        self.frames_processed += 1
+        return details
+
+    def settled(self, remaining):
+        """
+        'verified' or 'unreachable' once the verdict cannot change if at most
+        ``remaining`` more frames are analyzed; None while it still can.
+        """
+        if remaining is None:
+            return None
+        detector = self.detector
+        total = self.frames_processed + remaining
+        if total == 0:
+            return None
+
+        if (self.blink_count + remaining < detector.MIN_BLINKS or
+                self.movement_score + remaining < detector.MIN_MOVEMENT or
+                (self.live_frames + remaining) / total < detector.LIVENESS_THRESHOLD):
+            return 'unreachable'
+        if (self.blink_count >= detector.MIN_BLINKS and
+                self.movement_score >= detector.MIN_MOVEMENT and
+                self.live_frames / total >= detector.LIVENESS_THRESHOLD):
+            return 'verified'
+        return None
+
+    def results(self):
+        """Summarize the frames processed so far into a verdict."""
+        detector = self.detector
+        liveness_score = self.live_frames / max(1, self.frames_processed)
+        return {
+            'blink_count': self.blink_count,
+            'movement_score': self.movement_score,
+            'frames_processed': self.frames_processed,
+            'frames_decoded': self.frames_decoded,
+            'frames_analyzed': self.frames_processed,
+            'early_exit': self.early_exit,
+            'frame_details': self.frame_details,
+            'liveness_score': liveness_score,
+            'is_verified': (
+                liveness_score >= detector.LIVENESS_THRESHOLD and
+                self.blink_count >= detector.MIN_BLINKS and
+                self.movement_score >= detector.MIN_MOVEMENT
+            )
         }
 
+
+class LivenessDetector:
+    """
+    Stateless Haar-cascade liveness detector.
+
+    The detector only holds thresholds and hands out the registry's cascades,
+    so one instance (``registry.get('liveness_detector')``) is shared by all
+    requests; every analysis runs in its own ``LivenessSession``. Videos are
+    sampled according to ``policy`` (``LIVENESS_SAMPLING_POLICY`` by default).
+    """
+    __slots__ = ('policy',)
+
+    # Detection thresholds
+    MOVEMENT_THRESHOLD = 10  # pixels
+    TEXTURE_THRESHOLD = 100   # Laplacian variance
+    MIN_BLINKS = 1
+    MIN_MOVEMENT = 1
+    LIVENESS_THRESHOLD = 0.7  # 70% frames must pass checks
+
+    # Detection pipeline
+    DETECTION_WIDTH = 320    # full-frame face search runs at this width
+    TRACK_PADDING = 0.5      # search window around the last face, per side
+    TRACK_FACE_WIDTH = 96    # tracked face is searched at about this width
+    EYE_REGION = 0.6         # fraction of the face box searched for eyes
+    EYE_FACE_WIDTH = 160     # larger faces are downscaled for the eye search
+
+    def __init__(self, policy=None):
+        self.policy = policy or SamplingPolicy.from_settings()
+
+    @property
+    def face_cascade(self):
+        # Cascades are parsed once per thread by the model registry
+        return registry.get('face_cascade')
+
+    @property
+    def eye_cascade(self):
+        return registry.get('eye_cascade')
+
+    def session(self):
+        """Start a new, independent analysis."""
+        return LivenessSession(self)
+
+    def analyze_frames(self, frames):
+        """Analyze a list of image frames for liveness signals."""
+        session = self.session()
+        for frame in frames:
+            session.process(frame)
+        return session.results()['is_verified']
+
+    def analyze_video(self, video_path, on_frame=None, policy=None, total_frames=None):
+        """
+        Analyze a video file (or any source OpenCV can open) for liveness.
+
+        ``on_frame(index, details)`` is called as soon as each sampled frame is
+        analyzed, with ``index`` counting decoded frames. ``total_frames`` is
+        an exact frame count known to the caller; only it or the policy's
+        ``max_analyzed_frames`` lets the analysis exit early.
+        """
+        policy = policy or self.policy
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             raise ValueError("Could not open video file")
 
+        session = self.session()
+        sampler = FrameSampler(policy)
         try:
             while cap.isOpened():
-                ret, frame = cap.read()
+                # grab() demuxes/decodes only; skipped frames are never converted
+                if not cap.grab():
+                    break
+                index = session.frames_decoded
+                timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) if policy.interval_ms else None
+                if not sampler.should_analyze(index, timestamp):
+                    session.skip()
+                    continue
+
+                ret, frame = cap.retrieve()
                 if not ret:
                     break
+                details = session.process(frame)
+                sampler.update(details, self.MOVEMENT_THRESHOLD)
+                if on_frame is not None:
+                    on_frame(index, details)
 
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
-
-                if len(faces) > 0:
-                    x, y, w, h = faces[0]
-                    self.face_positions.append((x, y))
-                    face_roi = gray[y:y+h, x:x+w]
-
-                    eyes = self.eye_cascade.detectMultiScale(face_roi)
-                    self.blink_history.append(len(eyes) >= 2)
-
-                    if (len(self.blink_history) == 3 and
-                        all(self.blink_history[i] for i in [0, 2]) and
-                        not self.blink_history[1]):
-                        results['blink_count'] += 1
-
-                    if len(self.face_positions) > 1:
-                        dx = abs(self.face_positions[-1][0] - self.face_positions[0][0])
-                        dy = abs(self.face_positions[-1][1] - self.face_positions[0][1])
-                        if dx > self.MOVEMENT_THRESHOLD or dy > self.MOVEMENT_THRESHOLD:
-                            results['movement_score'] += 1
-
-                    laplacian_var = cv2.Laplacian(face_roi, cv2.CV_64F).var()
-                    is_live_frame = laplacian_var > self.TEXTURE_THRESHOLD
-
-                    results['frame_details'].append({
-                        'frame_size': frame.shape,
-                        'face_bbox': (x, y, w, h),
-                        'eyes_detected': len(eyes),
-                        'movement': (dx, dy),
-                        'texture_score': laplacian_var,
-                        'is_live_frame': is_live_frame
-                    })
-                else:
-                    results['frame_details'].append({
-                        'face_detected': False
-                    })
-
-                results['frames_processed'] += 1
+                remaining = sampler.remaining(index, total_frames, session.frames_processed)
+                if policy.early_exit and remaining:
+                    session.early_exit = session.settled(remaining)
+                    if session.early_exit:
+                        break
+                if (policy.max_analyzed_frames is not None and
+                        session.frames_processed >= policy.max_analyzed_frames):
+                    break
         finally:
             cap.release()
 
-        live_frames = sum(1 for f in results['frame_details'] if f.get('is_live_frame', False))
-        results['liveness_score'] = live_frames / max(1, results['frames_processed'])
-
-        results['is_verified'] = (
-            results['liveness_score'] >= self.LIVENESS_THRESHOLD and
-            results['blink_count'] >= self.MIN_BLINKS and
-            results['movement_score'] >= self.MIN_MOVEMENT
-        )
-
-        return results
+        return session.results()
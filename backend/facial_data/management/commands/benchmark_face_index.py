@@ -0,0 +1,65 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from facial_data.embeddings import EmbeddingIndex, IVFIndex, normalize
+
+
+class Command(BaseCommand):
+    help = "Compare recall and latency of the approximate (IVF) face index against exact search"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=50000, help="Number of synthetic students")
+        parser.add_argument('--dim', type=int, default=512)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--k', type=int, default=5)
+        parser.add_argument('--nlist', type=int, default=None)
+        parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+        parser.add_argument('--noise', type=float, default=0.5,
+                            help="Query noise relative to the enrolled embedding")
+
+    def _synthetic(self, rng, size, dim):
+        # Clustered like real face embeddings rather than uniform on the sphere
+        centers = normalize(rng.standard_normal((max(1, size // 500), dim)).astype(np.float32))
+        labels = rng.integers(0, len(centers), size)
+        return normalize(centers[labels] + 0.8 * normalize(
+            rng.standard_normal((size, dim)).astype(np.float32)))
+
+    def _time(self, index, queries, k):
+        started = time.perf_counter()
+        results = [index.search(query, k) for query in queries]
+        return results, (time.perf_counter() - started) / len(queries) * 1000
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        size, k = options['size'], options['k']
+        vectors = self._synthetic(rng, size, options['dim'])
+        ids = np.arange(size)
+
+        picked = rng.choice(size, options['queries'], replace=False)
+        queries = normalize(vectors[picked] + options['noise'] * normalize(
+            rng.standard_normal((len(picked), options['dim'])).astype(np.float32)))
+
+        exact = EmbeddingIndex(options['dim'], capacity=size)
+        exact.add_many(ids, vectors)
+        truth, exact_ms = self._time(exact, queries, k)
+        self.stdout.write(f"exact      size={size} latency={exact_ms:7.2f} ms/query")
+
+        ivf = IVFIndex(options['dim'], capacity=size, nlist=options['nlist'], min_train_size=1)
+        ivf.add_many(ids, vectors)
+        started = time.perf_counter()
+        ivf.train()
+        self.stdout.write(
+            f"ivf        nlist={len(ivf._centroids)} train={(time.perf_counter() - started):.1f} s")
+
+        for nprobe in options['nprobe']:
+            ivf.nprobe = nprobe
+            results, ivf_ms = self._time(ivf, queries, k)
+            recall = np.mean([
+                len({s for s, _ in got} & {s for s, _ in want}) / len(want)
+                for got, want in zip(results, truth)
+            ])
+            top1 = np.mean([got[0][0] == want[0][0] for got, want in zip(results, truth)])
+            self.stdout.write(
+                f"ivf        nprobe={nprobe:<3} latency={ivf_ms:7.2f} ms/query  "
+                f"recall@{k}={recall:.3f}  top1={top1:.3f}  speedup={exact_ms / ivf_ms:.1f}x"
+            )
@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+import time
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from facial_data.registry import registry, _rss_bytes
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure CPU latency and RSS of each InsightFace profile "
+        "(det_size / allowed_modules) on a sample image"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile', action='append',
+            help="Profile(s) to benchmark (default: every profile in settings)"
+        )
+        parser.add_argument('--image', required=True, help="Image containing a face")
+        parser.add_argument('--iterations', type=int, default=50)
+
+    def handle(self, *args, **options):
+        profiles = options['profile'] or list(settings.INSIGHTFACE_MODEL_CONFIG['profiles'])
+        if len(profiles) == 1:
+            self._run(profiles[0], options['image'], options['iterations'])
+            return
+
+        # One process per profile so shared libraries and other profiles'
+        # weights do not distort the memory figures. `python -m django`
+        # works however this command was started (manage.py, django-admin,
+        # call_command), given the project on the path.
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [settings.BASE_DIR, env.get('PYTHONPATH')]))
+        for profile in profiles:
+            result = subprocess.run(
+                [sys.executable, '-m', 'django', 'benchmark_face_profiles',
+                 '--profile', profile, '--image', options['image'],
+                 '--iterations', str(options['iterations']),
+                 '--settings', settings.SETTINGS_MODULE],
+                capture_output=True, text=True, env=env
+            )
+            if result.returncode != 0:
+                raise CommandError(result.stderr)
+            self.stdout.write(result.stdout.rstrip())
+
+    def _run(self, profile, image_path, iterations):
+        image = cv2.imread(image_path)
+        if image is None:
+            raise CommandError(f"Could not read image {image_path}")
+
+        baseline = _rss_bytes() or 0
+        analyzer = registry.get('face_analyzer', profile=profile)
+        stats = registry.stats()[f"face_analyzer(profile={profile!r})"]
+
+        analyzer.get(image)  # warm-up
+        latencies = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            faces = analyzer.get(image)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        rss = (_rss_bytes() or 0) - baseline
+        self.stdout.write(
+            f"{profile:<12} modules={sorted(analyzer.models)} "
+            f"load={stats['load_time'] * 1000:.0f} ms  rss=+{rss / (1024 * 1024):.1f} MiB  "
+            f"latency p50={np.percentile(latencies, 50):.1f} ms "
+            f"p95={np.percentile(latencies, 95):.1f} ms  faces={len(faces)}"
+        )
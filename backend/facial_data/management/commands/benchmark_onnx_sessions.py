@@ -0,0 +1,78 @@
+import itertools
+import os
+import time
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from facial_data.services.sessions import create_session, session_config, resolve_threads
+
+
+class Command(BaseCommand):
+    help = "Benchmark ONNX Runtime session options for a face model on CPU"
+
+    def add_arguments(self, parser):
+        config = settings.INSIGHTFACE_MODEL_CONFIG
+        parser.add_argument(
+            '--model',
+            default=os.path.join(config['root_path'], config['model_name'], 'antispoofing.onnx'),
+            help="ONNX model to benchmark (default: the anti-spoofing model)"
+        )
+        parser.add_argument('--batch', type=int, default=1, help="Batch size for dynamic batch dims")
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument(
+            '--levels', nargs='+', default=['basic', 'extended', 'all'],
+            help="Graph optimization levels to try"
+        )
+        parser.add_argument(
+            '--threads', nargs='+', default=['1', '2', 'auto'],
+            help="intra_op_num_threads values to try"
+        )
+        parser.add_argument(
+            '--modes', nargs='+', default=['sequential'],
+            help="Execution modes to try"
+        )
+
+    def _dummy_input(self, session, batch):
+        model_input = session.get_inputs()[0]
+        shape = [
+            dim if isinstance(dim, int) and dim > 0 else batch
+            for dim in model_input.shape
+        ]
+        dtype = np.uint8 if 'uint8' in model_input.type else np.float32
+        return model_input.name, np.random.rand(*shape).astype(dtype)
+
+    def handle(self, *args, **options):
+        model = options['model']
+        self.stdout.write(f"Model: {model} (cpu_count={os.cpu_count()})")
+
+        for level, threads, mode in itertools.product(
+                options['levels'], options['threads'], options['modes']):
+            overrides = {
+                'graph_optimization_level': level,
+                'intra_op_num_threads': threads,
+                'execution_mode': mode,
+                'optimized_model_dir': None,
+            }
+            started = time.perf_counter()
+            session = create_session(model, providers=['CPUExecutionProvider'], overrides=overrides)
+            load_ms = (time.perf_counter() - started) * 1000
+
+            input_name, data = self._dummy_input(session, options['batch'])
+            feed = {input_name: data}
+            for _ in range(options['warmup']):
+                session.run(None, feed)
+
+            started = time.perf_counter()
+            for _ in range(options['iterations']):
+                session.run(None, feed)
+            elapsed = time.perf_counter() - started
+
+            config = session_config(overrides)
+            items = options['iterations'] * data.shape[0]
+            self.stdout.write(
+                f"level={level:<8} threads={resolve_threads(config['intra_op_num_threads']):<3} "
+                f"mode={mode:<10} load={load_ms:7.1f} ms  "
+                f"latency={elapsed / options['iterations'] * 1000:7.2f} ms  "
+                f"throughput={items / elapsed:9.1f} items/s"
+            )
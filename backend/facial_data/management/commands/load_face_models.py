@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from facial_data.registry import registry
+
+
+class Command(BaseCommand):
+    help = "Load face models into the process-wide registry and report load time and memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models',
+            nargs='*',
+            help="Models to load (default: all registered models)"
+        )
+
+    def handle(self, *args, **options):
+        registry.preload(options['models'] or None)
+
+        for key, stats in registry.stats().items():
+            memory = stats['memory_bytes']
+            memory = f"{memory / (1024 * 1024):.1f} MiB" if memory is not None else "n/a"
+            self.stdout.write(
+                f"{key}: loaded in {stats['load_time'] * 1000:.1f} ms, memory {memory}"
+            )
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facial_data', '0002_alter_facialdata_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facialdata',
+            name='embedding',
+            field=models.BinaryField(blank=True, help_text='L2-normalized face embedding, little-endian float16', null=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:11
+
+import django.db.models.deletion
+import facial_data.models
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facial_data', '0003_facialdata_embedding'),
+        ('students', '0007_student_password'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LivenessJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('video', models.FileField(upload_to=facial_data.models.liveness_video_path)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('is_verified', models.BooleanField(default=False)),
+                ('analysis_results', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('facial_data', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='facial_data.facialdata')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='liveness_jobs', to='students.student')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
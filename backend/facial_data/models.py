@@ -1,6 +1,11 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from students.models import Student
+import numpy as np
 import os
+import uuid
 
 def liveness_video_path(instance, filename):
     return f'liveness_videos/student_{instance.student.pk}/{filename}'
@@ -21,11 +26,114 @@ class FacialData(models.Model):
     )
     is_verified = models.BooleanField(default=False)
     analysis_results = models.JSONField(default=dict)
+    embedding = models.BinaryField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="L2-normalized face embedding, little-endian float16"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    EMBEDDING_DTYPE = np.dtype('<f2')
+
     def __str__(self):
         return f"FacialData for {self.student}"
 
+    @classmethod
+    def pack_embedding(cls, vector):
+        """Normalize ``vector`` and pack it as float16 bytes (1 KB for 512-d)."""
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        return vector.astype(cls.EMBEDDING_DTYPE).tobytes()
+
+    def set_embedding(self, vector):
+        self.embedding = self.pack_embedding(vector)
+
+    def get_embedding(self):
+        """The stored embedding as a float32 vector, or None."""
+        if not self.embedding:
+            return None
+        return np.frombuffer(bytes(self.embedding), dtype=self.EMBEDDING_DTYPE).astype(np.float32)
+
     class Meta:
         verbose_name_plural = "Facial Data"
+
+
+class LivenessJob(models.Model):
+    """A liveness verification queued for a Celery worker (see facial_data.tasks)."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    student = models.ForeignKey(
+        Student,
+        on_delete=models.CASCADE,
+        related_name='liveness_jobs'
+    )
+    # Who submitted the video; only they can follow the job
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='liveness_jobs'
+    )
+    video = models.FileField(upload_to=liveness_video_path)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    is_verified = models.BooleanField(default=False)
+    analysis_results = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    facial_data = models.ForeignKey(
+        FacialData,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Liveness job {self.pk} for {self.student} ({self.status})"
+
+    @property
+    def group_name(self):
+        """Channels group that receives this job's status updates."""
+        return f"liveness_job_{self.pk.hex}"
+
+
+# Keep this process's face index in step with enrollments once they commit,
+# so a rolled-back change never reaches the index. Other worker processes
+# pick the change up on their next periodic sync.
+def _update_face_index(student_id, embedding):
+    from .registry import registry
+
+    if not registry.is_loaded('face_index'):
+        return
+    index = registry.get('face_index')
+    if embedding is not None:
+        index.add(student_id, embedding)
+    else:
+        index.remove(student_id)
+
+@receiver(post_save, sender=FacialData)
+def facial_data_post_save(sender, instance, **kwargs):
+    if kwargs.get('raw', False) or instance.student_id is None:
+        return
+    student_id, embedding = instance.student_id, instance.get_embedding()
+    transaction.on_commit(lambda: _update_face_index(student_id, embedding))
+
+@receiver(post_delete, sender=FacialData)
+def facial_data_post_delete(sender, instance, **kwargs):
+    if instance.student_id is not None:
+        student_id = instance.student_id
+        transaction.on_commit(lambda: _update_face_index(student_id, None))
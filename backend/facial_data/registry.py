@@ -0,0 +1,211 @@
+"""
+Process-wide registry for the face models used by liveness and recognition.
+
+Every model is loaded at most once per worker process, either lazily on the
+first ``registry.get()`` or eagerly through ``registry.preload()`` (called from
+``FacialDataConfig.ready`` and the ``load_face_models`` management command).
+Callers receive the shared handle instead of building their own.
+"""
+import logging
+import os
+import resource
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ModelStats:
+    key: str
+    load_time: float = 0.0          # seconds spent in the loader
+    memory_bytes: Optional[int] = None  # RSS growth while loading (approximate)
+    loads: int = 0                  # 1 for shared models, one per thread otherwise
+    hits: int = 0
+
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, or None if unknown."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        # Peak rather than current RSS, but still monotonic across loads
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (AttributeError, ValueError):
+        return None
+
+
+class ModelRegistry:
+    """
+    Lazily loads and caches model handles by name.
+
+    ``get(name, **options)`` caches one handle per (name, options) pair, so the
+    same model can be held in differently configured variants. Loaders
+    registered with ``per_thread=True`` produce one handle per thread, for
+    objects such as ``cv2.CascadeClassifier`` that keep per-call scratch state
+    and must not be shared between threads.
+    """
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable] = {}
+        self._per_thread: Dict[str, bool] = {}
+        self._models: Dict[str, object] = {}
+        self._stats: Dict[str, ModelStats] = {}
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    def register(self, name: str, loader: Callable, per_thread: bool = False):
+        """Register ``loader(**options)`` as the factory for ``name``."""
+        with self._lock:
+            self._loaders[name] = loader
+            self._per_thread[name] = per_thread
+
+    @staticmethod
+    def _key(name: str, options: dict) -> str:
+        if not options:
+            return name
+        args = ', '.join(f"{k}={options[k]!r}" for k in sorted(options))
+        return f"{name}({args})"
+
+    def _load(self, name: str, key: str, options: dict):
+        try:
+            loader = self._loaders[name]
+        except KeyError:
+            raise KeyError(f"No model registered under '{name}'")
+
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        model = loader(**options)
+        elapsed = time.perf_counter() - started
+        rss_after = _rss_bytes()
+
+        with self._lock:
+            stats = self._stats.setdefault(key, ModelStats(key=key))
+            stats.loads += 1
+            if stats.loads == 1:
+                stats.load_time = elapsed
+                if rss_before is not None and rss_after is not None:
+                    stats.memory_bytes = max(0, rss_after - rss_before)
+
+        logger.info(f"Loaded model {key} in {elapsed * 1000:.1f} ms")
+        return model
+
+    def get(self, name: str, **options):
+        """Return the shared handle for ``name``, loading it on first use."""
+        key = self._key(name, options)
+
+        if self._per_thread.get(name):
+            models = getattr(self._local, 'models', None)
+            if models is None:
+                models = self._local.models = {}
+            model = models.get(key)
+            if model is None:
+                model = models[key] = self._load(name, key, options)
+            else:
+                self._stats[key].hits += 1
+            return model
+
+        model = self._models.get(key)
+        if model is not None:
+            self._stats[key].hits += 1
+            return model
+
+        with self._lock:
+            # Another thread may have finished loading while we waited
+            model = self._models.get(key)
+            if model is None:
+                model = self._models[key] = self._load(name, key, options)
+            return model
+
+    def preload(self, names: Optional[Iterable[str]] = None):
+        """Eagerly load the given models (all registered ones by default)."""
+        for name in (names if names is not None else list(self._loaders)):
+            self.get(name)
+
+    def is_loaded(self, name: str, **options) -> bool:
+        return self._key(name, options) in self._stats
+
+    def stats(self) -> Dict[str, dict]:
+        """Load time, memory and hit counts per loaded model."""
+        with self._lock:
+            return {key: asdict(stats) for key, stats in self._stats.items()}
+
+    def clear(self):
+        """Drop every cached handle (used by tests and after config changes)."""
+        with self._lock:
+            self._models.clear()
+            self._stats.clear()
+            self._local = threading.local()
+
+
+def _load_face_cascade():
+    import cv2
+    return cv2.CascadeClassifier(
+        cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+
+def _load_eye_cascade():
+    import cv2
+    return cv2.CascadeClassifier(
+        cv2.data.haarcascades + 'haarcascade_eye.xml')
+
+
+def _load_liveness_detector():
+    from .liveness import LivenessDetector
+    return LivenessDetector()
+
+
+def _load_face_analyzer(profile='default', root=None, providers=None, det_size=None):
+    from .services.face_analysis import ModularFaceAnalysis
+
+    config = settings.INSIGHTFACE_MODEL_CONFIG
+    profile_config = config.get('profiles', {}).get(profile, {})
+    app = ModularFaceAnalysis(
+        name=config['model_name'],
+        root=root or config['root_path'],
+        allowed_modules=profile_config.get('allowed_modules'),
+        module_files=config.get('module_files'),
+        providers=providers or config['providers'],
+    )
+    app.prepare(ctx_id=0, det_size=tuple(det_size or profile_config.get('det_size', (640, 640))))
+    return app
+
+
+def _load_antispoofing(model_path=None, providers=None):
+    from .services.sessions import create_session
+
+    config = settings.INSIGHTFACE_MODEL_CONFIG
+    if model_path is None:
+        model_path = os.path.join(
+            config['root_path'],
+            config['model_name'],
+            'antispoofing.onnx'
+        )
+    return create_session(model_path, providers=providers)
+
+
+def _load_antispoofing_batch(**options):
+    from .services.antispoofing import AntiSpoofingModel
+    return AntiSpoofingModel(registry.get('antispoofing', **options))
+
+
+def _load_face_index():
+    from .embeddings import load_face_index
+    return load_face_index()
+
+
+registry = ModelRegistry()
+registry.register('face_cascade', _load_face_cascade, per_thread=True)
+registry.register('eye_cascade', _load_eye_cascade, per_thread=True)
+registry.register('liveness_detector', _load_liveness_detector)
+registry.register('face_analyzer', _load_face_analyzer)
+registry.register('antispoofing', _load_antispoofing)
+registry.register('antispoofing_batch', _load_antispoofing_batch)
+registry.register('face_index', _load_face_index)
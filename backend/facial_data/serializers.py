@@ -1,12 +1,24 @@
 from rest_framework import serializers
-from .models import FacialData
+from .models import FacialData, LivenessJob
 
 class FacialDataSerializer(serializers.ModelSerializer):
     class Meta:
         model = FacialData
-        fields = '__all__'
+        exclude = ('embedding',)
         read_only_fields = ('student', 'created_at', 'updated_at')
 
 class LivenessVerificationSerializer(serializers.Serializer):
     video = serializers.FileField(required=True)
-    student_id = serializers.IntegerField(required=True)
\ No newline at end of file
+    student_id = serializers.IntegerField(required=True)
+
+class LivenessJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='id', read_only=True)
+    verified = serializers.BooleanField(source='is_verified', read_only=True)
+
+    class Meta:
+        model = LivenessJob
+        fields = (
+            'job_id', 'student', 'status', 'verified', 'analysis_results',
+            'error', 'facial_data', 'created_at', 'completed_at'
+        )
+        read_only_fields = fields
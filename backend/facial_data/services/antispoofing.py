@@ -0,0 +1,87 @@
+import threading
+import cv2
+import numpy as np
+import onnxruntime as ort
+from typing import List, Sequence
+
+
+class AntiSpoofingModel:
+    """
+    Batched wrapper around the ``antispoofing.onnx`` session.
+
+    Crops are converted to 8-bit BGR if needed and resized straight into a
+    reusable NHWC staging array, then normalized and transposed in one
+    vectorized step into a preallocated NCHW float32 tensor, so N crops
+    cost a single ``InferenceSession.run`` (or one per ``max_batch`` if the
+    model has a fixed batch dimension). Buffers are per thread because the
+    session itself is shared.
+    """
+    INPUT_SIZE = 80
+
+    def __init__(self, session: ort.InferenceSession, max_batch: int = 64):
+        self.session = session
+        model_input = session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_name = session.get_outputs()[0].name
+
+        batch_dim = model_input.shape[0] if model_input.shape else None
+        self.fixed_batch = isinstance(batch_dim, int) and batch_dim > 0
+        self.max_batch = batch_dim if self.fixed_batch else max_batch
+        self._local = threading.local()
+
+    def _buffers(self, n: int):
+        staging = getattr(self._local, 'staging', None)
+        if staging is None or staging.shape[0] < n:
+            size = self.INPUT_SIZE
+            self._local.staging = staging = np.empty((n, size, size, 3), dtype=np.uint8)
+            self._local.tensor = np.empty((n, 3, size, size), dtype=np.float32)
+        return staging, self._local.tensor
+
+    @staticmethod
+    def _as_bgr(crop: np.ndarray) -> np.ndarray:
+        """8-bit, 3-channel BGR; floats are taken to be on the 0-255 scale."""
+        if crop.dtype != np.uint8:
+            crop = np.clip(crop, 0, 255).astype(np.uint8)
+        if crop.ndim == 2 or crop.shape[2] == 1:
+            return cv2.cvtColor(crop, cv2.COLOR_GRAY2BGR)
+        if crop.shape[2] == 4:
+            return cv2.cvtColor(crop, cv2.COLOR_BGRA2BGR)
+        return crop
+
+    def _prepare(self, crops: Sequence[np.ndarray]) -> np.ndarray:
+        n = len(crops)
+        staging, tensor = self._buffers(n)
+        size = (self.INPUT_SIZE, self.INPUT_SIZE)
+        for i, crop in enumerate(crops):
+            # OpenCV only resizes into dst when its type matches the input;
+            # otherwise it allocates and the staging slot would keep old pixels
+            resized = cv2.resize(self._as_bgr(crop), size, dst=staging[i])
+            if not np.shares_memory(resized, staging):
+                staging[i] = resized
+
+        batch = tensor[:n]
+        np.multiply(staging[:n].transpose(0, 3, 1, 2), np.float32(1.0 / 255.0), out=batch)
+        return batch
+
+    def shrink(self, crop: np.ndarray) -> np.ndarray:
+        """Resize a crop to the model input size, for callers that queue crops."""
+        return cv2.resize(self._as_bgr(crop), (self.INPUT_SIZE, self.INPUT_SIZE))
+
+    def predict(self, crops: Sequence[np.ndarray]) -> np.ndarray:
+        """Return one liveness score per face crop."""
+        scores = np.empty(len(crops), dtype=np.float32)
+        for start in range(0, len(crops), self.max_batch):
+            chunk = crops[start:start + self.max_batch]
+            batch = self._prepare(chunk)
+            if self.fixed_batch and len(chunk) < self.max_batch:
+                # Fixed-size batch dimension: pad the last partial chunk
+                padded = np.zeros((self.max_batch,) + batch.shape[1:], dtype=np.float32)
+                padded[:len(chunk)] = batch
+                batch = padded
+            pred = self.session.run([self.output_name], {self.input_name: batch})[0]
+            scores[start:start + len(chunk)] = pred[:len(chunk), 0]
+        return scores
+
+    def classify(self, crops: Sequence[np.ndarray], threshold: float = 0.5) -> List[tuple]:
+        """Return ``(is_real, confidence)`` per face crop."""
+        return [(bool(score > threshold), float(score)) for score in self.predict(crops)]
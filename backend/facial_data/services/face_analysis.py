@@ -1,35 +1,75 @@
 import os
-import cv2
 import numpy as np
 import onnxruntime as ort
 from insightface.app import FaceAnalysis
+from insightface.model_zoo.arcface_onnx import ArcFaceONNX
+from insightface.model_zoo.attribute import Attribute
+from insightface.model_zoo.landmark import Landmark
+from insightface.model_zoo.retinaface import RetinaFace
+from insightface.utils.storage import ensure_available
 from django.conf import settings
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Optional
+from facial_data.registry import registry
+from .sessions import create_session
+
+# InsightFace model class per pack module, as model_zoo's router picks them
+MODULE_MODELS = {
+    'detection': RetinaFace,
+    'landmark_2d_106': Landmark,
+    'landmark_3d_68': Landmark,
+    'genderage': Attribute,
+    'recognition': ArcFaceONNX,
+}
+
+
+class ModularFaceAnalysis(FaceAnalysis):
+    """
+    FaceAnalysis that only creates sessions for the modules it needs.
+
+    InsightFace's own ``allowed_modules`` still builds an ONNX session for every
+    file in the pack before discarding the unwanted ones. When every allowed
+    module has an entry in ``module_files`` this class opens just those files,
+    through ``create_session`` so they get the configured session options and
+    optimized-graph cache (``model_zoo`` ignores both); otherwise it defers to
+    the stock behaviour.
+    """
+    def __init__(self, name, root, allowed_modules: Optional[List[str]] = None,
+                 module_files: Optional[Dict[str, str]] = None, **kwargs):
+        module_files = module_files or {}
+        if not allowed_modules or any(
+                m not in module_files or m not in MODULE_MODELS for m in allowed_modules):
+            super().__init__(name=name, root=root, allowed_modules=allowed_modules, **kwargs)
+            return
+
+        ort.set_default_logger_severity(3)
+        self.models = {}
+        self.model_dir = ensure_available('models', name, root=root)
+        for module in allowed_modules:
+            path = os.path.join(self.model_dir, module_files[module])
+            session = create_session(path, providers=kwargs.get('providers'))
+            model = MODULE_MODELS[module](model_file=path, session=session)
+            if model.taskname != module:
+                raise ValueError(f"{module_files[module]} is not a '{module}' model")
+            self.models[module] = model
+        assert 'detection' in self.models
+        self.det_model = self.models['detection']
+
 
 class FaceAnalysisService:
-    def __init__(self):
+    def __init__(self, profile: str = 'enrollment'):
         self.model_config = settings.INSIGHTFACE_MODEL_CONFIG
+        self.profile = profile
         self.face_analyzer = self._init_face_analyzer()
         self.liveness_model = self._init_liveness_model()
+        self.liveness_batch = registry.get('antispoofing_batch')
 
     def _init_face_analyzer(self) -> FaceAnalysis:
-        """Initialize the InsightFace face analyzer"""
-        app = FaceAnalysis(
-            name=self.model_config['model_name'],
-            root=self.model_config['root_path'],
-            providers=self.model_config['providers']
-        )
-        app.prepare(ctx_id=0, det_size=(640, 640))
-        return app
+        """Get the shared InsightFace face analyzer for this service's profile"""
+        return registry.get('face_analyzer', profile=self.profile)
 
     def _init_liveness_model(self) -> ort.InferenceSession:
-        """Initialize the anti-spoofing model"""
-        model_path = os.path.join(
-            self.model_config['root_path'],
-            self.model_config['model_name'],
-            'antispoofing.onnx'
-        )
-        return ort.InferenceSession(model_path, providers=self.model_config['providers'])
+        """Get the shared anti-spoofing model"""
+        return registry.get('antispoofing')
 
     def detect_faces(self, image: np.ndarray) -> List[Dict]:
         """Detect faces in an image"""
@@ -40,21 +80,14 @@ class FaceAnalysisService:
         Verify if a face is real or spoof
         Returns: (is_real, confidence_score)
         """
-        # Preprocess image
-        face_image = cv2.resize(face_image, (80, 80))
-        face_image = face_image.astype(np.float32) / 255.0
-        face_image = np.transpose(face_image, (2, 0, 1))
-        face_image = np.expand_dims(face_image, axis=0)
+        return self.verify_liveness_batch([face_image])[0]
 
-        # Run inference
-        input_name = self.liveness_model.get_inputs()[0].name
-        output_name = self.liveness_model.get_outputs()[0].name
-        pred = self.liveness_model.run([output_name], {input_name: face_image})[0]
-        
-        confidence = float(pred[0][0])
-        is_real = confidence > 0.5  # Adjust threshold as needed
-        
-        return is_real, confidence
+    def verify_liveness_batch(self, face_images: List[np.ndarray]) -> List[Tuple[bool, float]]:
+        """
+        Verify many face crops with a single batched inference
+        Returns: [(is_real, confidence_score), ...] in input order
+        """
+        return self.liveness_batch.classify(face_images, threshold=0.5)  # Adjust threshold as needed
 
     def extract_embeddings(self, face_image: np.ndarray) -> np.ndarray:
         """Extract face embeddings"""
@@ -3,30 +3,32 @@ import numpy as np
 import onnxruntime as ort
 from insightface.app import FaceAnalysis
 from typing import Tuple, List, Dict, Optional
+from facial_data.registry import registry
 
 class LivenessService:
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, profile: str = 'liveness'):
         """
         Initialize the liveness detection service with model paths.
+        ``profile`` selects det_size and modules from INSIGHTFACE_MODEL_CONFIG.
         """
         self.model_path = model_path
+        self.profile = profile
         self.face_analyzer = self._initialize_face_analyzer()
         self.liveness_model = self._initialize_liveness_model()
+        self.liveness_batch = registry.get(
+            'antispoofing_batch', model_path=f"{self.model_path}/antispoofing.onnx")
         
     def _initialize_face_analyzer(self) -> FaceAnalysis:
         """
-        Initialize the InsightFace face analyzer.
+        Get the shared InsightFace face analyzer for this model path.
         """
-        app = FaceAnalysis(name='buffalo_l', root=self.model_path)
-        app.prepare(ctx_id=0, det_size=(640, 640))
-        return app
+        return registry.get('face_analyzer', profile=self.profile, root=self.model_path)
     
     def _initialize_liveness_model(self) -> ort.InferenceSession:
         """
-        Initialize the ONNX liveness detection model.
+        Get the shared ONNX liveness detection model for this model path.
         """
-        model_path = f"{self.model_path}/antispoofing.onnx"
-        return ort.InferenceSession(model_path)
+        return registry.get('antispoofing', model_path=f"{self.model_path}/antispoofing.onnx")
     
     def detect_faces(self, frame: np.ndarray) -> List[Dict]:
         """
@@ -39,22 +41,14 @@ class LivenessService:
         Check if a face is live or spoof.
         Returns a tuple of (is_live, confidence_score)
         """
-        # Preprocess the face image
-        face_img = cv2.resize(face_img, (80, 80))
-        face_img = face_img.astype(np.float32) / 255.0
-        face_img = np.transpose(face_img, (2, 0, 1))
-        face_img = np.expand_dims(face_img, axis=0)
-        
-        # Run the model
-        input_name = self.liveness_model.get_inputs()[0].name
-        output_name = self.liveness_model.get_outputs()[0].name
-        pred = self.liveness_model.run([output_name], {input_name: face_img})[0]
-        
-        # Get the confidence score
-        confidence = float(pred[0][0])
-        is_live = confidence > 0.5  # Threshold can be adjusted
-        
-        return is_live, confidence
+        return self.check_liveness_batch([face_img])[0]
+
+    def check_liveness_batch(self, face_imgs: List[np.ndarray]) -> List[Tuple[bool, float]]:
+        """
+        Check many face crops with one batched model run.
+        Returns a list of (is_live, confidence_score) in input order.
+        """
+        return self.liveness_batch.classify(face_imgs, threshold=0.5)  # Threshold can be adjusted
     
     def perform_liveness_check(self, video_path: str) -> Tuple[bool, Dict]:
         """
@@ -74,6 +68,7 @@ class LivenessService:
         }
         
         prev_landmarks = None
+        face_crops = []
         
         while cap.isOpened():
             ret, frame = cap.read()
@@ -98,34 +93,31 @@ class LivenessService:
             # Get the first face (assuming one face per video)
             face = faces[0]
             
-            # Check liveness
+            # Queue the crop; liveness is scored for all frames in one batch.
+            # Shrinking it now avoids keeping every decoded frame alive.
             bbox = face.bbox.astype(int)
-            face_img = frame_rgb[bbox[1]:bbox[3], bbox[0]:bbox[2]]
-            is_live, confidence = self.check_liveness(face_img)
+            # 68-point landmarks from the liveness profile's landmark_3d_68 module
+            landmarks = face.landmark_3d_68[:, :2] if face.landmark_3d_68 is not None else None
+            face_crops.append(self.liveness_batch.shrink(frame_rgb[bbox[1]:bbox[3], bbox[0]:bbox[2]]))
             
             # Update frame results
             frame_result = {
                 'frame_num': frame_count,
-                'is_live': is_live,
-                'confidence': confidence,
-                'landmarks': face.landmark.tolist(),
+                'landmarks': landmarks.tolist() if landmarks is not None else None,
                 'bbox': bbox.tolist()
             }
             detailed_stats['frame_results'].append(frame_result)
-            
-            if is_live:
-                live_frames += 1
                 
             # Check facial expressions
-            if face.landmark is not None:
+            if landmarks is not None:
                 # Eye openness (simple ratio-based check)
-                left_eye = face.landmark[36:42]
-                right_eye = face.landmark[42:48]
+                left_eye = landmarks[36:42]
+                right_eye = landmarks[42:48]
                 eye_openness = self._calculate_eye_openness(left_eye, right_eye)
                 detailed_stats['eye_openness'] += eye_openness
                 
                 # Mouth movement
-                mouth = face.landmark[48:68]
+                mouth = landmarks[48:68]
                 mouth_openness = self._calculate_mouth_openness(mouth)
                 detailed_stats['mouth_movement'] += mouth_openness
                 
@@ -135,12 +127,20 @@ class LivenessService:
                 
                 # Head movement (compare with previous frame)
                 if prev_landmarks is not None:
-                    head_movement = self._calculate_head_movement(face.landmark, prev_landmarks)
+                    head_movement = self._calculate_head_movement(landmarks, prev_landmarks)
                     detailed_stats['head_movement'] += head_movement
-                prev_landmarks = face.landmark
+                prev_landmarks = landmarks
         
         cap.release()
         
+        if face_crops:
+            for frame_result, (is_live, confidence) in zip(
+                    detailed_stats['frame_results'], self.check_liveness_batch(face_crops)):
+                frame_result['is_live'] = is_live
+                frame_result['confidence'] = confidence
+                if is_live:
+                    live_frames += 1
+        
         # Calculate averages
         if total_frames > 0:
             detailed_stats['eye_openness'] /= len(detailed_stats['frame_results'])
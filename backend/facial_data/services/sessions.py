@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import os
+import onnxruntime as ort
+from django.conf import settings
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+EXECUTION_MODES = {
+    'sequential': ort.ExecutionMode.ORT_SEQUENTIAL,
+    'parallel': ort.ExecutionMode.ORT_PARALLEL,
+}
+
+DEFAULT_SESSION_OPTIONS = {
+    'graph_optimization_level': 'all',
+    'execution_mode': 'sequential',
+    'intra_op_num_threads': 'auto',
+    'inter_op_num_threads': 1,
+    'enable_cpu_mem_arena': True,
+    'enable_mem_pattern': True,
+    'optimized_model_dir': None,
+}
+
+
+def session_config(overrides: Optional[Dict] = None) -> Dict:
+    """``INSIGHTFACE_MODEL_CONFIG['session_options']`` merged over the defaults."""
+    config = dict(DEFAULT_SESSION_OPTIONS)
+    config.update(settings.INSIGHTFACE_MODEL_CONFIG.get('session_options', {}))
+    config.update(overrides or {})
+    return config
+
+
+def resolve_threads(value) -> int:
+    """
+    Thread count for one worker process.
+
+    ``'auto'`` splits the host's cores evenly between the ``WEB_CONCURRENCY``
+    worker processes (the variable gunicorn reads) so workers do not
+    oversubscribe the CPU; ``0`` leaves the choice to ONNX Runtime.
+    """
+    if value == 'auto':
+        workers = max(1, int(os.environ.get('WEB_CONCURRENCY', 1)))
+        return max(1, (os.cpu_count() or 1) // workers)
+    return int(value)
+
+
+def build_session_options(config: Dict) -> ort.SessionOptions:
+    options = ort.SessionOptions()
+    options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[config['graph_optimization_level']]
+    options.execution_mode = EXECUTION_MODES[config['execution_mode']]
+    options.intra_op_num_threads = resolve_threads(config['intra_op_num_threads'])
+    options.inter_op_num_threads = resolve_threads(config['inter_op_num_threads'])
+    options.enable_cpu_mem_arena = config['enable_cpu_mem_arena']
+    options.enable_mem_pattern = config['enable_mem_pattern']
+    return options
+
+
+# Optimizations beyond 'extended' (layout transforms) are specific to the
+# CPU they ran on, so ONNX Runtime recommends saving graphs no further
+CACHE_OPTIMIZATION_LEVEL = 'extended'
+LEVEL_ORDER = list(GRAPH_OPTIMIZATION_LEVELS)
+
+
+def _cache_level(config: Dict) -> str:
+    level = config['graph_optimization_level']
+    return min(level, CACHE_OPTIMIZATION_LEVEL, key=LEVEL_ORDER.index)
+
+
+def _optimized_model_path(model_path: str, config: Dict) -> Optional[str]:
+    cache_dir = config.get('optimized_model_dir')
+    if not cache_dir:
+        return None
+    source = os.path.realpath(model_path)
+    name = os.path.splitext(os.path.basename(source))[0]
+    # Model packs ship the same file names (det_10g.onnx), so key on the path too
+    digest = hashlib.sha1(source.encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{name}.{digest}.{_cache_level(config)}.onnx")
+
+
+def create_session(model_path: str, providers=None, overrides: Optional[Dict] = None) -> ort.InferenceSession:
+    """
+    Create an ``InferenceSession`` configured from settings.
+
+    When ``optimized_model_dir`` is set, the first process saves the graph
+    optimized up to 'extended' there, and every process then loads that
+    file. Only the optimizations above 'extended' ('all' adds layout
+    transforms for the local CPU) still run at load time, so a cache copied
+    to other hardware stays valid. Cached graphs are named after the source
+    model's path and only reused while newer than it.
+    """
+    config = session_config(overrides)
+    providers = providers or settings.INSIGHTFACE_MODEL_CONFIG['providers']
+    options = build_session_options(config)
+
+    cached = _optimized_model_path(model_path, config)
+    if not cached:
+        return ort.InferenceSession(model_path, sess_options=options, providers=providers)
+
+    if not (os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(model_path)):
+        # Written under a per-process name, then renamed, so concurrently
+        # starting workers never load a half-written graph
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        saving = build_session_options(config)
+        saving.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[_cache_level(config)]
+        saving.optimized_model_filepath = f"{cached}.{os.getpid()}.tmp"
+        ort.InferenceSession(model_path, sess_options=saving, providers=providers)
+        os.replace(saving.optimized_model_filepath, cached)
+        logger.info(f"Cached optimized graph for {model_path} at {cached}")
+
+    if config['graph_optimization_level'] == _cache_level(config):
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS['disable']
+    return ort.InferenceSession(cached, sess_options=options, providers=providers)
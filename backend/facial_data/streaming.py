@@ -0,0 +1,190 @@
+"""
+Streaming liveness analysis for uploaded videos.
+
+``LivenessStreamUploadHandler`` analyzes the ``video`` field while the request
+body is still being received: each chunk is written into a pipe that a decoder
+thread reads through OpenCV, so frame analysis overlaps with the upload and the
+video never goes through ``default_storage`` before it is saved for good.
+
+The handler only runs on the synchronous path
+(``LIVENESS_JOB_CONFIG['async'] = False``). Queued jobs are analyzed by a
+Celery worker from the stored file, in another process, so there is no
+request stream to feed them from. A piped webm has no frame count, so early
+exit on this path needs ``LIVENESS_SAMPLING_POLICY['max_analyzed_frames']``.
+
+``analyze_upload`` covers uploads that were parsed by Django's default
+handlers: disk-backed uploads are decoded in place and in-memory uploads are
+exposed to OpenCV through a memfd instead of a temp file in storage.
+"""
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+from .registry import registry
+
+logger = logging.getLogger(__name__)
+
+
+def _fd_path(fd):
+    return f"/proc/self/fd/{fd}"
+
+
+def analyze_capture(source, detector=None, on_frame=None):
+    """Analyze ``source`` (a path OpenCV can open) with the shared detector."""
+    detector = detector or registry.get('liveness_detector')
+    return detector.analyze_video(source, on_frame)
+
+
+def _local_path(upload):
+    """Filesystem path of a stored ``FieldFile``, if its storage has one."""
+    if not hasattr(upload, 'storage'):
+        return None
+    try:
+        return upload.path
+    except NotImplementedError:
+        return None
+
+
+@contextmanager
+def open_upload(upload):
+    """
+    Yield a path OpenCV can open for an already received ``UploadedFile``.
+
+    Disk-backed uploads and files already saved to local storage are used in
+    place; in-memory ones are exposed through a memfd (or an anonymous local
+    temp file where memfd is unavailable), so nothing goes through
+    ``default_storage``.
+    """
+    if hasattr(upload, 'temporary_file_path'):
+        yield upload.temporary_file_path()
+        return
+    path = _local_path(upload)
+    if path is not None:
+        yield path
+        return
+
+    try:
+        if hasattr(os, 'memfd_create') and os.path.isdir('/proc/self/fd'):
+            fd = os.memfd_create('liveness_upload')
+            try:
+                with os.fdopen(os.dup(fd), 'wb') as memfile:
+                    for chunk in upload.chunks():
+                        memfile.write(chunk)
+                yield _fd_path(fd)
+            finally:
+                os.close(fd)
+        else:
+            with tempfile.NamedTemporaryFile(suffix='.webm') as tmp:
+                for chunk in upload.chunks():
+                    tmp.write(chunk)
+                tmp.flush()
+                yield tmp.name
+    finally:
+        upload.seek(0)
+
+
+def analyze_upload(upload, detector=None, on_frame=None):
+    """Analyze an already received ``UploadedFile`` without copying it to storage."""
+    with open_upload(upload) as source:
+        return analyze_capture(source, detector, on_frame)
+
+
+class LivenessStreamUploadHandler(FileUploadHandler):
+    """
+    Upload handler that runs liveness analysis on ``video_field`` as it arrives.
+
+    The received bytes are also kept in a spooled buffer and returned as the
+    field's ``UploadedFile``, with the verdict attached as ``liveness_results``
+    (``None`` if the stream could not be decoded incrementally, in which case
+    callers should fall back to ``analyze_upload``). Writes into the pipe
+    block while the decoder is busy, which bounds memory use on fast uploads.
+    """
+    # Not ``field_name``: FileUploadHandler.new_file overwrites that per file
+    video_field = 'video'
+
+    def __init__(self, request=None, detector=None, on_frame=None):
+        super().__init__(request)
+        self.detector = detector or registry.get('liveness_detector')
+        self.on_frame = on_frame
+        self.active = False
+        self.write_fd = None
+        self.worker = None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.active = field_name == self.video_field
+        if not self.active:
+            return
+
+        self.buffer = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        self.results = None
+        read_fd, self.write_fd = os.pipe()
+        self.worker = threading.Thread(
+            target=self._decode, args=(read_fd,), daemon=True)
+        self.worker.start()
+
+    def _decode(self, read_fd):
+        try:
+            self.results = analyze_capture(_fd_path(read_fd), self.detector, self.on_frame)
+        except Exception:
+            logger.warning("Streaming liveness analysis failed, deferring to analyze_upload", exc_info=True)
+        finally:
+            # Closing the read end unblocks the writer with BrokenPipeError
+            os.close(read_fd)
+
+    def _close_pipe(self):
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+            self.write_fd = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+
+        self.buffer.write(raw_data)
+        if self.write_fd is not None:
+            view = memoryview(raw_data)
+            try:
+                while view:
+                    view = view[os.write(self.write_fd, view):]
+            except BrokenPipeError:
+                # Decoder stopped early; the buffered copy is still complete
+                self._close_pipe()
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+
+        self._close_pipe()
+        self.worker.join()
+        self.active = False
+
+        self.buffer.seek(0)
+        upload = UploadedFile(
+            file=self.buffer,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra
+        )
+        results = self.results
+        if results is not None and results['frames_processed'] == 0:
+            results = None
+        upload.liveness_results = results
+        return upload
+
+    def upload_interrupted(self):
+        if self.active:
+            self._close_pipe()
+            self.worker.join()
+            self.buffer.close()
+            self.active = False
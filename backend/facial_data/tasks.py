@@ -0,0 +1,75 @@
+import logging
+from asgiref.sync import async_to_sync
+from celery import shared_task
+from celery.signals import worker_process_init
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils import timezone
+from .models import LivenessJob
+from .registry import registry
+from .streaming import analyze_upload
+from .utils import save_liveness_verification
+
+logger = logging.getLogger(__name__)
+
+
+@worker_process_init.connect
+def preload_liveness_models(**kwargs):
+    """Load the liveness models once per worker process, before its first job."""
+    names = settings.LIVENESS_JOB_CONFIG.get('worker_preload', [])
+    if names:
+        registry.preload(names)
+        logger.info(f"Worker preloaded models: {', '.join(names)}")
+
+
+def push_job_update(job):
+    """Send the job's current state to WebSocket clients watching it."""
+    from .serializers import LivenessJobSerializer
+
+    try:
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            logger.error("Channel layer is not configured")
+            return
+        async_to_sync(channel_layer.group_send)(
+            job.group_name,
+            {
+                'type': 'liveness_job_update',
+                'content': LivenessJobSerializer(job).data
+            }
+        )
+    except Exception as e:
+        logger.error(f"WebSocket job update failed: {str(e)}")
+
+
+@shared_task(acks_late=True, ignore_result=True)
+def run_liveness_job(job_id):
+    """Analyze a queued liveness video and record the verification if it passes."""
+    job = LivenessJob.objects.select_related('student').filter(pk=job_id).first()
+    if job is None or job.status in ('succeeded', 'failed'):
+        return
+
+    job.status = 'running'
+    job.save(update_fields=['status', 'updated_at'])
+    push_job_update(job)
+
+    try:
+        results = analyze_upload(job.video, registry.get('liveness_detector'))
+        job.analysis_results = results
+        job.is_verified = bool(results.get('is_verified'))
+        if job.is_verified:
+            job.facial_data = save_liveness_verification(job.student, job.video, results)
+        else:
+            job.error = "Liveness verification failed"
+        job.status = 'succeeded'
+    except Exception as e:
+        logger.exception(f"Liveness job {job_id} failed")
+        job.status = 'failed'
+        job.error = str(e)
+    finally:
+        # Reading (and rewinding) the stored video opens it; workers are long-lived
+        job.video.close()
+
+    job.completed_at = timezone.now()
+    job.save()
+    push_job_update(job)
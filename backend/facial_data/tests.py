@@ -1,3 +1,772 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import threading
+from dataclasses import replace
+from unittest import mock
 
-# Create your tests here.
+import cv2
+import numpy as np
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management import call_command
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .services.antispoofing import AntiSpoofingModel
+from .services.sessions import create_session
+from .embeddings import EmbeddingIndex, IVFIndex, normalize, search_students
+from .liveness import FrameSampler, LivenessDetector, SamplingPolicy
+from .models import FacialData, LivenessJob
+from .registry import ModelRegistry, _load_face_analyzer, registry
+from .streaming import LivenessStreamUploadHandler, analyze_upload
+from .tasks import run_liveness_job
+from config.asgi import application
+from students.models import Student
+from users.models import User
+
+
+class PipeReadingDetector:
+    """Stands in for LivenessDetector: reads the piped video, optionally stopping early."""
+
+    def __init__(self, stop_after=None):
+        self.stop_after = stop_after
+        self.received = b''
+
+    def analyze_video(self, source, on_frame=None):
+        with open(source, 'rb') as stream:
+            while True:
+                chunk = stream.read(4096)
+                if not chunk:
+                    break
+                self.received += chunk
+                if self.stop_after is not None and len(self.received) >= self.stop_after:
+                    break
+        return {'frames_processed': len(self.received), 'is_verified': True}
+
+
+class LivenessStreamUploadHandlerTests(SimpleTestCase):
+    payload = os.urandom(300 * 1024)
+
+    def upload(self, detector, field_name='video', chunk_size=64 * 1024):
+        handler = LivenessStreamUploadHandler(detector=detector)
+        handler.new_file(field_name, 'clip.webm', 'video/webm', len(self.payload))
+        for start in range(0, len(self.payload), chunk_size):
+            returned = handler.receive_data_chunk(self.payload[start:start + chunk_size], start)
+            if field_name != handler.video_field:
+                self.assertIsNotNone(returned)
+        return handler.file_complete(len(self.payload))
+
+    def test_chunks_reach_the_decoder_and_the_upload(self):
+        detector = PipeReadingDetector()
+        upload = self.upload(detector)
+
+        self.assertEqual(detector.received, self.payload)
+        self.assertEqual(upload.read(), self.payload)
+        self.assertEqual(upload.size, len(self.payload))
+        self.assertEqual(upload.liveness_results['frames_processed'], len(self.payload))
+
+    def test_decoder_stopping_early_keeps_the_whole_upload(self):
+        detector = PipeReadingDetector(stop_after=10 * 1024)
+        upload = self.upload(detector, chunk_size=8 * 1024)
+
+        self.assertLess(len(detector.received), len(self.payload))
+        self.assertEqual(upload.read(), self.payload)
+        self.assertTrue(upload.liveness_results['is_verified'])
+
+    def test_nothing_decoded_defers_to_analyze_upload(self):
+        detector = PipeReadingDetector(stop_after=0)
+        detector.analyze_video = lambda source, on_frame=None: {'frames_processed': 0}
+        upload = self.upload(detector)
+
+        self.assertIsNone(upload.liveness_results)
+        self.assertEqual(upload.read(), self.payload)
+
+    def test_other_fields_are_left_to_the_next_handler(self):
+        detector = PipeReadingDetector()
+        self.assertIsNone(self.upload(detector, field_name='photo'))
+        self.assertEqual(detector.received, b'')
+
+    def test_interrupted_upload_stops_the_decoder(self):
+        detector = PipeReadingDetector()
+        handler = LivenessStreamUploadHandler(detector=detector)
+        handler.new_file('video', 'clip.webm', 'video/webm', len(self.payload))
+        handler.receive_data_chunk(self.payload[:1024], 0)
+        handler.upload_interrupted()
+
+        self.assertFalse(handler.worker.is_alive())
+        self.assertEqual(detector.received, self.payload[:1024])
+
+
+class BrightSquareCascade:
+    """Finds the bright square drawn into synthetic frames."""
+
+    def __init__(self):
+        self.regions = []
+
+    def detectMultiScale(self, region, *args, **kwargs):
+        self.regions.append(region.shape)
+        ys, xs = np.nonzero(region > 127)
+        if len(xs) == 0:
+            return ()
+        return [(xs.min(), ys.min(), xs.max() - xs.min() + 1, ys.max() - ys.min() + 1)]
+
+
+class ScriptedEyeCascade:
+    """Reports both eyes open or closed in the given order."""
+
+    def __init__(self, states):
+        self.states = iter(states)
+
+    def detectMultiScale(self, region, *args, **kwargs):
+        return [(0, 0, 4, 4)] * 2 if next(self.states) else ()
+
+
+class StubLivenessDetector(LivenessDetector):
+    __slots__ = ('face_cascade', 'eye_cascade')
+
+    def __init__(self, eyes=()):
+        super().__init__(SamplingPolicy())
+        self.face_cascade = BrightSquareCascade()
+        self.eye_cascade = ScriptedEyeCascade(eyes)
+
+
+def square_frame(x, y, side=80, size=(480, 640)):
+    """A textured bright square on black, as the stub cascade's face."""
+    frame = np.zeros((*size, 3), dtype=np.uint8)
+    frame[y:y + side, x:x + side] = np.random.default_rng(0).integers(128, 256, (side, side, 1), dtype=np.uint8)
+    return frame
+
+
+class LivenessSessionTests(SimpleTestCase):
+    def test_blinks_are_open_closed_open_over_the_ring(self):
+        session = StubLivenessDetector().session()
+        for eyes_open in (True, False, True, False, True, True, True):
+            session._push_blink(eyes_open)
+        self.assertEqual(session.blink_count, 2)
+        self.assertEqual((session.blink_len, len(session.blink_history)), (3, 3))
+
+    def test_movement_compares_the_ends_of_the_window(self):
+        session = StubLivenessDetector().session()
+        # 3 px per frame: 12 px across the five-position window
+        moves = [session._push_position(3 * step, 0) for step in range(7)]
+        self.assertEqual(moves[1], (3, 0))
+        self.assertEqual(moves[4], (12, 0))
+        self.assertEqual(moves[6], (12, 0))
+        self.assertEqual(session.movement_score, 3)
+
+    def test_face_is_searched_downscaled_then_tracked(self):
+        detector = StubLivenessDetector(eyes=[True] * 3)
+        session = detector.session()
+        first = session.process(square_frame(100, 100))
+        second = session.process(square_frame(104, 100))
+        self.assertEqual(first['face_bbox'], (100, 100, 80, 80))
+        self.assertEqual(second['face_bbox'], (104, 100, 80, 80))
+        # Full frame at DETECTION_WIDTH, then only the padded window around the face
+        self.assertEqual(detector.face_cascade.regions, [(240, 320), (160, 160)])
+
+    def test_lost_track_falls_back_to_the_full_frame(self):
+        detector = StubLivenessDetector(eyes=[True] * 2)
+        session = detector.session()
+        session.process(square_frame(100, 100))
+        moved = session.process(square_frame(400, 300))
+        self.assertEqual(moved['face_bbox'], (400, 300, 80, 80))
+        self.assertEqual(detector.face_cascade.regions[1:], [(160, 160), (240, 320)])
+
+    def test_frames_without_a_face_drop_the_track(self):
+        detector = StubLivenessDetector()
+        session = detector.session()
+        self.assertEqual(session.process(np.zeros((480, 640, 3), dtype=np.uint8)), {'face_detected': False})
+        self.assertIsNone(session.last_bbox)
+        self.assertEqual(session.results()['frames_processed'], 1)
+
+    def test_a_blinking_moving_face_settles_as_verified(self):
+        detector = StubLivenessDetector(eyes=[True, False, True, True])
+        session = detector.session()
+        for step in range(4):
+            session.process(square_frame(100 + 12 * step, 100))
+        self.assertEqual((session.blink_count, session.movement_score, session.live_frames), (1, 3, 4))
+        self.assertEqual(session.settled(0), 'verified')
+        self.assertTrue(session.results()['is_verified'])
+
+
+class LivenessSettledTests(SimpleTestCase):
+    def session(self, processed, live, blinks=0, movement=0):
+        session = LivenessDetector(SamplingPolicy()).session()
+        session.frames_processed = processed
+        session.live_frames = live
+        session.blink_count = blinks
+        session.movement_score = movement
+        return session
+
+    def test_unbounded_remaining_never_settles(self):
+        self.assertIsNone(self.session(100, 0).settled(None))
+
+    def test_verified_once_no_remaining_frame_can_fail_it(self):
+        # 8 of 10 live even if both remaining frames are not
+        self.assertEqual(self.session(8, 8, blinks=1, movement=1).settled(2), 'verified')
+        # 7 of 11 could end below 70%
+        self.assertIsNone(self.session(8, 7, blinks=1, movement=1).settled(3))
+
+    def test_unreachable_when_too_few_frames_are_left(self):
+        self.assertEqual(self.session(7, 0).settled(13), 'unreachable')
+        self.assertIsNone(self.session(6, 0).settled(14))
+        # Every frame live, but no blink and none left to come
+        self.assertEqual(self.session(10, 10, blinks=0, movement=1).settled(0), 'unreachable')
+
+    def test_remaining_uses_stride_and_window(self):
+        sampler = FrameSampler(SamplingPolicy(stride=3, max_analyzed_frames=5))
+        self.assertIsNone(FrameSampler(SamplingPolicy()).remaining(0, None, 1))
+        self.assertEqual(sampler.remaining(0, 10, 1), 3)
+        self.assertEqual(sampler.remaining(0, None, 1), 4)
+
+
+class AnalyzeVideoEarlyExitTests(SimpleTestCase):
+    """Blank frames: no face, so the verdict can only be a failure."""
+    frames = 20
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        handle, cls.path = tempfile.mkstemp(suffix='.avi')
+        os.close(handle)
+        writer = cv2.VideoWriter(cls.path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+        for _ in range(cls.frames):
+            writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+        writer.release()
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.path)
+        super().tearDownClass()
+
+    def test_container_frame_count_is_not_trusted(self):
+        results = LivenessDetector(SamplingPolicy()).analyze_video(self.path)
+        self.assertIsNone(results['early_exit'])
+        self.assertEqual(results['frames_decoded'], self.frames)
+
+    def test_caller_supplied_frame_count_allows_early_exit(self):
+        results = LivenessDetector(SamplingPolicy()).analyze_video(self.path, total_frames=self.frames)
+        self.assertEqual(results['early_exit'], 'unreachable')
+        self.assertEqual(results['frames_decoded'], 7)
+        self.assertFalse(results['is_verified'])
+
+    def test_analysis_window_allows_early_exit(self):
+        policy = SamplingPolicy(max_analyzed_frames=10)
+        results = LivenessDetector(policy).analyze_video(self.path)
+        self.assertEqual(results['early_exit'], 'unreachable')
+        self.assertLess(results['frames_processed'], 10)
+
+
+class ShippedSamplingPolicyTests(SimpleTestCase):
+    """The configured policy on a blank 120-frame video."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        handle, cls.path = tempfile.mkstemp(suffix='.avi')
+        os.close(handle)
+        writer = cv2.VideoWriter(cls.path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (64, 48))
+        for _ in range(120):
+            writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+        writer.release()
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.path)
+        super().tearDownClass()
+
+    def test_policy_is_bounded(self):
+        policy = SamplingPolicy.from_settings()
+        self.assertIsNotNone(policy.max_analyzed_frames)
+        self.assertGreater(policy.max_stride, policy.stride)
+
+    def test_unchanging_frames_are_skipped(self):
+        policy = replace(SamplingPolicy.from_settings(), early_exit=False)
+        results = LivenessDetector(policy).analyze_video(self.path)
+        self.assertEqual(results['frames_decoded'], 120)
+        self.assertLess(results['frames_analyzed'], 50)
+
+    def test_analysis_stops_once_the_verdict_settles(self):
+        results = LivenessDetector(SamplingPolicy.from_settings()).analyze_video(self.path)
+        self.assertEqual(results['early_exit'], 'unreachable')
+        self.assertLess(results['frames_decoded'], 120)
+        self.assertLess(results['frames_analyzed'], SamplingPolicy.from_settings().max_analyzed_frames)
+
+
+class EchoSession:
+    """Stands in for the ONNX session: scores each crop by its mean input."""
+
+    class Port:
+        def __init__(self, name, shape=None):
+            self.name = name
+            self.shape = shape
+
+    def get_inputs(self):
+        return [self.Port('input', ['batch', 3, 80, 80])]
+
+    def get_outputs(self):
+        return [self.Port('output')]
+
+    def run(self, outputs, feeds):
+        batch = feeds['input']
+        return [batch.reshape(len(batch), -1).mean(axis=1, keepdims=True)]
+
+
+class AntiSpoofingPrepareTests(SimpleTestCase):
+    def test_non_bgr_crops_do_not_score_stale_pixels(self):
+        model = AntiSpoofingModel(EchoSession())
+        model.predict([np.full((120, 100, 3), 250, dtype=np.uint8)] * 4)
+
+        crops = [
+            np.full((120, 100), 51, dtype=np.uint8),               # grayscale
+            np.full((120, 100, 4), 51, dtype=np.uint8),            # BGRA
+            np.full((120, 100, 3), 51.0, dtype=np.float32),        # float
+            np.full((120, 100, 1), 51, dtype=np.uint8),            # single channel
+        ]
+        np.testing.assert_allclose(model.predict(crops), [0.2] * 4, atol=1e-6)
+
+    def test_shrink_returns_model_sized_bgr(self):
+        model = AntiSpoofingModel(EchoSession())
+        shrunk = model.shrink(np.zeros((30, 40, 4), dtype=np.uint8))
+        self.assertEqual(shrunk.shape, (80, 80, 3))
+        self.assertEqual(shrunk.dtype, np.uint8)
+
+
+class OptimizedGraphCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.model_path = self.write_model('pack', 1.0)
+        self.cache_dir = os.path.join(self.dir, 'optimized')
+
+    def write_model(self, pack, addend):
+        """``relu(x + addend)`` saved as ``<pack>/tiny.onnx``."""
+        import onnx
+        from onnx import TensorProto, helper
+
+        graph = helper.make_graph(
+            [helper.make_node('Add', ['x', 'one'], ['sum']), helper.make_node('Relu', ['sum'], ['y'])],
+            'tiny',
+            [helper.make_tensor_value_info('x', TensorProto.FLOAT, [1, 4])],
+            [helper.make_tensor_value_info('y', TensorProto.FLOAT, [1, 4])],
+            [helper.make_tensor('one', TensorProto.FLOAT, [1], [addend])],
+        )
+        model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+        model.ir_version = 8
+        os.makedirs(os.path.join(self.dir, pack))
+        path = os.path.join(self.dir, pack, 'tiny.onnx')
+        onnx.save(model, path)
+        return path
+
+    def session(self, level, model_path=None):
+        return create_session(model_path or self.model_path, providers=['CPUExecutionProvider'], overrides={
+            'graph_optimization_level': level,
+            'intra_op_num_threads': 1,
+            'optimized_model_dir': self.cache_dir,
+        })
+
+    def run_session(self, session):
+        x = np.array([[-3.0, -1.0, 0.0, 2.0]], dtype=np.float32)
+        return session.run(None, {'x': x})[0]
+
+    def cached_files(self):
+        return sorted(name.split('.')[-2] for name in os.listdir(self.cache_dir))
+
+    def test_all_is_cached_at_extended_and_reused(self):
+        session = self.session('all')
+        self.assertEqual(self.cached_files(), ['extended'])
+        np.testing.assert_array_equal(self.run_session(session), [[0.0, 0.0, 1.0, 3.0]])
+
+        cached = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        saved_at = os.path.getmtime(cached)
+        np.testing.assert_array_equal(self.run_session(self.session('all')), [[0.0, 0.0, 1.0, 3.0]])
+        self.assertEqual(os.path.getmtime(cached), saved_at)
+
+    def test_lower_levels_are_cached_as_configured(self):
+        self.session('basic')
+        self.assertEqual(self.cached_files(), ['basic'])
+
+    def test_same_file_name_in_two_packs_is_cached_apart(self):
+        other_path = self.write_model('other_pack', 10.0)
+        self.session('all')
+        self.session('all', other_path)
+        self.assertEqual(self.cached_files(), ['extended', 'extended'])
+        np.testing.assert_array_equal(self.run_session(self.session('all')), [[0.0, 0.0, 1.0, 3.0]])
+        np.testing.assert_array_equal(self.run_session(self.session('all', other_path)), [[7.0, 9.0, 10.0, 12.0]])
+
+
+class ExactBackend:
+    def make_index(self):
+        return EmbeddingIndex(dim=16, capacity=4)
+
+
+class IVFBackend:
+    def make_index(self):
+        # Every list probed, so results match exact search
+        return IVFIndex(dim=16, capacity=4, nlist=4, nprobe=4, min_train_size=8)
+
+
+class ExactIndexTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.vectors = {student_id: rng.normal(size=16) for student_id in range(10)}
+        self.index = EmbeddingIndex(dim=16, capacity=2)
+        self.index.add_many(list(self.vectors), np.array(list(self.vectors.values())))
+
+    def test_matrix_grows_past_its_capacity(self):
+        self.assertEqual(len(self.index), 10)
+        self.assertGreaterEqual(self.index._matrix.shape[0], 10)
+
+    def test_top_k_is_ordered_by_cosine_similarity(self):
+        query = self.vectors[4] + 0.1 * self.vectors[7]
+        results = self.index.search(query, k=3)
+        self.assertEqual(results[0][0], 4)
+        scores = [score for _, score in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        expected = np.dot(query, self.vectors[4]) / np.linalg.norm(query) / np.linalg.norm(self.vectors[4])
+        self.assertAlmostEqual(scores[0], expected, places=5)
+
+    def test_candidates_restrict_the_search(self):
+        results = self.index.search(self.vectors[4], k=5, candidates=[1, 2, 99])
+        self.assertEqual({student_id for student_id, _ in results}, {1, 2})
+
+    def test_adding_again_replaces_the_embedding(self):
+        self.index.add(4, self.vectors[8])
+        self.assertEqual(len(self.index), 10)
+        self.assertEqual({s for s, _ in self.index.search(self.vectors[8], k=2)}, {4, 8})
+
+    def test_subsets_are_cached_until_the_index_changes(self):
+        subset = self.index.subset(('course', 1), [1, 2, 3])
+        self.assertIs(self.index.subset(('course', 1), [3, 2, 1]), subset)
+        self.assertEqual(len(subset), 3)
+        self.index.remove(2)
+        fresh = self.index.subset(('course', 1), [1, 2, 3])
+        self.assertIsNot(fresh, subset)
+        self.assertEqual(len(fresh), 2)
+
+
+class EmbeddingStorageTests(SimpleTestCase):
+    def test_embeddings_are_stored_as_normalized_float16(self):
+        vector = np.random.default_rng(1).normal(size=512) * 40
+        facial_data = FacialData()
+        facial_data.set_embedding(vector)
+        self.assertEqual(len(facial_data.embedding), 1024)
+        stored = facial_data.get_embedding()
+        self.assertEqual(stored.dtype, np.float32)
+        self.assertAlmostEqual(float(np.linalg.norm(stored)), 1.0, places=3)
+        self.assertGreater(float(np.dot(stored, normalize(vector))), 0.9999)
+
+    def test_missing_embedding_is_none(self):
+        self.assertIsNone(FacialData().get_embedding())
+
+
+@override_settings(FACE_INDEX_CONFIG={'sync_seconds': None})
+class FaceIndexSignalTests(TestCase):
+    def setUp(self):
+        self.index = EmbeddingIndex(dim=16)
+        patcher = mock.patch.multiple(registry, is_loaded=mock.Mock(return_value=True),
+                                      get=mock.Mock(return_value=self.index))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.student = Student.objects.create(email='face@example.com')
+        self.vector = np.random.default_rng(5).normal(size=16)
+
+    def enroll(self):
+        facial_data = FacialData(student=self.student)
+        facial_data.set_embedding(self.vector)
+        facial_data.save()
+        return facial_data
+
+    def test_enrollment_is_searchable_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.enroll()
+        self.assertEqual(search_students(self.vector, k=1), [[(self.student.pk, mock.ANY)]])
+
+    def test_rolled_back_enrollment_is_not_indexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.enroll()
+                raise RuntimeError
+        self.assertNotIn(self.student.pk, self.index)
+
+    def test_rolled_back_delete_keeps_matching(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            pk = self.enroll().pk
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                FacialData.objects.get(pk=pk).delete()
+                raise RuntimeError
+        self.assertIn(self.student.pk, self.index)
+        with self.captureOnCommitCallbacks(execute=True):
+            FacialData.objects.get(pk=pk).delete()
+        self.assertNotIn(self.student.pk, self.index)
+
+    def test_search_students_uses_the_group_subset(self):
+        other = Student.objects.create(email='other@example.com')
+        self.index.add(self.student.pk, self.vector)
+        self.index.add(other.pk, -self.vector)
+        results = search_students(self.vector, k=2, candidates=[other.pk], group=('course', 1))
+        self.assertEqual([s for s, _ in results[0]], [other.pk])
+        self.assertIn(('course', 1), self.index._subsets)
+
+
+class EmbeddingIndexRemoveMixin:
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.vectors = {student_id: rng.normal(size=16) for student_id in range(100, 140)}
+        self.index = self.make_index()
+        self.index.add_many(list(self.vectors), np.array(list(self.vectors.values())))
+        # Builds the IVF lists that a removal has to invalidate
+        self.assertEqual(self.index.search(self.vectors[139], k=1)[0][0], 139)
+
+    def test_removing_the_last_row(self):
+        self.index.remove(139)
+        self.assertNotIn(139, self.index)
+        self.assertNotIn(139, [s for s, _ in self.index.search(self.vectors[139], k=40)])
+        self.assertEqual(len(self.index.search(self.vectors[139], k=40)), 39)
+
+    def test_removing_a_middle_row_keeps_the_moved_one(self):
+        self.index.remove(105)
+        self.assertNotIn(105, [s for s, _ in self.index.search(self.vectors[105], k=40)])
+        student_id, score = self.index.search(self.vectors[139], k=1)[0]
+        self.assertEqual(student_id, 139)
+        self.assertAlmostEqual(score, 1.0, places=5)
+
+
+class ExactIndexRemoveTests(ExactBackend, EmbeddingIndexRemoveMixin, SimpleTestCase):
+    pass
+
+
+class IVFIndexRemoveTests(IVFBackend, EmbeddingIndexRemoveMixin, SimpleTestCase):
+    def test_search_does_not_wait_for_training(self):
+        index = self.make_index()
+        index.add_many(list(self.vectors), np.array(list(self.vectors.values())))
+        with index._train_lock:
+            # Another caller is training: fall back to exact search
+            self.assertEqual(index.search(self.vectors[120], k=1)[0][0], 120)
+        self.assertIsNone(index._centroids)
+        index.search(self.vectors[120], k=1)
+        self.assertIsNotNone(index._centroids)
+
+
+class FaceIndexSyncMixin:
+    """The index stands in for another process: the local signals do not reach it."""
+
+    def enroll(self, number):
+        student = Student.objects.create(email=f'index{number}@example.com')
+        facial_data = FacialData(student=student)
+        facial_data.set_embedding(np.random.default_rng(number).normal(size=16))
+        facial_data.save()
+        return student.pk
+
+    def setUp(self):
+        self.students = [self.enroll(number) for number in range(3)]
+        self.index = self.make_index()
+        self.index.rebuild()
+        self.assertEqual(len(self.index), 3)
+
+    def test_sync_sees_an_add_and_a_delete_together(self):
+        FacialData.objects.filter(student_id=self.students[0]).delete()
+        added = self.enroll(3)
+
+        self.index.sync()
+        self.assertNotIn(self.students[0], self.index)
+        self.assertIn(added, self.index)
+        self.assertEqual(len(self.index), 3)
+
+    def test_sync_drops_embeddings_set_to_null(self):
+        FacialData.objects.filter(student_id=self.students[1]).update(embedding=None)
+
+        self.index.sync()
+        self.assertNotIn(self.students[1], self.index)
+        self.assertEqual(len(self.index), 2)
+
+
+class ExactIndexSyncTests(ExactBackend, FaceIndexSyncMixin, TestCase):
+    pass
+
+
+class IVFIndexSyncTests(IVFBackend, FaceIndexSyncMixin, TestCase):
+    pass
+
+
+class LivenessJobFixture:
+    def setUp(self):
+        self.owner, self.other = [
+            User.objects.create_user(username=name, email=f'{name}@example.com', password='x', role='HEAD')
+            for name in ('owner', 'other')
+        ]
+        student = Student.objects.create(email='enrolling@example.com')
+        self.job = LivenessJob.objects.create(
+            student=student, user=self.owner, video='liveness_videos/clip.webm')
+
+
+class LivenessJobStatusAPITests(LivenessJobFixture, TestCase):
+    def get(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client.get(reverse('liveness-job', args=[self.job.pk]))
+
+    def test_owner_sees_the_job(self):
+        response = self.get(self.owner)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['job_id'], str(self.job.pk))
+
+    def test_other_users_and_anonymous_requests_do_not(self):
+        self.assertEqual(self.get(self.other).status_code, 404)
+        self.assertEqual(self.get().status_code, 401)
+
+
+class LivenessJobConsumerTests(LivenessJobFixture, TransactionTestCase):
+    async def connect(self, user=None):
+        path = f'/ws/liveness/{self.job.pk}/'
+        if user is not None:
+            path += f'?token={AccessToken.for_user(user)}'
+        communicator = WebsocketCommunicator(application, path)
+        return communicator, await communicator.connect()
+
+    async def test_owner_gets_the_current_state(self):
+        communicator, (connected, _) = await self.connect(self.owner)
+        self.assertTrue(connected)
+        self.assertEqual((await communicator.receive_json_from())['status'], 'pending')
+        await communicator.disconnect()
+
+    async def test_other_users_and_anonymous_sockets_are_closed(self):
+        _, (connected, code) = await self.connect(self.other)
+        self.assertEqual((connected, code), (False, 4404))
+        _, (connected, code) = await self.connect()
+        self.assertEqual((connected, code), (False, 4401))
+
+
+class LivenessJobTaskTests(LivenessJobFixture, TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        os.makedirs(os.path.join(media, 'liveness_videos'))
+        with open(os.path.join(media, 'liveness_videos', 'clip.webm'), 'wb') as clip:
+            clip.write(b'not really a video')
+        super().setUp()
+
+    def run_job(self, outcome):
+        videos = []
+
+        def analyze(video, detector):
+            videos.append(video)
+            # A dict is returned, an exception raised
+            with mock.patch('facial_data.streaming.analyze_capture', side_effect=[outcome]):
+                return analyze_upload(video, detector)
+
+        # Read through the storage API, as with remote storage
+        with mock.patch('facial_data.tasks.analyze_upload', analyze), \
+                mock.patch('facial_data.streaming._local_path', return_value=None), \
+                mock.patch.object(registry, 'get'):
+            run_liveness_job(self.job.pk)
+        self.job.refresh_from_db()
+        return videos[0]
+
+    def test_the_stored_video_is_closed_after_the_job(self):
+        video = self.run_job({'is_verified': False})
+        self.assertEqual((self.job.status, self.job.is_verified), ('succeeded', False))
+        self.assertTrue(video.closed)
+
+    def test_the_stored_video_is_closed_when_the_job_fails(self):
+        with self.assertLogs('facial_data.tasks', 'ERROR'):
+            video = self.run_job(ValueError("Could not decode video"))
+        self.assertEqual(self.job.status, 'failed')
+        self.assertTrue(video.closed)
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = ModelRegistry()
+        self.loads = []
+
+        def loader(**options):
+            self.loads.append(options)
+            return object()
+
+        self.registry.register('shared', loader)
+        self.registry.register('cascade', loader, per_thread=True)
+
+    def in_thread(self, func):
+        result = []
+        thread = threading.Thread(target=lambda: result.append(func()))
+        thread.start()
+        thread.join()
+        return result[0]
+
+    def test_shared_models_load_once_per_key(self):
+        self.assertFalse(self.registry.is_loaded('shared'))
+        first = self.registry.get('shared')
+        self.assertIs(self.registry.get('shared'), first)
+        self.assertIs(self.in_thread(lambda: self.registry.get('shared')), first)
+        self.assertIsNot(self.registry.get('shared', size=320), first)
+        self.assertEqual(self.loads, [{}, {'size': 320}])
+        self.assertTrue(self.registry.is_loaded('shared', size=320))
+
+    def test_concurrent_first_use_loads_once(self):
+        threads = [threading.Thread(target=self.registry.get, args=('shared',)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.loads), 1)
+
+    def test_per_thread_models_are_distinct_per_thread(self):
+        mine = self.registry.get('cascade')
+        self.assertIs(self.registry.get('cascade'), mine)
+        theirs = self.in_thread(lambda: self.registry.get('cascade'))
+        self.assertIsNot(theirs, mine)
+        self.assertEqual(self.registry.stats()['cascade']['loads'], 2)
+
+    def test_stats_count_loads_and_hits(self):
+        for _ in range(3):
+            self.registry.get('shared')
+        stats = self.registry.stats()['shared']
+        self.assertEqual((stats['loads'], stats['hits']), (1, 2))
+        self.assertGreaterEqual(stats['load_time'], 0)
+
+    def test_preload_and_clear(self):
+        self.registry.preload(['shared'])
+        self.assertTrue(self.registry.is_loaded('shared'))
+        self.registry.clear()
+        self.assertFalse(self.registry.is_loaded('shared'))
+        self.assertEqual(self.registry.stats(), {})
+
+    def test_unknown_models_raise(self):
+        with self.assertRaises(KeyError):
+            self.registry.get('missing')
+
+
+class FaceProfileTests(SimpleTestCase):
+    @mock.patch('facial_data.services.face_analysis.ModularFaceAnalysis')
+    def test_profiles_pick_modules_and_detection_size(self, analysis):
+        _load_face_analyzer(profile='liveness')
+        kwargs = analysis.call_args.kwargs
+        self.assertEqual(kwargs['allowed_modules'], ['detection', 'landmark_3d_68'])
+        self.assertEqual(kwargs['module_files'], settings.INSIGHTFACE_MODEL_CONFIG['module_files'])
+        analysis.return_value.prepare.assert_called_once_with(ctx_id=0, det_size=(320, 320))
+
+    @mock.patch('facial_data.services.face_analysis.ModularFaceAnalysis')
+    def test_unknown_profiles_load_the_whole_pack(self, analysis):
+        _load_face_analyzer(profile='missing', det_size=(480, 480))
+        self.assertIsNone(analysis.call_args.kwargs['allowed_modules'])
+        analysis.return_value.prepare.assert_called_once_with(ctx_id=0, det_size=(480, 480))
+
+    @mock.patch('subprocess.run')
+    def test_benchmark_runs_each_profile_through_django(self, run):
+        run.return_value = mock.Mock(returncode=0, stdout='ok\n', stderr='')
+        call_command('benchmark_face_profiles', '--profile', 'liveness', '--profile', 'enrollment',
+                     '--image', 'face.jpg', '--iterations', '1', stdout=io.StringIO())
+        commands = [call.args[0] for call in run.call_args_list]
+        self.assertEqual([command[1:4] for command in commands], [['-m', 'django', 'benchmark_face_profiles']] * 2)
+        self.assertEqual([command[command.index('--profile') + 1] for command in commands], ['liveness', 'enrollment'])
+        self.assertEqual(commands[0][-2:], ['--settings', settings.SETTINGS_MODULE])
+        self.assertIn(settings.BASE_DIR, run.call_args.kwargs['env']['PYTHONPATH'])
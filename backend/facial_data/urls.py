@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import LivenessVerificationAPI
+from .views import LivenessVerificationAPI, LivenessJobStatusAPI
 
 urlpatterns = [
     path('verify/', LivenessVerificationAPI.as_view(), name='liveness-verify'),
+    path('jobs/<uuid:job_id>/', LivenessJobStatusAPI.as_view(), name='liveness-job'),
 ]
\ No newline at end of file
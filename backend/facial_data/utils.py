@@ -1,8 +1,9 @@
 import cv2
 import numpy as np
-from .liveness import LivenessDetector
-from django.core.files.storage import default_storage
-from datetime import datetime
+from .embeddings import compute_embedding, embedding_from_image, embedding_from_upload
+from .models import FacialData
+from .registry import registry
+from .streaming import analyze_upload
 
 
 def process_liveness_images(images_dict):
@@ -10,7 +11,7 @@ def process_liveness_images(images_dict):
     Process liveness verification from uploaded images
     Returns dict with verification results
     """
-    detector = LivenessDetector()
+    detector = registry.get('liveness_detector')
     ordered_images = []
 
     # Get images in correct order
@@ -34,6 +35,10 @@ def process_liveness_images(images_dict):
     result = detector.analyze_frames(ordered_images)
     return {
         'is_verified': result,
+        'embedding': (
+            compute_embedding(lambda: embedding_from_image(ordered_images[0]))
+            if result else None
+        ),
         'error': None if result else 'Liveness check failed'
     }
 
@@ -42,20 +47,36 @@ def analyze_video_file(video_file):
     """
     Process video file for liveness verification
     """
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    temp_path = f"temp_video_{timestamp}.webm"
+    results = getattr(video_file, 'liveness_results', None)
+    if results is None:
+        results = analyze_upload(video_file, registry.get('liveness_detector'))
+    return {
+        'is_verified': results['is_verified'],
+        'analysis_results': results,
+        'error': None if results['is_verified'] else 'Liveness check failed'
+    }
 
-    with default_storage.open(temp_path, 'wb+') as destination:
-        for chunk in video_file.chunks():
-            destination.write(chunk)
 
-    try:
-        detector = LivenessDetector()
-        result = detector.analyze_video(default_storage.path(temp_path))
-        return {
-            'is_verified': result,
-            'error': None if result else 'Liveness check failed'
-        }
-    finally:
-        if default_storage.exists(temp_path):
-            default_storage.delete(temp_path)
+
+def save_liveness_verification(student, video_file, results):
+    """
+    Store a successful video verification: the video, its analysis and the
+    student's face embedding. Returns the ``FacialData`` row.
+    """
+    defaults = {
+        'video': video_file,
+        'is_verified': True,
+        'analysis_results': results
+    }
+    # Before saving: storage may move a disk-backed upload away
+    embedding = compute_embedding(lambda: embedding_from_upload(video_file))
+    if embedding is not None:
+        defaults['embedding'] = FacialData.pack_embedding(embedding)
+
+    facial_data, _ = FacialData.objects.update_or_create(
+        student=student,
+        defaults=defaults
+    )
+    student.is_verified = True
+    student.save()
+    return facial_data
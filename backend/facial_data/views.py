@@ -1,20 +1,64 @@
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
-from django.core.files.storage import default_storage
-from .models import FacialData
-from .liveness import LivenessDetector
+from rest_framework import permissions, status
+from .models import FacialData, LivenessJob
+from .registry import registry
+from .serializers import LivenessJobSerializer
+from .streaming import LivenessStreamUploadHandler, analyze_upload
+from .tasks import run_liveness_job
+from .utils import save_liveness_verification
 from students.models import Student
-from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
 class LivenessVerificationAPI(APIView):
+    def initial(self, request, *args, **kwargs):
+        # Must be installed before anything parses the multipart body. Queued
+        # jobs leave all video decoding to the Celery worker.
+        if not settings.LIVENESS_JOB_CONFIG.get('async', True):
+            request.upload_handlers.insert(0, LivenessStreamUploadHandler(request))
+        super().initial(request, *args, **kwargs)
+
+    def _queue_job(self, request, student, video_file):
+        """Store the video and hand it to a worker; 202 with the job id."""
+        # Jobs are only visible to whoever submitted them
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": "Authentication is required to queue a verification.", "verified": False},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        job = LivenessJob.objects.create(student=student, user=request.user, video=video_file)
+        try:
+            run_liveness_job.delay(str(job.pk))
+        except Exception as e:
+            logger.error(f"Could not queue liveness job {job.pk}: {str(e)}")
+            job.status = 'failed'
+            job.error = "Verification queue unavailable"
+            job.save(update_fields=['status', 'error', 'updated_at'])
+            return Response(
+                {"error": job.error, "job_id": str(job.pk), "verified": False},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        return Response({
+            "status": "pending",
+            "job_id": str(job.pk),
+            "student_id": student.student_id,
+            "status_url": request.build_absolute_uri(reverse('liveness-job', args=[job.pk])),
+            "websocket": f"/ws/liveness/{job.pk}/",
+            "verified": False
+        }, status=status.HTTP_202_ACCEPTED)
+
     def post(self, request):
         """
         Verifies student liveness via optional video.
         Expects a video. Student is auto-detected (most recently created).
+        With LIVENESS_JOB_CONFIG['async'] the video is queued and the response
+        is 202 with a job id to poll or watch over WebSocket.
         """
 
         video_file = request.FILES.get('video')
@@ -49,30 +93,18 @@ class LivenessVerificationAPI(APIView):
                 "verified": True
             }, status=status.HTTP_200_OK)
 
-        # Liveness verification using video
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        temp_video_path = f"temp_liveness_{student.student_id}_{timestamp}.webm"
+        if settings.LIVENESS_JOB_CONFIG.get('async', True):
+            return self._queue_job(request, student, video_file)
 
+        # Liveness verification using video. The stream handler has usually
+        # analyzed it during upload; otherwise decode the received file in place.
         try:
-            # Save the uploaded video temporarily
-            with default_storage.open(temp_video_path, 'wb+') as destination:
-                for chunk in video_file.chunks():
-                    destination.write(chunk)
-
-            detector = LivenessDetector()
-            results = detector.analyze_video(default_storage.path(temp_video_path))
+            results = getattr(video_file, 'liveness_results', None)
+            if results is None:
+                results = analyze_upload(video_file, registry.get('liveness_detector'))
 
             if results.get('is_verified'):
-                facial_data, _ = FacialData.objects.update_or_create(
-                    student=student,
-                    defaults={
-                        'video': video_file,
-                        'is_verified': True,
-                        'analysis_results': results
-                    }
-                )
-                student.is_verified = True
-                student.save()
+                facial_data = save_liveness_verification(student, video_file, results)
 
                 return Response({
                     "status": "success",
@@ -96,7 +128,11 @@ class LivenessVerificationAPI(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        finally:
-            # Always clean up the temporary video file
-            if default_storage.exists(temp_video_path):
-                default_storage.delete(temp_video_path)
+
+class LivenessJobStatusAPI(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        """Poll a queued liveness verification submitted by the requester."""
+        job = get_object_or_404(LivenessJob, pk=job_id, user=request.user)
+        return Response(LivenessJobSerializer(job).data)
@@ -0,0 +1,107 @@
+"""
+Set-based timetable conflict detection.
+
+A batch of proposed slots is checked in one pass: the saved schedules that
+could clash with it are loaded in a single query, slots are grouped by
+(day, room) and (day, instructor), and each group is swept in start-time
+order keeping the still-running slots on a heap, so only overlapping pairs
+are ever compared. ``Schedule.clean`` runs the same check for a single slot.
+The PostgreSQL exclusion constraints on ``Schedule`` stay the authoritative
+guard against concurrent writers.
+"""
+import heapq
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import time
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from django.db.models import Q
+
+
+@dataclass(frozen=True)
+class Slot:
+    """One weekly class slot, saved (``pk`` set) or proposed."""
+    day: str
+    start_time: time
+    end_time: time
+    room: str
+    instructor_id: Optional[int]
+    pk: Optional[int] = None
+    key: Hashable = None    # the caller's reference, e.g. an import row number
+
+    @classmethod
+    def from_schedule(cls, schedule, key=None):
+        return cls(
+            day=schedule.day, start_time=schedule.start_time, end_time=schedule.end_time,
+            room=schedule.room, instructor_id=schedule.instructor_id, pk=schedule.pk, key=key,
+        )
+
+
+@dataclass(frozen=True)
+class Conflict:
+    kind: str       # 'room' or 'instructor'
+    slot: Slot      # always a proposed slot
+    other: Slot     # a proposed or saved slot overlapping it
+
+
+def _overlapping_pairs(slots: List[Slot]) -> Iterator[Tuple[Slot, Slot]]:
+    """Pairs of overlapping slots within one group, by sweeping start times."""
+    running = []  # heap of (end_time, order, slot)
+    for order, slot in enumerate(sorted(slots, key=lambda s: (s.start_time, s.end_time))):
+        while running and running[0][0] <= slot.start_time:
+            heapq.heappop(running)
+        for _, _, other in running:
+            yield other, slot
+        heapq.heappush(running, (slot.end_time, order, slot))
+
+
+def saved_slots(proposed: List[Slot]) -> List[Slot]:
+    """Saved schedules sharing a day and a room or instructor with ``proposed``."""
+    from .models import Schedule
+
+    if not proposed:
+        return []
+    rooms = {slot.room for slot in proposed}
+    instructors = {slot.instructor_id for slot in proposed if slot.instructor_id is not None}
+    rows = (
+        Schedule.objects
+        .filter(day__in={slot.day for slot in proposed})
+        .filter(Q(room__in=rooms) | Q(instructor__in=instructors))
+        .exclude(pk__in=[slot.pk for slot in proposed if slot.pk is not None])
+        .values_list('pk', 'day', 'start_time', 'end_time', 'room', 'instructor_id')
+    )
+    return [
+        Slot(day=day, start_time=start, end_time=end, room=room, instructor_id=instructor, pk=pk)
+        for pk, day, start, end, room, instructor in rows
+    ]
+
+
+def find_conflicts(proposed: Iterable[Slot], existing: Optional[Iterable[Slot]] = None) -> List[Conflict]:
+    """
+    Every clash involving a proposed slot: against other proposed slots and
+    against ``existing`` (by default the saved schedules, loaded in one
+    query; pass ``[]`` to check the batch on its own). Slots with a ``pk``
+    replace the saved schedule of the same pk. A pair of proposed slots is
+    reported once, on the later-starting one.
+    """
+    proposed = list(proposed)
+    existing = saved_slots(proposed) if existing is None else list(existing)
+    is_proposed = {id(slot) for slot in proposed}
+
+    groups: Dict[str, Dict[tuple, List[Slot]]] = {'room': defaultdict(list), 'instructor': defaultdict(list)}
+    for slot in proposed + existing:
+        groups['room'][(slot.day, slot.room)].append(slot)
+        if slot.instructor_id is not None:
+            groups['instructor'][(slot.day, slot.instructor_id)].append(slot)
+
+    conflicts = []
+    for kind, by_key in groups.items():
+        for slots in by_key.values():
+            if len(slots) < 2:
+                continue
+            for earlier, later in _overlapping_pairs(slots):
+                if id(later) in is_proposed:
+                    conflicts.append(Conflict(kind, later, earlier))
+                elif id(earlier) in is_proposed:
+                    conflicts.append(Conflict(kind, earlier, later))
+    return conflicts
@@ -1,44 +1,200 @@
 # consumers.py
 
 import json
+import logging
+import threading
+from collections import Counter, deque
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from config.channel_groups import all_group, course_group, department_group, instructor_group
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTIONS = {
+    'department': department_group,
+    'instructor': instructor_group,
+    'course': course_group,
+}
+
+# Change ids a socket remembers to drop copies arriving through another group
+RECENT_CHANGES = 1000
+
+
+class FanoutStats:
+    """
+    Per-process counts of how far schedule notifications spread: sockets
+    currently in each group and messages delivered per group.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.members = Counter()
+        self.deliveries = Counter()
+        self.connections = 0
+        self.rejected = 0
+        self.duplicates = 0
+
+    def joined(self, groups):
+        with self._lock:
+            self.connections += 1
+            self.members.update(groups)
+
+    def left(self, groups):
+        with self._lock:
+            self.connections -= 1
+            self.members.subtract(groups)
+            self.members += Counter()  # drop groups nobody is in any more
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def delivered(self, group):
+        with self._lock:
+            self.deliveries[group] += 1
+
+    def duplicate(self, count=1):
+        with self._lock:
+            self.duplicates += count
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'connections': self.connections,
+                'rejected': self.rejected,
+                'duplicates': self.duplicates,
+                'members': dict(self.members),
+                'deliveries': dict(self.deliveries),
+            }
+
+
+fanout_stats = FanoutStats()
+
+
+class RecentChanges:
+    """The last ``size`` change ids a socket has seen."""
+
+    def __init__(self, size=RECENT_CHANGES):
+        self._order = deque()
+        self._seen = set()
+        self._size = size
+
+    def first_time(self, change_id) -> bool:
+        if change_id is None:
+            return True
+        if change_id in self._seen:
+            return False
+        if len(self._order) >= self._size:
+            self._seen.discard(self._order.popleft())
+        self._order.append(change_id)
+        self._seen.add(change_id)
+        return True
+
+
+@database_sync_to_async
+def audience_groups_for(user):
+    """
+    ``(groups, optional)``: the groups a user joins by default and further
+    ones they may pick with the query string. Students follow their
+    department, which is also their courses' roster; instructors their own
+    group, with the courses they teach as optional narrower feeds; heads
+    the departments they head; admins the ``all`` group, which also hears
+    courses without a department, or chosen departments.
+    """
+    from departments.models import Department
+
+    role = getattr(user, 'role', None)
+    if role == 'ADMIN' or user.is_superuser:
+        return [all_group()], [department_group(pk) for pk in Department.objects.values_list('pk', flat=True)]
+    if role == 'HEAD':
+        return [department_group(pk) for pk in user.headed_departments.values_list('pk', flat=True)], []
+    if role == 'INSTRUCTOR':
+        instructor = getattr(user, 'instructor', None)
+        if instructor is None:
+            return [], []
+        courses = [course_group(pk) for pk in instructor.courses.values_list('pk', flat=True)]
+        return [instructor_group(instructor.pk)], courses
+    if role == 'STUDENT':
+        student = getattr(user, 'student', None)
+        if student is None or student.department_id is None:
+            return [], []
+        return [department_group(student.department_id)], []
+    return [], []
+
 
 class ScheduleNotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Schedule changes for the authenticated user's own audience (see
+    ``audience_groups_for``), so an edit reaches only the sockets it
+    concerns. The query string may pick among the groups a user is
+    entitled to, e.g. ``?course=7``, but never widen them. A change that
+    reaches a socket through several of its groups is sent once. Sockets
+    only listen; nothing a client sends is relayed.
+    """
+
     async def connect(self):
-        self.room_group_name = "schedule_notifications"
-        # Join room group
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name,
-        )
+        self.groups_joined = []
+        self.recent_changes = RecentChanges()
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            fanout_stats.reject()
+            await self.close(code=4401)
+            return
+
+        groups, optional = await audience_groups_for(user)
+        requested = self._requested_groups()
+        if requested:
+            allowed = set(groups) | set(optional)
+            groups = [group for group in dict.fromkeys(requested) if group in allowed]
+        if not groups:
+            fanout_stats.reject()
+            await self.close(code=4403)
+            return
+
+        # Join the user's groups
+        self.groups_joined = groups
+        for group in self.groups_joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+        fanout_stats.joined(self.groups_joined)
         await self.accept()
+        logger.debug(f"User {user.pk} subscribed to {len(self.groups_joined)} schedule groups")
+
+    def _requested_groups(self):
+        params = parse_qs(self.scope.get('query_string', b'').decode())
+        groups = []
+        for name, group_for in SUBSCRIPTIONS.items():
+            for value in params.get(name, []):
+                if value.isdigit():
+                    groups.append(group_for(int(value)))
+        return groups
 
     async def disconnect(self, close_code):
-        # Leave room group
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name,
-        )
-
-    # Receive message from WebSocket
-    async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message = text_data_json['message']
-
-        # Send message to room group
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'schedule_notification',
-                'message': message,
-            }
-        )
+        # Leave the groups
+        if not getattr(self, 'groups_joined', None):
+            return
+        for group in self.groups_joined:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        fanout_stats.left(self.groups_joined)
 
-    # Receive message from room group
+    # Receive message from a group
     async def schedule_notification(self, event):
-        message = event['message']
-
+        fanout_stats.delivered(event.get('group'))
+        content = self._unseen(event['content'])
+        if content is None:
+            return
         # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'message': message
-        }))
+        await self.send(text_data=json.dumps(content))
+
+    def _unseen(self, content):
+        """``content`` without the changes this socket already got, or None."""
+        if content.get('type') != 'schedule_changes':
+            if self.recent_changes.first_time(content.get('change_id')):
+                return content
+            fanout_stats.duplicate()
+            return None
+        changes = [change for change in content['changes'] if self.recent_changes.first_time(change.get('change_id'))]
+        if len(changes) == len(content['changes']):
+            return content
+        fanout_stats.duplicate(len(content['changes']) - len(changes))
+        return {**content, 'count': len(changes), 'changes': changes} if changes else None
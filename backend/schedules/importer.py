@@ -0,0 +1,204 @@
+"""
+Bulk timetable import.
+
+A whole term's slots are validated and written as one batch: rows are
+checked field by field without touching the database, course and
+instructor references are resolved with one query each, conflicts are
+found set-wise by ``schedules.conflicts``, and the slots are inserted with
+``bulk_create`` in a single transaction. ``bulk_create`` bypasses
+``Schedule.save()`` and its signals, so the import sends one summary
+notification per affected department and instructor instead of one per slot.
+"""
+import csv
+import io
+import logging
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from config.channel_groups import all_group, department_group, instructor_group
+from courses.models import Course
+from instructors.models import Instructor
+from .conflicts import Slot, find_conflicts
+from .models import Schedule
+from .notifications import notify_schedule_change
+
+logger = logging.getLogger(__name__)
+
+class TimetableRowSerializer(serializers.Serializer):
+    """One imported slot; the course is given by id or by code."""
+    course = serializers.IntegerField(required=False, allow_null=True)
+    course_code = serializers.CharField(required=False, allow_blank=True)
+    instructor = serializers.IntegerField()
+    day = serializers.CharField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    room = serializers.CharField(max_length=50, required=False, default='TBA')
+
+    def validate_day(self, value):
+        day = value.strip().capitalize()
+        if day not in dict(Schedule.DAY_CHOICES):
+            raise serializers.ValidationError(f'"{value}" is not a valid day.')
+        return day
+
+    def validate(self, data):
+        if data.get('course') is None and not data.get('course_code'):
+            raise serializers.ValidationError({'course': 'Give a course id or course_code.'})
+        if data['start_time'] >= data['end_time']:
+            raise serializers.ValidationError({'end_time': 'Must be after start time'})
+        return data
+
+
+class TimetableFileError(ValueError):
+    """An upload that cannot be read as a CSV timetable."""
+
+    def __init__(self, message, row=None):
+        super().__init__(message)
+        self.row = row
+
+    def as_row_error(self) -> Dict:
+        return {'row': self.row, 'field': 'file', 'error': str(self)}
+
+
+def read_csv(upload) -> List[Dict]:
+    """
+    Rows of an uploaded CSV timetable (header row required); blank cells are
+    dropped. Raises ``TimetableFileError`` if the file is not UTF-8 text or
+    not valid CSV.
+    """
+    text = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+    rows = []
+    try:
+        for row in csv.DictReader(text):
+            rows.append({key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()})
+    except UnicodeDecodeError:
+        # Decoded in blocks, so the failing row is not known
+        raise TimetableFileError('The file is not UTF-8 encoded text.')
+    except csv.Error as e:
+        raise TimetableFileError(f'Not a valid CSV file: {e}', row=len(rows) + 1)
+    return rows
+
+
+def _row_error(errors, row, field, message, **extra):
+    errors.append({'row': row, 'field': field, 'error': str(message), **extra})
+
+
+def validate_timetable(rows: List[Dict]) -> Tuple[List[Schedule], List[Dict]]:
+    """
+    Check every row and return ``(schedules, errors)``: unsaved ``Schedule``
+    objects when there are no errors, else one error per problem with its
+    1-based row number.
+    """
+    errors = []
+    valid = []
+    for number, row in enumerate(rows, start=1):
+        serializer = TimetableRowSerializer(data=row)
+        if not serializer.is_valid():
+            for field, messages in serializer.errors.items():
+                for message in messages:
+                    _row_error(errors, number, field, message)
+            continue
+        valid.append((number, serializer.validated_data))
+
+    # References: one query per table for the whole file
+    course_ids = {data['course'] for _, data in valid if data.get('course') is not None}
+    codes = {data['course_code'] for _, data in valid if data.get('course') is None}
+    known_courses = set(Course.objects.filter(pk__in=course_ids).values_list('pk', flat=True))
+    courses_by_code = dict(Course.objects.filter(code__in=codes).values_list('code', 'pk'))
+    known_instructors = set(
+        Instructor.objects.filter(pk__in={data['instructor'] for _, data in valid})
+        .values_list('pk', flat=True)
+    )
+
+    schedules = {}
+    for number, data in valid:
+        course_id = data.get('course')
+        if course_id is None:
+            course_id = courses_by_code.get(data['course_code'])
+            if course_id is None:
+                _row_error(errors, number, 'course_code', f"Unknown course code {data['course_code']}")
+                continue
+        elif course_id not in known_courses:
+            _row_error(errors, number, 'course', f"Unknown course {course_id}")
+            continue
+        if data['instructor'] not in known_instructors:
+            _row_error(errors, number, 'instructor', f"Unknown instructor {data['instructor']}")
+            continue
+        schedules[number] = Schedule(
+            course_id=course_id, instructor_id=data['instructor'], day=data['day'],
+            start_time=data['start_time'], end_time=data['end_time'], room=data['room'],
+        )
+
+    slots = [Slot.from_schedule(schedule, key=number) for number, schedule in schedules.items()]
+    for conflict in find_conflicts(slots):
+        other = (
+            {'conflicts_with_row': conflict.other.key} if conflict.other.pk is None
+            else {'conflicts_with_schedule': conflict.other.pk}
+        )
+        message = (
+            'Room is already booked during this time slot' if conflict.kind == 'room'
+            else 'Instructor already has a class during this time'
+        )
+        _row_error(errors, conflict.slot.key, conflict.kind, message, **other)
+
+    errors.sort(key=lambda error: error['row'])
+    return (list(schedules.values()) if not errors else []), errors
+
+
+def _notify_import(created: List[Schedule]):
+    """One summary per affected department and instructor group."""
+    departments = dict(
+        Course.objects.filter(pk__in={schedule.course_id for schedule in created})
+        .values_list('pk', 'department')
+    )
+    audiences = defaultdict(list)
+    audiences[all_group()] = list(created)
+    for schedule in created:
+        department_id = departments.get(schedule.course_id)
+        if department_id is not None:
+            audiences[department_group(department_id)].append(schedule)
+        audiences[instructor_group(schedule.instructor_id)].append(schedule)
+
+    day_order = [day for day, _ in Schedule.DAY_CHOICES]
+    for group, schedules in audiences.items():
+        # Keyed on the group and first new id so that two imports are never merged
+        notify_schedule_change(None, f'imported:{created[0].pk}:{group}', [group], {
+            'type': 'schedule_import',
+            'action': 'imported',
+            'count': len(schedules),
+            'days': sorted({schedule.day for schedule in schedules}, key=day_order.index),
+            'timestamp': timezone.now().isoformat(),
+            'message': f"Timetable imported: {len(schedules)} schedules",
+        })
+
+
+def import_timetable(rows: List[Dict], dry_run: bool = False) -> Tuple[List[Schedule], List[Dict]]:
+    """
+    Validate and insert a timetable in one transaction, all or nothing.
+    Returns ``(schedules, errors)``; nothing is written when there are
+    errors, and with ``dry_run`` the schedules come back unsaved.
+    """
+    limit = settings.SCHEDULE_IMPORT_MAX_ROWS
+    if len(rows) > limit:
+        return [], [{'row': None, 'field': 'schedules', 'error': f"At most {limit} rows per import."}]
+
+    schedules, errors = validate_timetable(rows)
+    if errors or dry_run:
+        return schedules, errors
+
+    try:
+        with transaction.atomic():
+            created = Schedule.objects.bulk_create(schedules, batch_size=1000)
+    except IntegrityError as e:
+        # Another writer booked an overlapping slot after validation
+        logger.warning(f"Timetable import rejected by the database: {str(e)}")
+        return [], [{'row': None, 'field': 'schedules', 'error': 'A slot overlaps a schedule saved meanwhile; retry.'}]
+
+    if created:
+        _notify_import(created)
+    logger.info(f"Imported {len(created)} schedules")
+    return created, []
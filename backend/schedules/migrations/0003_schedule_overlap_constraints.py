@@ -0,0 +1,55 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:28
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.operations
+import schedules.models
+from django.db import migrations, models
+
+
+def check_existing_overlaps(apps, schema_editor):
+    """Name the clashing schedules instead of failing on the constraint."""
+    from schedules.conflicts import Slot, find_conflicts
+
+    Schedule = apps.get_model('schedules', 'Schedule')
+    slots = [
+        Slot(day=day, start_time=start, end_time=end, room=room, instructor_id=instructor, pk=pk)
+        for pk, day, start, end, room, instructor in Schedule.objects.values_list(
+            'pk', 'day', 'start_time', 'end_time', 'room', 'instructor_id')
+    ]
+    clashes = sorted(
+        {(c.kind, min(c.slot.pk, c.other.pk), max(c.slot.pk, c.other.pk))
+         for c in find_conflicts(slots, existing=[])}
+    )
+    if clashes:
+        listed = ', '.join(f"{kind} {a}/{b}" for kind, a, b in clashes[:20])
+        raise RuntimeError(f"Resolve {len(clashes)} overlapping schedules before migrating: {listed}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_alter_course_department'),
+        ('instructors', '0002_alter_instructor_department'),
+        ('schedules', '0002_alter_schedule_day'),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.BtreeGistExtension(),
+        migrations.RunPython(check_existing_overlaps, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='schedule',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='schedule',
+            constraint=models.CheckConstraint(condition=models.Q(('start_time__lt', models.F('end_time'))), name='schedule_start_before_end'),
+        ),
+        migrations.AddConstraint(
+            model_name='schedule',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[(schedules.models.TimeSlotRange('start_time', 'end_time'), '&&'), ('day', '='), ('room', '=')], name='exclude_room_overlap'),
+        ),
+        migrations.AddConstraint(
+            model_name='schedule',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[(schedules.models.TimeSlotRange('start_time', 'end_time'), '&&'), ('day', '='), ('instructor', '=')], name='exclude_instructor_overlap'),
+        ),
+    ]
@@ -1,17 +1,31 @@
 import logging
-from django.db import models
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.db import models, transaction, IntegrityError
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from courses.models import Course
 from instructors.models import Instructor
+from config.channel_groups import audience_groups
+from .notifications import notify_schedule_change
 
 logger = logging.getLogger(__name__)
 
+
+class TimeSlotRange(models.Func):
+    """
+    ``[start, end)`` of a time pair as a ``tsrange`` on a fixed date, since
+    PostgreSQL has no time range type; used by the exclusion constraints.
+    """
+    function = 'TSRANGE'
+    template = "%(function)s(DATE '2000-01-01' + %(expressions)s, '[)')"
+    arg_joiner = ", DATE '2000-01-01' + "
+    output_field = DateTimeRangeField()
+
+
 class Schedule(models.Model):
     DAY_CHOICES = [
         ('Monday', _('Monday')),
@@ -54,9 +68,29 @@ class Schedule(models.Model):
         ordering = ['day', 'start_time']
         verbose_name = _('Schedule')
         verbose_name_plural = _('Schedules')
-        unique_together = [
-            ('room', 'day', 'start_time', 'end_time'),
-            ('instructor', 'day', 'start_time', 'end_time')
+        # Overlapping slots are refused by the database itself (GiST, needs
+        # btree_gist), so concurrent writers cannot double-book
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(start_time__lt=models.F('end_time')),
+                name='schedule_start_before_end'
+            ),
+            ExclusionConstraint(
+                name='exclude_room_overlap',
+                expressions=[
+                    (TimeSlotRange('start_time', 'end_time'), RangeOperators.OVERLAPS),
+                    ('day', RangeOperators.EQUAL),
+                    ('room', RangeOperators.EQUAL),
+                ],
+            ),
+            ExclusionConstraint(
+                name='exclude_instructor_overlap',
+                expressions=[
+                    (TimeSlotRange('start_time', 'end_time'), RangeOperators.OVERLAPS),
+                    ('day', RangeOperators.EQUAL),
+                    ('instructor', RangeOperators.EQUAL),
+                ],
+            ),
         ]
 
     def __str__(self):
@@ -65,64 +99,43 @@ class Schedule(models.Model):
 
     def clean(self):
         """Validate time logic and prevent conflicts"""
+        from .conflicts import Slot, find_conflicts
+
         errors = {}
         
         # Validate time order
         if self.start_time >= self.end_time:
             errors['end_time'] = _('End time must be after start time')
-        
-        # Check for room conflicts (only for existing instances)
-        conflicting_schedules = Schedule.objects.filter(
-            day=self.day,
-            room=self.room,
-            start_time__lt=self.end_time,
-            end_time__gt=self.start_time
-        ).exclude(pk=getattr(self, 'pk', None))
-        
-        if conflicting_schedules.exists():
-            errors['room'] = _('This room is already booked during this time slot')
-        
-        # Check for instructor conflicts
-        instructor_conflicts = Schedule.objects.filter(
-            day=self.day,
-            instructor=self.instructor,
-            start_time__lt=self.end_time,
-            end_time__gt=self.start_time
-        ).exclude(pk=getattr(self, 'pk', None))
-        
-        if instructor_conflicts.exists():
-            errors['instructor'] = _('This instructor already has a class during this time')
+        else:
+            # Room and instructor clashes in one query
+            kinds = {conflict.kind for conflict in find_conflicts([Slot.from_schedule(self)])}
+            if 'room' in kinds:
+                errors['room'] = _('This room is already booked during this time slot')
+            if 'instructor' in kinds:
+                errors['instructor'] = _('This instructor already has a class during this time')
         
         if errors:
             raise ValidationError(errors)
 
     def save(self, *args, **kwargs):
-        """Ensure validation runs on save and send notifications"""
-        is_new = self._state.adding
-        
+        """Ensure validation runs on save; the post_save signal notifies"""
         try:
-            self.full_clean()
-            super().save(*args, **kwargs)
-            
-            # Only send notification after successful save
-            action = "created" if is_new else "updated"
-            self._send_schedule_notification(action)
+            # clean() covers overlaps; the exclusion constraints catch races
+            self.full_clean(validate_unique=False, validate_constraints=False)
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+            except IntegrityError as e:
+                if 'overlap' not in str(e):
+                    raise
+                raise ValidationError(_('This slot overlaps another schedule')) from e
             
         except Exception as e:
             logger.error(f"Error saving schedule: {str(e)}")
             raise
 
-    def delete(self, *args, **kwargs):
-        """Send notification before deletion"""
-        try:
-            self._send_schedule_notification("deleted")
-        except Exception as e:
-            logger.error(f"Error sending delete notification: {str(e)}")
-        
-        super().delete(*args, **kwargs)
-
     def _send_schedule_notification(self, action):
-        """Helper method to send schedule notifications"""
+        """Queue a notification, sent once the change is committed"""
         try:
             course_name = getattr(self.course, 'name', 'Unknown Course')
             instructor = getattr(self, 'instructor', None)
@@ -132,10 +145,14 @@ class Schedule(models.Model):
                 lambda: 'Unknown Instructor'
             )()
             
+            department_id = getattr(self.course, 'department_id', None)
             message = {
                 'type': 'schedule_change',
                 'action': action,
                 'schedule_id': self.id,
+                'course_id': self.course_id,
+                'department_id': department_id,
+                'instructor_id': self.instructor_id,
                 'course': course_name,
                 'instructor': instructor_name,
                 'day': self.day,
@@ -145,33 +162,13 @@ class Schedule(models.Model):
                 'message': f"Schedule {action}: {course_name} on {self.day} at {self.room}"
             }
             
-            self._send_ws_notification(message)
+            groups = audience_groups(department_id, self.instructor_id, self.course_id)
+            notify_schedule_change(self.id, action, groups, message)
             
         except Exception as e:
             logger.error(f"Error preparing notification: {str(e)}")
 
-    def _send_ws_notification(self, message):
-        """Send WebSocket notification"""
-        try:
-            channel_layer = get_channel_layer()
-            if channel_layer is None:
-                logger.error("Channel layer is not configured")
-                return
-
-            async_to_sync(channel_layer.group_send)(
-                "notifications",
-                {
-                    'type': 'send_notification',
-                    'content': message
-                }
-            )
-            logger.info(f"Notification sent: {message}")
-            
-        except Exception as e:
-            logger.error(f"WebSocket notification failed: {str(e)}")
-
-
-# Signal handlers for alternative notification approach
+# The only notification path, so every save or delete notifies exactly once
 @receiver(post_save, sender=Schedule)
 def schedule_post_save(sender, instance, created, **kwargs):
     """Signal-based notification for schedule changes"""
@@ -0,0 +1,165 @@
+"""
+Outbox for schedule change notifications.
+
+Changes are queued with ``notify_schedule_change`` and only reach the
+outbox once their transaction commits (``transaction.on_commit``), so a
+rolled-back edit never notifies anyone. The outbox keeps one message per
+(schedule, action), the latest, and a background timer sends whatever
+accumulated during ``window_ms`` to each affected department, instructor
+and course group and to the admins' ``all`` group (``config.channel_groups``)
+as batched messages of up to ``max_batch`` changes. Every change carries a
+``change_id``, so a socket in several of those groups delivers it once.
+
+A burst of edits (a cascade delete, an admin fixing a timetable) therefore
+costs a few channel-layer calls made off the request thread, instead of
+one or two per row made inside it.
+
+Only processes that flush again later wait for the timer: web servers,
+from their first request, and Celery workers, which also flush after each
+task and before a pool process exits (``schedules.tasks``), since prefork
+children end with ``os._exit`` and would drop a pending timer. Anywhere
+else, e.g. a management command, changes are sent as they commit.
+"""
+import logging
+import threading
+import uuid
+from collections import Counter, defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import transaction
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NOTIFICATION_CONFIG = {
+    'window_ms': 250,
+    'max_batch': 100,
+}
+
+
+def notification_config() -> Dict:
+    """``SCHEDULE_NOTIFICATION_CONFIG`` merged over the defaults."""
+    config = dict(DEFAULT_NOTIFICATION_CONFIG)
+    config.update(getattr(settings, 'SCHEDULE_NOTIFICATION_CONFIG', {}))
+    return config
+
+
+def send_schedule_notification(group: str, content):
+    """Send one message to a schedule notifications group."""
+    try:
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            logger.error("Channel layer is not configured")
+            return
+
+        async_to_sync(channel_layer.group_send)(
+            group,
+            {
+                'type': 'schedule.notification',
+                'group': group,
+                'content': content
+            }
+        )
+        logger.info(f"Notification sent to {group}: {content.get('message')}")
+
+    except Exception as e:
+        logger.error(f"WebSocket notification failed: {str(e)}")
+
+
+class NotificationOutbox:
+    """Process-wide buffer of committed changes waiting to be sent."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[Hashable, Tuple[List[str], dict]] = {}
+        self._timer: Optional[threading.Timer] = None
+        self._stats = {'queued': 0, 'deduplicated': 0, 'sent_changes': 0, 'sent_messages': 0, 'group_sends': Counter()}
+        self.deferred = False   # wait for the timer; someone flushes later
+
+    def add(self, key: Hashable, groups: Iterable[str], message: dict):
+        """
+        Queue ``message`` for ``groups``. One still waiting under the same key
+        is replaced, and its groups are kept: an edit that moved a schedule to
+        another room or instructor must still reach the audience it left.
+        """
+        window = notification_config()['window_ms']
+        with self._lock:
+            self._stats['queued'] += 1
+            replaced = self._pending.pop(key, None)
+            if replaced is not None:
+                self._stats['deduplicated'] += 1
+                groups = [*replaced[0], *groups]
+            # Sockets in several of the groups drop the copies by this id
+            self._pending[key] = (list(dict.fromkeys(groups)), {**message, 'change_id': uuid.uuid4().hex})
+            send_now = window <= 0 or not self.deferred
+            if not send_now and self._timer is None:
+                self._timer = threading.Timer(window / 1000, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if send_now:
+            self.flush()
+
+    def flush(self) -> int:
+        """Send everything pending now; returns how many messages went out."""
+        with self._lock:
+            changes, self._pending = list(self._pending.values()), {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not changes:
+            return 0
+
+        by_group = defaultdict(list)
+        for groups, message in changes:
+            for group in groups:
+                by_group[group].append(message)
+
+        batch_size = notification_config()['max_batch']
+        sent = Counter()
+        for group, messages in by_group.items():
+            for start in range(0, len(messages), batch_size):
+                batch = messages[start:start + batch_size]
+                send_schedule_notification(group, batch[0] if len(batch) == 1 else _batch_message(batch))
+                sent[group] += 1
+        with self._lock:
+            self._stats['sent_changes'] += len(changes)
+            self._stats['sent_messages'] += sum(sent.values())
+            self._stats['group_sends'].update(sent)
+        logger.info(f"Flushed {len(changes)} schedule changes as {sum(sent.values())} messages to {len(sent)} groups")
+        return sum(sent.values())
+
+    def stats(self) -> Dict:
+        """Counters since the process started; ``deduplicated`` changes were superseded before sending."""
+        with self._lock:
+            return {**self._stats, 'group_sends': dict(self._stats['group_sends'])}
+
+
+def _batch_message(changes: List[dict]) -> dict:
+    return {
+        'type': 'schedule_changes',
+        'count': len(changes),
+        'changes': changes,
+        'timestamp': changes[-1].get('timestamp'),
+        'message': f"{len(changes)} schedule changes",
+    }
+
+
+outbox = NotificationOutbox()
+
+
+@receiver(request_started)
+def defer_in_web_process(sender, **kwargs):
+    outbox.deferred = True
+
+
+def notify_schedule_change(schedule_id, action: str, groups: Iterable[str], message: dict):
+    """
+    Queue a notification about ``schedule_id`` to ``groups`` for after the
+    current transaction commits (immediately outside one); discarded on rollback.
+    """
+    groups = list(groups)
+    transaction.on_commit(lambda: outbox.add((schedule_id, action), groups, message))
@@ -1,8 +1,8 @@
 from rest_framework import permissions
 
-class IsHeadOfDepartment(permissions.BasePermission):
+class CanImportTimetable(permissions.BasePermission):
     """
-    Only allow the Head of Department (HoD) to access schedules.
+    Only heads of department and admins may import a whole timetable.
     """
     def has_permission(self, request, view):
-        return request.user.role == 'HoD'
\ No newline at end of file
+        return request.user.is_authenticated and request.user.role in ['HEAD', 'ADMIN']
@@ -1,22 +1,47 @@
 # tasks.py
 
-from my_celery import shared_task
+from celery import shared_task
+from celery.signals import task_postrun, worker_process_init, worker_process_shutdown
 from datetime import timedelta
 from django.utils import timezone
-from channels.layers import get_channel_layer
+from config.channel_groups import audience_groups
 from .models import Schedule
+from .notifications import notify_schedule_change, outbox
 
-@shared_task
-def send_schedule_notification():
-    now = timezone.now()
-    schedules = Schedule.objects.filter(start_time__lte=now + timedelta(minutes=30), status='Active')
+
+@worker_process_init.connect
+def defer_schedule_notifications(**kwargs):
+    """Pool processes batch notifications like web servers do."""
+    outbox.deferred = True
+
+
+@task_postrun.connect
+@worker_process_shutdown.connect
+def flush_schedule_notifications(**kwargs):
+    """Send what a task queued before its pool process can exit without atexit."""
+    outbox.flush()
+
+@shared_task(ignore_result=True)
+def send_schedule_notification(minutes=30):
+    """Remind each class's department, instructor and course shortly before it starts."""
+    now = timezone.localtime()
+    soon = now + timedelta(minutes=minutes)
+    schedules = Schedule.objects.filter(
+        day=now.strftime('%A'),
+        start_time__gt=now.time(),
+        start_time__lte=soon.time(),
+    ).select_related('course')
     for schedule in schedules:
-        channel_layer = get_channel_layer()
-        message = f"Class '{schedule.name}' is about to start in 30 minutes!"
-        channel_layer.group_send(
-            'schedule_notifications', 
+        message = f"Class '{schedule.course.name}' in {schedule.room} starts at {schedule.start_time.strftime('%H:%M')}"
+        notify_schedule_change(
+            schedule.pk,
+            'starting_soon',
+            audience_groups(schedule.course.department_id, schedule.instructor_id, schedule.course_id),
             {
-                'type': 'schedule_notification',
+                'type': 'schedule_reminder',
+                'schedule_id': schedule.pk,
+                'course_id': schedule.course_id,
+                'timestamp': now.isoformat(),
                 'message': message,
             }
         )
@@ -1,3 +1,337 @@
-from django.test import TestCase
+import csv
+from datetime import time
+from importlib import import_module
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.asgi import application
+
+from courses.models import Course
+from departments.models import Department
+from instructors.models import Instructor
+from users.models import User
+
+from .consumers import RecentChanges, ScheduleNotificationConsumer
+from .conflicts import Slot, _overlapping_pairs, find_conflicts
+from .importer import TimetableFileError, read_csv, validate_timetable
+from .models import Schedule
+from .notifications import NotificationOutbox, notify_schedule_change
+from .tasks import flush_schedule_notifications
+
+
+def slot(start, end, room='A1', instructor_id=1, day='Monday', pk=None, key=None):
+    return Slot(day=day, start_time=time(*start), end_time=time(*end), room=room,
+                instructor_id=instructor_id, pk=pk, key=key)
+
+
+class OverlappingPairsTests(SimpleTestCase):
+    def test_only_overlapping_slots_are_paired(self):
+        first = slot((9,), (10,))
+        second = slot((9, 30), (11,))
+        third = slot((10, 30), (12,))
+        pairs = {(a.start_time, b.start_time) for a, b in _overlapping_pairs([third, first, second])}
+        self.assertEqual(pairs, {(time(9), time(9, 30)), (time(9, 30), time(10, 30))})
+
+    def test_back_to_back_slots_do_not_overlap(self):
+        self.assertEqual(list(_overlapping_pairs([slot((9,), (10,)), slot((10,), (11,))])), [])
+
+    def test_pairs_are_ordered_by_start(self):
+        late, early = slot((10,), (12,)), slot((9,), (11,))
+        self.assertEqual(list(_overlapping_pairs([late, early])), [(early, late)])
+
+
+class FindConflictsTests(SimpleTestCase):
+    def test_proposed_clash_is_reported_once_on_the_later_slot(self):
+        early = slot((9,), (10,), key=1)
+        late = slot((9, 30), (10, 30), room='B2', key=2)
+        conflicts = find_conflicts([early, late], existing=[])
+        self.assertEqual([(c.kind, c.slot.key, c.other.key) for c in conflicts], [('instructor', 2, 1)])
+
+    def test_room_and_instructor_clashes_are_both_reported(self):
+        proposed = slot((9,), (10,))
+        saved = slot((9, 30), (10, 30), pk=5)
+        kinds = sorted(c.kind for c in find_conflicts([proposed], existing=[saved]))
+        self.assertEqual(kinds, ['instructor', 'room'])
+
+    def test_saved_slots_never_conflict_with_each_other(self):
+        saved = [slot((9,), (10,), pk=1), slot((9,), (10,), pk=2)]
+        self.assertEqual(find_conflicts([slot((11,), (12,))], existing=saved), [])
+
+    def test_other_days_and_unassigned_instructors_do_not_clash(self):
+        proposed = [slot((9,), (10,), instructor_id=None), slot((9,), (10,), room='B2', instructor_id=None)]
+        other_day = slot((9,), (10,), day='Tuesday', pk=1)
+        self.assertEqual(find_conflicts(proposed, existing=[other_day]), [])
+
+
+class ScheduleConflictTests(TestCase):
+    def setUp(self):
+        department = Department.objects.create(name='Physics')
+        self.instructors = [
+            Instructor.objects.create(
+                user=User.objects.create_user(username=name, email=f'{name}@example.com', password='x', role='INSTRUCTOR'),
+                department=department,
+            )
+            for name in ('ada', 'bob')
+        ]
+        self.course = Course.objects.create(code='PHY101', name='Mechanics', department=department)
+        self.saved = self.schedule(9, 10, 'A1', self.instructors[0])
+
+    def schedule(self, start, end, room, instructor, commit=True):
+        schedule = Schedule(course=self.course, instructor=instructor, day='Monday',
+                            start_time=time(start), end_time=time(end), room=room)
+        if commit:
+            schedule.save()
+        return schedule
+
+    def test_saved_schedules_are_loaded_for_the_check(self):
+        conflicts = find_conflicts([Slot(day='Monday', start_time=time(9, 30), end_time=time(11),
+                                         room='A1', instructor_id=self.instructors[1].pk)])
+        self.assertEqual([(c.kind, c.other.pk) for c in conflicts], [('room', self.saved.pk)])
+
+    def test_clean_names_each_clash(self):
+        with self.assertRaises(ValidationError) as raised, self.assertLogs('schedules.models', 'ERROR'):
+            self.schedule(9, 11, 'A1', self.instructors[0])
+        self.assertEqual(set(raised.exception.message_dict), {'room', 'instructor'})
+
+    def test_editing_a_schedule_does_not_clash_with_itself(self):
+        self.saved.end_time = time(10, 30)
+        self.saved.save()
+        self.assertEqual(Schedule.objects.get().end_time, time(10, 30))
+
+    def test_free_room_and_instructor_save(self):
+        self.schedule(9, 10, 'B2', self.instructors[1])
+        self.assertEqual(Schedule.objects.count(), 2)
+
+    @skipIf(connection.vendor == 'postgresql', 'the exclusion constraints refuse the overlapping rows')
+    def test_migration_lists_existing_overlaps(self):
+        migration = import_module('schedules.migrations.0003_schedule_overlap_constraints')
+        Schedule.objects.bulk_create([self.schedule(9, 11, 'A1', self.instructors[1], commit=False)])
+        with self.assertRaisesMessage(RuntimeError, 'Resolve 1 overlapping schedules'):
+            migration.check_existing_overlaps(apps, None)
+
+    @skipUnless(connection.vendor == 'postgresql', 'exclusion constraints need PostgreSQL')
+    def test_database_refuses_overlaps(self):
+        for room, instructor in (('A1', self.instructors[1]), ('B2', self.instructors[0])):
+            with self.subTest(room=room), self.assertRaises(IntegrityError), transaction.atomic():
+                Schedule.objects.bulk_create([self.schedule(9, 11, room, instructor, commit=False)])
+
+
+def upload(content):
+    return SimpleUploadedFile('timetable.csv', content, content_type='text/csv')
+
+
+class ReadCsvTests(SimpleTestCase):
+    def test_rows_are_trimmed_and_blank_cells_dropped(self):
+        rows = read_csv(upload('\ufeffcourse_code, day ,room\nPHY101, monday ,\n'.encode()))
+        self.assertEqual(rows, [{'course_code': 'PHY101', 'day': 'monday'}])
+
+    def test_non_utf8_upload_is_a_file_error(self):
+        with self.assertRaises(TimetableFileError) as raised:
+            read_csv(upload('course_code,room\nPHY101,Salle É\n'.encode('latin-1')))
+        self.assertEqual(raised.exception.as_row_error()['field'], 'file')
+
+    def test_malformed_csv_names_the_row(self):
+        with self.assertRaises(TimetableFileError) as raised:
+            read_csv(upload(b'course_code,room\nPHY101,A1\nPHY102,' + b'A' * (csv.field_size_limit() + 1) + b'\n'))
+        self.assertEqual(raised.exception.row, 2)
+
+
+class TimetableImportTests(TestCase):
+    def setUp(self):
+        department = Department.objects.create(name='Physics')
+        user = User.objects.create_user(username='ada', email='ada@example.com', password='x', role='INSTRUCTOR')
+        self.instructor = Instructor.objects.create(user=user, department=department)
+        self.course = Course.objects.create(code='PHY101', name='Mechanics', department=department)
+        self.head = User.objects.create_user(username='head', email='head@example.com', password='x', role='HEAD')
+
+    def row(self, start, end, room='A1', **extra):
+        return {'course_code': 'PHY101', 'instructor': self.instructor.pk, 'day': 'monday',
+                'start_time': start, 'end_time': end, 'room': room, **extra}
+
+    def test_valid_rows_become_unsaved_schedules(self):
+        schedules, errors = validate_timetable([self.row('09:00', '10:00'), self.row('10:00', '11:00')])
+        self.assertEqual(errors, [])
+        self.assertEqual([(s.course_id, s.day, s.pk) for s in schedules], [(self.course.pk, 'Monday', None)] * 2)
+
+    def test_every_problem_is_reported_by_row(self):
+        schedules, errors = validate_timetable([
+            self.row('09:00', '10:00'),
+            self.row('10:00', '09:00'),
+            self.row('09:00', '10:00', course_code='NOPE'),
+            self.row('09:30', '10:30', room='B2'),
+        ])
+        self.assertEqual(schedules, [])
+        self.assertEqual(
+            [(error['row'], error['field']) for error in errors],
+            [(2, 'end_time'), (3, 'course_code'), (4, 'instructor')],
+        )
+        self.assertEqual(errors[2]['conflicts_with_row'], 1)
+
+    def test_conflicts_with_saved_schedules_name_them(self):
+        saved = Schedule.objects.create(course=self.course, instructor=self.instructor, day='Monday',
+                                        start_time=time(9), end_time=time(10), room='A1')
+        _, errors = validate_timetable([self.row('09:30', '10:30', room='A1')])
+        self.assertEqual({error['conflicts_with_schedule'] for error in errors}, {saved.pk})
+
+    def test_unreadable_upload_is_a_bad_request(self):
+        client = APIClient()
+        client.force_authenticate(self.head)
+        response = client.post('/api/schedules/import/', {'file': upload('day\nMontag É\n'.encode('latin-1'))})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0]['field'], 'file')
+
+
+@override_settings(SCHEDULE_NOTIFICATION_CONFIG={'window_ms': 60000, 'max_batch': 2})
+@mock.patch('schedules.notifications.send_schedule_notification')
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.outbox = NotificationOutbox()
+        self.outbox.deferred = True
+
+    def change(self, schedule_id, action='updated'):
+        return {'schedule_id': schedule_id, 'action': action}
+
+    def test_latest_change_per_schedule_and_action_wins(self, send):
+        self.outbox.add((1, 'updated'), ['a'], self.change(1, 'first'))
+        self.outbox.add((1, 'updated'), ['a'], self.change(1, 'second'))
+        self.assertEqual(self.outbox.flush(), 1)
+        group, content = send.call_args.args
+        self.assertEqual((group, content['action']), ('a', 'second'))
+        self.assertEqual(self.outbox.stats()['deduplicated'], 1)
+
+    def test_a_replaced_change_keeps_its_groups(self, send):
+        # Moved from instructor 1 to instructor 2 and then to room B
+        self.outbox.add((1, 'updated'), ['all', 'instructor.1'], self.change(1, 'first'))
+        self.outbox.add((1, 'updated'), ['all', 'instructor.2', 'room.A'], self.change(1, 'second'))
+        self.outbox.add((1, 'updated'), ['all', 'instructor.2', 'room.B'], self.change(1, 'third'))
+        self.assertEqual(self.outbox.flush(), 5)
+        sent = [(group, content['action']) for group, content in (call.args for call in send.call_args_list)]
+        self.assertCountEqual(sent, [
+            ('all', 'third'), ('instructor.1', 'third'), ('instructor.2', 'third'),
+            ('room.A', 'third'), ('room.B', 'third'),
+        ])
+
+    def test_changes_are_batched_per_group(self, send):
+        for schedule_id in (1, 2, 3):
+            self.outbox.add((schedule_id, 'updated'), ['a', f'only.{schedule_id}'], self.change(schedule_id))
+        self.assertEqual(self.outbox.flush(), 5)
+        batches = [content for group, content in (call.args for call in send.call_args_list) if group == 'a']
+        self.assertEqual([batch.get('count') for batch in batches], [2, None])
+        self.assertEqual(self.outbox.stats()['group_sends']['a'], 2)
+
+    def test_every_group_gets_the_same_change_id(self, send):
+        self.outbox.add((1, 'updated'), ['a', 'b'], self.change(1))
+        self.outbox.flush()
+        change_ids = {content['change_id'] for _, content in (call.args for call in send.call_args_list)}
+        self.assertEqual(len(change_ids), 1)
+
+    def test_nothing_waits_without_a_later_flush(self, send):
+        self.outbox.deferred = False
+        self.outbox.add((1, 'updated'), ['a'], self.change(1))
+        send.assert_called_once()
+        self.assertIsNone(self.outbox._timer)
+
+    def test_flush_cancels_the_timer(self, send):
+        self.outbox.add((1, 'updated'), ['a'], self.change(1))
+        timer = self.outbox._timer
+        self.outbox.flush()
+        self.assertTrue(timer.finished.is_set())
+        self.assertIsNone(self.outbox._timer)
+
+    def test_celery_tasks_flush_when_they_finish(self, send):
+        with mock.patch('schedules.tasks.outbox', self.outbox):
+            self.outbox.add((1, 'updated'), ['a'], self.change(1))
+            flush_schedule_notifications()
+        send.assert_called_once()
+
+    def test_rolled_back_changes_are_never_queued(self, send):
+        with mock.patch('schedules.notifications.outbox', self.outbox):
+            with self.captureOnCommitCallbacks(execute=True):
+                notify_schedule_change(1, 'updated', ['a'], self.change(1))
+                try:
+                    with transaction.atomic():
+                        notify_schedule_change(2, 'updated', ['a'], self.change(2))
+                        raise IntegrityError
+                except IntegrityError:
+                    pass
+        self.assertEqual(list(self.outbox._pending), [(1, 'updated')])
+
+
+class NotificationStatsAPITests(TestCase):
+    url = '/api/schedules/notification-stats/'
+
+    def test_only_admins_see_the_counters(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='head', email='h@example.com', password='x', role='HEAD'))
+        self.assertEqual(client.get(self.url).status_code, 403)
+        client.force_authenticate(User.objects.create_user(username='admin', email='a@example.com', password='x', role='ADMIN'))
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('deduplicated', response.data['outbox'])
+        self.assertIn('duplicates', response.data['fanout'])
+
+
+class RecentChangesTests(SimpleTestCase):
+    def test_repeats_are_dropped_within_the_window(self):
+        recent = RecentChanges(size=2)
+        self.assertEqual([recent.first_time(change) for change in ('a', 'b', 'a', 'c', 'a')],
+                         [True, True, False, True, True])
+
+    def test_batches_keep_only_unseen_changes(self):
+        consumer = ScheduleNotificationConsumer()
+        consumer.recent_changes = RecentChanges()
+        self.assertIsNotNone(consumer._unseen({'type': 'schedule_change', 'change_id': 'a'}))
+        batch = {'type': 'schedule_changes', 'count': 2, 'changes': [{'change_id': 'a'}, {'change_id': 'b'}]}
+        self.assertEqual(consumer._unseen(batch), {'type': 'schedule_changes', 'count': 1, 'changes': [{'change_id': 'b'}]})
+        self.assertIsNone(consumer._unseen(batch))
+
+
+@override_settings(SCHEDULE_NOTIFICATION_CONFIG={'window_ms': 0, 'max_batch': 100})
+class ScheduleNotificationConsumerTests(TransactionTestCase):
+    """Sockets run the lookups on pool threads, so the data must be committed."""
+
+    def setUp(self):
+        department = Department.objects.create(name='Physics')
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='ADMIN')
+        teacher = User.objects.create_user(username='ada', email='ada@example.com', password='x', role='INSTRUCTOR')
+        self.teacher = teacher
+        self.instructor = Instructor.objects.create(user=teacher, department=department)
+        self.course = Course.objects.create(code='PHY101', name='Mechanics', department=department, instructor=self.instructor)
+        self.orphan = Course.objects.create(code='GEN100', name='Orientation', instructor=self.instructor)
+
+    async def connect(self, user, query=''):
+        token = AccessToken.for_user(user)
+        communicator = WebsocketCommunicator(application, f'/ws/schedule_notifications/?token={token}{query}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    @database_sync_to_async
+    def add_schedule(self, course):
+        return Schedule.objects.create(course=course, instructor=self.instructor, day='Monday',
+                                       start_time=time(9), end_time=time(10), room='A1').pk
+
+    async def test_admins_hear_courses_without_a_department(self):
+        communicator = await self.connect(self.admin)
+        schedule_id = await self.add_schedule(self.orphan)
+        message = await communicator.receive_json_from(timeout=2)
+        self.assertEqual((message['schedule_id'], message['department_id']), (schedule_id, None))
+        await communicator.disconnect()
+
+    async def test_a_change_reaching_several_groups_is_sent_once(self):
+        communicator = await self.connect(
+            self.teacher, f'&instructor={self.instructor.pk}&course={self.course.pk}')
+        schedule_id = await self.add_schedule(self.course)
+        message = await communicator.receive_json_from(timeout=2)
+        self.assertEqual(message['schedule_id'], schedule_id)
+        self.assertTrue(await communicator.receive_nothing(timeout=0.5))
+        await communicator.disconnect()
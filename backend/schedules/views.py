@@ -1,9 +1,19 @@
+import logging
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.response import Response
+from departments.permissions import IsAdmin
+from .consumers import fanout_stats
+from .importer import TimetableFileError, import_timetable, read_csv
 from .models import Schedule
+from .notifications import outbox
+from .permissions import CanImportTimetable
 from .serializers import ScheduleSerializer, CreateScheduleSerializer
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 class ScheduleViewSet(viewsets.ModelViewSet):
     queryset = Schedule.objects.all().order_by('day', 'start_time')
     
@@ -20,7 +30,7 @@ class ScheduleViewSet(viewsets.ModelViewSet):
         """
         Enhanced create method with better debugging
         """
-        print("Received POST data:", request.data)  # Debug incoming data
+        logger.debug(f"Received POST data: {request.data}")
         
         # Convert time strings to proper format if needed
         data = request.data.copy()
@@ -37,8 +47,7 @@ class ScheduleViewSet(viewsets.ModelViewSet):
             self.perform_create(serializer)
             headers = self.get_success_headers(serializer.data)
             
-            # Debug output
-            print("Successfully created schedule:", serializer.data)
+            logger.debug(f"Successfully created schedule: {serializer.data}")
             
             return Response(
                 serializer.data,
@@ -47,9 +56,7 @@ class ScheduleViewSet(viewsets.ModelViewSet):
             )
             
         except Exception as e:
-            # Detailed error logging
-            print("Schedule creation failed:", str(e))
-            print("Validation errors:", serializer.errors if hasattr(serializer, 'errors') else None)
+            logger.warning(f"Schedule creation failed: {str(e)}")
             error_data = {
                 'error': str(e),
                 'validation_errors': serializer.errors if hasattr(serializer, 'errors') else None
@@ -60,5 +67,46 @@ class ScheduleViewSet(viewsets.ModelViewSet):
         """
         Enhanced list method with query debugging
         """
-        print("Fetching schedules with params:", request.query_params)
-        return super().list(request, *args, **kwargs)
\ No newline at end of file
+        logger.debug(f"Fetching schedules with params: {request.query_params}")
+        return super().list(request, *args, **kwargs)
+
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[CanImportTimetable],
+            parser_classes=[JSONParser, MultiPartParser, FormParser])
+    def import_timetable(self, request):
+        """
+        Import a term's timetable in one transaction: JSON
+        ``{"schedules": [{"course" or "course_code", "instructor", "day",
+        "start_time", "end_time", "room"}, ...]}`` or a CSV upload in
+        ``file`` with those columns. Every row is checked for conflicts with
+        the others and with saved schedules; any error rejects the whole
+        import. ``dry_run`` validates without saving.
+        """
+        upload = request.FILES.get('file')
+        if upload is not None:
+            try:
+                rows = read_csv(upload)
+            except TimetableFileError as e:
+                return Response({'errors': [e.as_row_error()]}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            rows = request.data.get('schedules')
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                return Response(
+                    {'error': 'Send a "schedules" list or a CSV "file".'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        dry_run = str(request.data.get('dry_run', request.query_params.get('dry_run', ''))).lower() in ('1', 'true')
+
+        schedules, errors = import_timetable(rows, dry_run=dry_run)
+        if errors:
+            return Response({'rows': len(rows), 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        if dry_run:
+            return Response({'rows': len(rows), 'valid': True})
+        return Response(
+            {'rows': len(rows), 'created': len(schedules), 'ids': [schedule.pk for schedule in schedules]},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['get'], url_path='notification-stats', permission_classes=[IsAdmin])
+    def notification_stats(self, request):
+        """Notification counters of the process serving this request."""
+        return Response({'outbox': outbox.stats(), 'fanout': fanout_stats.snapshot()})
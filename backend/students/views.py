@@ -43,10 +43,12 @@ class StudentViewSet(viewsets.ModelViewSet):
                         )
 
                     # ✨ After successful liveness, create FacialData linked to this student
+                    embedding = verification.get('embedding')
                     FacialData.objects.create(
                         student=student,
                         is_verified=True,  # or verification.get('is_verified', True)
-                        analysis_results=verification.get('analysis_results', {})
+                        analysis_results=verification.get('analysis_results', {}),
+                        embedding=FacialData.pack_embedding(embedding) if embedding is not None else None
                     )
 
                 response_serializer = StudentSerializer(student)
@@ -27,13 +27,15 @@ const HomePage = () => {
     const wsUrl = process.env.NODE_ENV === 'production'
       ? 'wss://yourproductionurl.com/ws/schedule_notifications/' // replace with production URL
       : 'ws://127.0.0.1:8000/ws/schedule_notifications/'; // WebSocket URL for local development
+    const token = localStorage.getItem('access_token');
+    if (!token) return; // Notifications are only sent to signed-in users
 
     let socket;
     let retryCount = 0;
     const maxRetries = 3;
 
     const connectWebSocket = () => {
-      socket = new WebSocket(wsUrl);
+      socket = new WebSocket(`${wsUrl}?token=${encodeURIComponent(token)}`);
 
       socket.onopen = () => {
         console.log('WebSocket successfully connected');
@@ -48,7 +50,8 @@ const HomePage = () => {
 
       socket.onclose = (e) => {
         console.log(`WebSocket closed (code ${e.code})`);
-        if (e.code !== 1000 && retryCount < maxRetries) { // 1000 = normal closure
+        // 1000 = normal closure, 44xx = rejected by the server (bad token, nothing to follow)
+        if (e.code !== 1000 && (e.code < 4400 || e.code >= 4500) && retryCount < maxRetries) {
           retryCount++;
           console.log(`Retrying connection (attempt ${retryCount})`);
           setTimeout(connectWebSocket, 2000 * retryCount); // Exponential backoff